@@ -7,14 +7,23 @@ import useTransactionStore from '../store/transactionStore';
 
 const Transactions = () => {
   const { user, isAuthenticated } = useAuthStore();
-  const { fetchUserData, loading, error } = useTransactionStore();
+  const { fetchUserData, subscribeToChanges, loading, error } = useTransactionStore();
 
   useEffect(() => {
     if (isAuthenticated && user?.id) {
-      // Fetch both transactions and relations when component mounts
-      fetchUserData(user.id);
+      // Fetch both transactions and relations when component mounts, then
+      // follow the change feed from the newest row that fetch returned
+      let cancelled = false;
+      let unsubscribe = null;
+      fetchUserData(user.id).then(() => {
+        if (!cancelled) unsubscribe = subscribeToChanges(user.id);
+      });
+      return () => {
+        cancelled = true;
+        unsubscribe?.();
+      };
     }
-  }, [user?.id, isAuthenticated, fetchUserData]);
+  }, [user?.id, isAuthenticated, fetchUserData, subscribeToChanges]);
 
   return (
     <div className="h-[calc(100vh-66px)] flex flex-col text-white relative overflow-hidden" style={{ backgroundColor: 'var(--color-bg-primary)' }}>
@@ -3,19 +3,51 @@ import { devtools } from 'zustand/middleware';
 import axios from 'axios';
 import { BASE_URL } from '../utils/settings';
 
+// Map every member of every relation to its relation, once per fetch
+const indexRelations = (relations) => {
+  const index = new Map();
+  relations.forEach(relation => {
+    relation.related_transactions.forEach(transId => index.set(transId, relation));
+    if (relation.primary_transaction) {
+      index.set(relation.primary_transaction, relation);
+    }
+  });
+  return index;
+};
+
+// Change feed reconnect backoff bounds
+const CHANGE_FEED_MIN_DELAY_MS = 1000;
+const CHANGE_FEED_MAX_DELAY_MS = 30000;
+
+// The newest updated_at among loaded transactions, as the server sent it
+const latestUpdatedAt = (transactions) => {
+  let latest = null;
+  let latestTime = -Infinity;
+  transactions.forEach(transaction => {
+    const time = Date.parse(transaction.updated_at);
+    if (time > latestTime) {
+      latest = transaction.updated_at;
+      latestTime = time;
+    }
+  });
+  return latest;
+};
+
 const useTransactionStore = create(
   devtools(
     (set, get) => ({
   // State
   transactions: [],
   relations: [],
+  // transaction id -> relation, so lookups do not scan every relation
+  relationByTransaction: new Map(),
   loading: false,
   error: null,
   selectedTransactions: new Set(),
   
   // Add a transaction to selection
   getRelatedTransactionsRecursively: (transactionId, visited = new Set()) => {
-    const { relations } = get();
+    const { relationByTransaction } = get();
     
     // Avoid infinite loops
     if (visited.has(transactionId)) {
@@ -26,10 +58,7 @@ const useTransactionStore = create(
     const relatedIds = new Set([transactionId]);
     
     // Find the relation for this transaction
-    const relation = relations.find(rel => 
-      rel.primary_transaction === transactionId || 
-      rel.related_transactions.includes(transactionId)
-    );
+    const relation = relationByTransaction.get(transactionId);
     
     if (relation) {
       // Add all related transactions
@@ -45,12 +74,10 @@ const useTransactionStore = create(
   },
 
   isTransactionRelated: (transactionId) => {
-    const { relations } = get();
+    const relation = get().relationByTransaction.get(transactionId);
     
-    // Check if this transaction appears in any relation's related_transactions
-    return relations.some(relation => 
-      relation.related_transactions.includes(transactionId)
-    );
+    // Check if this transaction appears in its relation's related_transactions
+    return Boolean(relation) && relation.related_transactions.includes(transactionId);
   },
 
   // Create a map of transaction types for better performance
@@ -192,6 +219,7 @@ const useTransactionStore = create(
       const response = await axios.get(`${BASE_URL}/relations/user/${userId}`);
       set({ 
         relations: response.data,
+        relationByTransaction: indexRelations(response.data),
         loading: false 
       });
       return { success: true, data: response.data };
@@ -205,40 +233,43 @@ const useTransactionStore = create(
     }
   },
 
-  // Fetch both transactions and relations
+  // Fetch both transactions and relations in one pre-joined request.
+  // The server sends an ETag, so the browser revalidates with If-None-Match
+  // and unchanged ledgers come back as an empty 304.
   fetchUserData: async (userId) => {
     set({ loading: true, error: null });
     
     try {
-      const [transactionsResult, relationsResult] = await Promise.allSettled([
-        axios.get(`${BASE_URL}/transactions/user/${userId}`),
-        axios.get(`${BASE_URL}/relations/user/${userId}`)
-      ]);
-
-      const transactions = transactionsResult.status === 'fulfilled' 
-        ? transactionsResult.value.data 
-        : [];
-      
-      const relations = relationsResult.status === 'fulfilled' 
-        ? relationsResult.value.data 
-        : [];
+      const response = await axios.get(`${BASE_URL}/users/${userId}/ledger`);
+      const transactions = response.data.transactions;
+      const relations = Object.entries(response.data.relations).map(([id, relation]) => ({
+        id,
+        user_id: userId,
+        ...relation
+      }));
+      const relationsById = new Map(relations.map(relation => [relation.id, relation]));
+
+      // The ledger embeds each transaction's relation_id
+      const relationByTransaction = new Map();
+      transactions.forEach(transaction => {
+        if (transaction.relation_id) {
+          relationByTransaction.set(transaction.id, relationsById.get(transaction.relation_id));
+        }
+      });
 
       set({ 
         transactions,
         relations,
+        relationByTransaction,
         loading: false 
       });
 
       return { 
         success: true, 
-        data: { transactions, relations },
-        errors: {
-          transactions: transactionsResult.status === 'rejected' ? transactionsResult.reason : null,
-          relations: relationsResult.status === 'rejected' ? relationsResult.reason : null
-        }
+        data: { transactions, relations }
       };
     } catch (err) {
-      const message = 'Failed to fetch user data';
+      const message = err.response?.data?.detail || 'Failed to fetch user data';
       set({ 
         error: message, 
         loading: false 
@@ -247,6 +278,76 @@ const useTransactionStore = create(
     }
   },
 
+  // Keep transactions current from the server's change feed; returns a
+  // function that closes the socket. Each connection starts with a
+  // "catch_up" of the rows updated after the newest updated_at held here,
+  // so writes between the REST read and the subscription are not lost.
+  // Deltas are applied in place, a "resync" message (the server dropped
+  // deltas) triggers a full refetch, and a dropped socket reconnects with
+  // exponential backoff.
+  subscribeToChanges: (userId) => {
+    let socket = null;
+    let retryTimer = null;
+    let delay = CHANGE_FEED_MIN_DELAY_MS;
+    let closed = false;
+
+    const applyChanges = (changes, presentIds = null) => {
+      set((state) => {
+        const byId = new Map(state.transactions.map(t => [t.id, t]));
+        if (presentIds) {
+          const present = new Set(presentIds);
+          byId.forEach((_, id) => {
+            if (!present.has(id)) byId.delete(id);
+          });
+        }
+        changes.forEach(change => {
+          if (change.type === 'removed') {
+            byId.delete(change.id);
+          } else {
+            // Keep the relation fields joined in by the ledger
+            byId.set(change.id, { ...byId.get(change.id), ...change.data, id: change.id });
+          }
+        });
+        return { transactions: Array.from(byId.values()) };
+      });
+    };
+
+    const connect = () => {
+      const since = latestUpdatedAt(get().transactions);
+      const query = since ? `?since=${encodeURIComponent(since)}` : '';
+      socket = new WebSocket(`${BASE_URL.replace(/^http/, 'ws')}/ws/users/${userId}/changes${query}`);
+
+      socket.onopen = () => {
+        delay = CHANGE_FEED_MIN_DELAY_MS;
+      };
+
+      socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'resync') {
+          get().fetchUserData(userId);
+        } else if (message.type === 'catch_up') {
+          applyChanges(message.changes, message.ids);
+        } else {
+          applyChanges(message.changes);
+        }
+      };
+
+      socket.onclose = () => {
+        if (closed) return;
+        retryTimer = setTimeout(connect, delay);
+        delay = Math.min(delay * 2, CHANGE_FEED_MAX_DELAY_MS);
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socket.close();
+    };
+  },
+
   // Query AI with context and user message
   queryAI: async (query, selectedTransactionIds = [], userId = null) => {
     // Don't set loading for AI queries - this prevents UI crashes
@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+import pytest
+
+from .generators import BENCH_USER, seed_transactions
+from .stub_llm import install_stub_model
+
+
+@pytest.fixture(scope="module")
+def app():
+    from main import app
+
+    install_stub_model()
+    return app
+
+
+@pytest.mark.parametrize("count", [1000, 10000])
+def bench_ai_query(benchmark, app, count):
+    seed_transactions(count)
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    def query():
+        return loop.run_until_complete(client.post(
+            "/ai/query", json={"query": "How much did I spend last month?", "user_id": BENCH_USER}
+        ))
+
+    try:
+        response = benchmark(query)
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+    assert response.status_code == 200
+    assert "Stub answer" in response.json()["response"]["response"]
@@ -0,0 +1,27 @@
+from datetime import date, timedelta
+
+import pytest
+
+from integrations.llm.mutual_fund_pipeline import MutualFundAnalysisAgent
+from integrations.llm.tools import _filter_by_date_range
+
+from .generators import BENCH_SIZES, make_fund_portfolio, make_transactions
+
+
+@pytest.mark.parametrize("count", BENCH_SIZES)
+def bench_filter_by_date_range(benchmark, count):
+    # String dates, as the tool sees them after a JSON round trip
+    transactions = [{**t, "date": t["date"].isoformat()} for t in make_transactions(count)]
+    end = date.today()
+    start = end - timedelta(days=30)
+    result = benchmark(_filter_by_date_range, transactions, start, end)
+    assert 0 < len(result) < count
+
+
+@pytest.mark.parametrize("funds,months", [(6, 36), (20, 120)])
+def bench_calculate_portfolio_timeline(benchmark, funds, months):
+    agent = MutualFundAnalysisAgent()
+    portfolio = make_fund_portfolio(funds, months)
+    holdings = [agent.calculate_fund_metrics(fund) for fund in portfolio["mutual_funds"]]
+    timeline = benchmark(agent.calculate_portfolio_timeline, holdings)
+    assert len(timeline) == funds * months
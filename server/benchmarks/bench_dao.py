@@ -0,0 +1,32 @@
+import pytest
+
+from data.transaction_dao import batch_create, get_transactions_by_user_id
+
+from .generators import BENCH_SIZES, BENCH_USER, OTHER_USER, make_transactions, seed_transactions
+
+
+@pytest.mark.parametrize("count", [100, 500])
+def bench_batch_create(benchmark, count):
+    transactions = make_transactions(count)
+    # batch_create fills in the dicts it is given, so every round gets fresh copies
+    benchmark.pedantic(
+        batch_create,
+        setup=lambda: (([dict(t) for t in transactions],), {}),
+        rounds=20,
+    )
+
+
+@pytest.mark.parametrize("count", BENCH_SIZES)
+def bench_get_transactions_by_user_id(benchmark, count):
+    seed_transactions(count)
+    # Another user's documents in the same collection, as in production
+    seed_transactions(max(count // 10, 1), user_id=OTHER_USER, seed=7)
+    result = benchmark(get_transactions_by_user_id, BENCH_USER)
+    assert len(result) == count
+
+
+@pytest.mark.parametrize("count", BENCH_SIZES)
+def bench_get_transactions_by_user_id_projected(benchmark, count):
+    seed_transactions(count)
+    result = benchmark(get_transactions_by_user_id, BENCH_USER, ["date", "withdrawn", "deposit"])
+    assert len(result) == count
@@ -0,0 +1,42 @@
+import tempfile
+
+import pytest
+
+from data.firebase_client import db
+from services.import_service import run_statement_import
+
+from .generators import BENCH_SIZES, BENCH_USER, make_statement_csv
+
+
+def _spooled(content: bytes):
+    spool = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    spool.write(content)
+    return spool
+
+
+@pytest.mark.parametrize("count", BENCH_SIZES)
+def bench_statement_import(benchmark, count):
+    content = make_statement_csv(count)
+
+    # Every round imports into an empty store; the import closes its stream
+    def setup():
+        if hasattr(db, "reset"):
+            db.reset()
+        return ("bench-job", BENCH_USER, _spooled(content), "statement.csv"), {}
+
+    progress = benchmark.pedantic(run_statement_import, setup=setup, rounds=5)
+    assert progress["status"] == "done"
+    assert progress["created"] == count
+
+
+@pytest.mark.parametrize("count", BENCH_SIZES)
+def bench_statement_reimport(benchmark, count):
+    # Overlapping re-upload: every row is already stored and skipped
+    content = make_statement_csv(count)
+    run_statement_import("bench-job", BENCH_USER, _spooled(content), "statement.csv")
+    progress = benchmark.pedantic(
+        run_statement_import,
+        setup=lambda: (("bench-job", BENCH_USER, _spooled(content), "statement.csv"), {}),
+        rounds=5,
+    )
+    assert progress["skipped"] == count
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from integrations.llm.mcp import MCPClientPool
+
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_mcp_server.py")
+
+
+def _stub_params(timeout: float):
+    from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
+    from mcp import StdioServerParameters
+
+    return StdioConnectionParams(
+        server_params=StdioServerParameters(command=sys.executable, args=[STUB_SERVER]),
+        timeout=timeout,
+    )
+
+
+@pytest.fixture
+def pool():
+    loop = asyncio.new_event_loop()
+    pool = MCPClientPool()
+    pool.register("stub", _stub_params)
+    yield pool, loop
+    loop.run_until_complete(pool.close())
+    loop.close()
+
+
+def bench_mcp_get_tools_pooled(benchmark, pool):
+    pool, loop = pool
+    loop.run_until_complete(pool.get_tools("stub"))
+    tools = benchmark(lambda: loop.run_until_complete(pool.get_tools("stub")))
+    assert {t.name for t in tools} == {"fetch_bank_transactions", "fetch_net_worth"}
+
+
+def bench_mcp_tool_call_pooled(benchmark, pool):
+    pool, loop = pool
+    tools = {t.name: t for t in loop.run_until_complete(pool.get_tools("stub"))}
+    fetch = tools["fetch_bank_transactions"]
+    result = benchmark(lambda: loop.run_until_complete(fetch.run_async(args={"count": 5}, tool_context=None)))
+    assert result
+
+
+def bench_mcp_connect_per_build(benchmark):
+    """What every pipeline build paid before the pool: a fresh subprocess and session."""
+    loop = asyncio.new_event_loop()
+
+    async def connect_and_list():
+        pool = MCPClientPool()
+        pool.register("stub", _stub_params)
+        try:
+            return await pool.get_tools("stub")
+        finally:
+            await pool.close()
+
+    try:
+        tools = benchmark.pedantic(lambda: loop.run_until_complete(connect_and_list()), rounds=5)
+    finally:
+        loop.close()
+    assert tools
@@ -0,0 +1,45 @@
+import pytest
+
+from data.firebase_client import db
+from data.transaction_dao import TXNS, migrate_transaction_schema
+
+from .generators import BENCH_SIZES, make_transactions
+
+
+def _seed_legacy(transactions: list):
+    # The shape batch_create wrote before the canonical schema
+    collection = db.collection(TXNS)
+    for start in range(0, len(transactions), 500):
+        batch = db.batch()
+        for t in transactions[start:start + 500]:
+            batch.set(collection.document(), {
+                **t,
+                "date": t["date"].isoformat(),
+                "closing_balance": t["deposit"] - t["withdrawn"],
+            })
+        batch.commit()
+
+
+@pytest.mark.parametrize("count", BENCH_SIZES)
+def bench_migrate_transactions(benchmark, count):
+    transactions = make_transactions(count)
+
+    # Every round migrates a fresh legacy store from the start
+    def setup():
+        if hasattr(db, "reset"):
+            db.reset()
+        _seed_legacy(transactions)
+        return (), {}
+
+    state = benchmark.pedantic(migrate_transaction_schema, setup=setup, rounds=5)
+    assert state["status"] == "done"
+    assert state["migrated"] == count
+
+
+@pytest.mark.parametrize("count", BENCH_SIZES)
+def bench_migrate_resume(benchmark, count):
+    # A re-run over an already migrated store only skips documents
+    _seed_legacy(make_transactions(count))
+    migrate_transaction_schema()
+    state = benchmark.pedantic(migrate_transaction_schema, kwargs={"restart": True}, rounds=5)
+    assert state["current"] == count
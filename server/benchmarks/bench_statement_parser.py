@@ -0,0 +1,45 @@
+import io
+
+import pytest
+
+from services.statement_parser import parse_narration, parse_rows, parse_statement, rows_from_payload
+
+from .generators import BENCH_USER, make_statement_csv, make_transactions
+
+# Throughput target: 100k rows/s, i.e. a 100k-row statement in under a second
+PARSE_SIZES = [1000, 10000, 100000]
+PARSE_ROWS_PER_SEC = 100_000
+
+
+@pytest.mark.parametrize("count", PARSE_SIZES)
+def bench_parse_statement_csv(benchmark, count):
+    content = make_statement_csv(count)
+    result = benchmark(lambda: parse_statement(io.BytesIO(content), BENCH_USER, "statement.csv"))
+    assert len(result["transactions"]) == count
+    assert not result["unparsed"]
+    if not benchmark.disabled:
+        # Best round, so one noisy round does not fail the run
+        rows_per_sec = count / benchmark.stats.stats.min
+        assert rows_per_sec >= PARSE_ROWS_PER_SEC, f"{rows_per_sec:,.0f} rows/s"
+
+
+@pytest.mark.parametrize("count", PARSE_SIZES)
+def bench_parse_fi_payload(benchmark, count):
+    # Fi MCP bankTransactions shape: positional txns rows per bank
+    rows = [
+        [str(t["withdrawn"] or t["deposit"]), t["narration"], t["date"].isoformat(), 2 if t["withdrawn"] else 1, "UPI", "0"]
+        for t in make_transactions(count)
+    ]
+    payload = {"bankTransactions": [{"bank": "HDFC Bank", "txns": rows}]}
+
+    def parse():
+        unparsed = []
+        return list(parse_rows(rows_from_payload(payload), BENCH_USER, unparsed)), unparsed
+
+    transactions, unparsed = benchmark(parse)
+    assert len(transactions) == count and not unparsed
+
+
+def bench_parse_narration(benchmark):
+    narrations = [t["narration"] for t in make_transactions(1000)]
+    benchmark(lambda: [parse_narration(n) for n in narrations])
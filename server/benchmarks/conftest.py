@@ -0,0 +1,19 @@
+import os
+import sys
+
+# Must be set before anything imports data.firebase_client
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("OTEL_TRACES_EXPORTER", "none")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from data.firebase_client import db
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    if hasattr(db, "reset"):
+        db.reset()
+    yield
@@ -0,0 +1,145 @@
+"""
+Synthetic data in the shape seeder.py writes, scaled up for benchmarks.
+
+Everything is driven by a seeded random.Random, so the same size and seed
+produce the same data on every machine and every commit.
+"""
+import os
+import random
+from datetime import date, datetime, timedelta
+
+from data.firebase_client import db
+from data.transaction_dao import TXNS
+from data.transaction_schema import normalise_transaction
+
+BENCH_USER = "bench-user"
+OTHER_USER = "bench-other"
+
+# Transaction counts to benchmark at; BENCH_SIZES=1000,100000,1000000 for the full sweep
+BENCH_SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "1000,10000").split(",") if n.strip()]
+
+_MERCHANTS = ["Swiggy", "Zomato", "Amazon", "Flipkart", "Uber", "Ola", "BigBasket", "IRCTC", "Airtel", "BESCOM"]
+_PEOPLE = ["rahul", "priya", "amit", "sneha", "vikram", "anita"]
+_FUNDS = [
+    ("Parag Parikh Flexi Cap Fund - Direct Plan - Growth", "INF879O01027"),
+    ("Axis Bluechip Fund - Direct Plan - Growth", "INF846K01DP9"),
+    ("HDFC Equity Fund - Direct Plan - Growth", "INF179K01014"),
+    ("Mirae Asset Large Cap Fund - Direct Plan - Growth", "INF769K01AX2"),
+    ("SBI Small Cap Fund - Direct Plan - Growth", "INF200K01T51"),
+    ("ICICI Prudential Liquid Fund - Direct Plan - Growth", "INF109K01VQ1"),
+]
+
+
+def make_transactions(count: int, user_id: str = BENCH_USER, seed: int = 42, days: int = 730) -> list:
+    """
+    count transaction dicts spread over the last `days` days, newest last,
+    with a mix of card, UPI and salary narrations.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    transactions = []
+    for i in range(count):
+        txn_date = today - timedelta(days=days - (i * days) // max(count, 1))
+        kind = rng.random()
+        if kind < 0.05:
+            deposit, withdrawn, ttype = round(rng.uniform(50000, 150000), 2), 0.0, "credit"
+            narration = "NEFT-SALARY-ACME CORP"
+        elif kind < 0.35:
+            amount = round(rng.uniform(100, 5000), 2)
+            person = rng.choice(_PEOPLE)
+            deposit, withdrawn = (amount, 0.0) if rng.random() < 0.4 else (0.0, amount)
+            ttype = "credit" if deposit else "debit"
+            narration = f"UPI/{rng.randint(10**11, 10**12 - 1)}/{person}@okaxis/Payment"
+        else:
+            deposit, withdrawn, ttype = 0.0, round(rng.uniform(10, 3000), 2), "debit"
+            narration = f"POS {rng.choice(_MERCHANTS).upper()} {rng.randint(1000, 9999)}"
+        transactions.append({
+            "user_id": user_id,
+            "date": txn_date,
+            "narration": narration,
+            "withdrawn": withdrawn,
+            "deposit": deposit,
+            "type": ttype,
+            "tags": ["bench"],
+            "remarks": None,
+            "processed": "",
+        })
+    return transactions
+
+
+def seed_transactions(count: int, user_id: str = BENCH_USER, seed: int = 42) -> list:
+    """
+    Write count transactions straight to the configured backend in
+    500-document batches, bypassing batch_create so seeding stays out of
+    the numbers. Returns the generated documents.
+    """
+    transactions = make_transactions(count, user_id, seed)
+    now = datetime.utcnow()
+    collection = db.collection(TXNS)
+    for start in range(0, count, 500):
+        batch = db.batch()
+        for t in transactions[start:start + 500]:
+            batch.set(collection.document(), {
+                **normalise_transaction(t),
+                "created_at": now,
+                "updated_at": now,
+            })
+        batch.commit()
+    return transactions
+
+
+def make_statement_csv(count: int, seed: int = 42, days: int = 730) -> bytes:
+    """An HDFC-style statement export: account preamble, header, count rows of UPI, NEFT, IMPS and card narrations."""
+    rng = random.Random(seed)
+    today = date.today()
+    lines = [
+        "HDFC BANK Ltd.,,,,,,",
+        "Account No :,50100123456789,,,,,",
+        "Date,Narration,Chq./Ref.No.,Value Dt,Withdrawal Amt.,Deposit Amt.,Closing Balance",
+    ]
+    balance = 100000.0
+    for i in range(count):
+        day = (today - timedelta(days=days - (i * days) // max(count, 1))).strftime("%d/%m/%y")
+        ref = rng.randint(10**11, 10**12 - 1)
+        kind = rng.random()
+        withdrawn, deposit = round(rng.uniform(10, 5000), 2), ""
+        if kind < 0.05:
+            withdrawn, deposit = "", round(rng.uniform(50000, 150000), 2)
+            narration = f"NEFT CR-SBIN0000001-ACME CORP-SALARY-SBINN{ref}"
+        elif kind < 0.6:
+            person = rng.choice(_PEOPLE)
+            narration = f"UPI-{person.upper()}-{person}{rng.randint(1, 99)}@okaxis-UTIB0000{rng.randint(100, 999)}-{ref}-UPI"
+        elif kind < 0.7:
+            narration = f"IMPS-{ref}-{rng.choice(_PEOPLE).upper()}-HDFC0000001-XXXXXXXX1234-RENT"
+        else:
+            narration = f"POS 416021XXXXXX1234 {rng.choice(_MERCHANTS).upper()}"
+        balance += (deposit or 0) - (withdrawn or 0)
+        lines.append(f'{day},{narration},{ref:016d},{day},{withdrawn},{deposit},"{balance:,.2f}"')
+    return ("\n".join(lines) + "\n").encode()
+
+
+def make_fund_portfolio(funds: int = 6, months: int = 36, seed: int = 42) -> dict:
+    """A mutual_funds payload like SAMPLE_MUTUAL_FUND_DATA with monthly SIPs and the odd redemption."""
+    rng = random.Random(seed)
+    start = date.today().replace(day=1) - timedelta(days=30 * months)
+    mutual_funds = []
+    for f in range(funds):
+        name, isin = _FUNDS[f % len(_FUNDS)]
+        nav = rng.uniform(20, 200)
+        txns = []
+        for m in range(months):
+            nav *= 1 + rng.uniform(-0.04, 0.05)
+            day = (start + timedelta(days=30 * m + f)).isoformat()
+            if m and rng.random() < 0.08:
+                units = -round(rng.uniform(10, 50), 3)
+                txns.append([2, day, round(nav, 4), units, round(units * nav, 2)])
+            else:
+                amount = rng.choice([5000.0, 10000.0, 25000.0])
+                txns.append([1, day, round(nav, 4), round(amount / nav, 3), amount])
+        mutual_funds.append({
+            "schemeName": name if f < len(_FUNDS) else f"{name} #{f}",
+            "isin": isin,
+            "folioId": str(10000000 + f),
+            "txns": txns,
+        })
+    return {"mutual_funds": mutual_funds}
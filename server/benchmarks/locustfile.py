@@ -0,0 +1,40 @@
+"""
+Load scenario against a running server, normally `python -m benchmarks.serve`.
+
+  locust -f benchmarks/locustfile.py --host http://127.0.0.1:8000 --headless \
+      -u 50 -r 10 -t 2m --csv benchmarks/results/load
+
+The task weights approximate the dashboard's mix: mostly listings, some
+ledger and portfolio reads, and the occasional assistant query.
+"""
+from locust import HttpUser, between, task
+
+# generators.BENCH_USER; not imported so locust does not pull in the app
+BENCH_USER = "bench-user"
+
+
+class DashboardUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    @task(6)
+    def list_transactions(self):
+        self.client.get(f"/transactions/user/{BENCH_USER}", name="/transactions/user/[id]")
+
+    @task(2)
+    def list_transactions_projected(self):
+        self.client.get(
+            f"/transactions/user/{BENCH_USER}?fields=date,withdrawn,deposit",
+            name="/transactions/user/[id]?fields",
+        )
+
+    @task(2)
+    def ledger(self):
+        self.client.get(f"/users/{BENCH_USER}/ledger", name="/users/[id]/ledger")
+
+    @task(2)
+    def mutual_funds(self):
+        self.client.get("/api/mutual-funds/analysis?lean=true", name="/api/mutual-funds/analysis")
+
+    @task(1)
+    def ai_query(self):
+        self.client.post("/ai/query", json={"query": "How much did I spend last month?", "user_id": BENCH_USER})
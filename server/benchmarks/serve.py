@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Run the API fully offline for load tests: in-memory Firestore, seeded
+transactions and the stub Gemini model.
+
+Usage (from server/):
+  python -m benchmarks.serve --transactions 100000 --port 8000
+"""
+import argparse
+import os
+
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    from .generators import OTHER_USER, seed_transactions
+    from .stub_llm import install_stub_model
+    from main import app
+
+    seed_transactions(args.transactions)
+    seed_transactions(max(args.transactions // 10, 1), user_id=OTHER_USER, seed=7)
+    install_stub_model()
+    print(f"Seeded {args.transactions} transactions; serving on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+A Gemini stand-in for offline runs of the agent path.
+
+StubGemini answers every user turn by calling execute_dynamic_transaction_query
+with the user's text, then turns the tool's result into a one-line reply, so
+/ai/query exercises the runner, tools and DAOs without network or quota.
+"""
+import json
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+QUERY_TOOL = "execute_dynamic_transaction_query"
+
+
+class StubGemini(BaseLlm):
+    model: str = "stub-gemini"
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        last = llm_request.contents[-1] if llm_request.contents else None
+        parts = last.parts if last and last.parts else []
+        tool_result = next((p.function_response for p in parts if p.function_response), None)
+
+        if tool_result is not None:
+            result = tool_result.response or {}
+            text = f"Stub answer: {json.dumps(result, default=str)[:200]}"
+            part = types.Part.from_text(text=text)
+        else:
+            query = " ".join(p.text for p in parts if p.text) or "last month"
+            part = types.Part(function_call=types.FunctionCall(name=QUERY_TOOL, args={"query": query}))
+
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(prompt_token_count=0, candidates_token_count=0),
+        )
+
+
+def install_stub_model():
+    """Point the orchestrator at StubGemini; the runner picks it up on the next request."""
+    from integrations.llm import agentic
+
+    if agentic.orchestrator_agent is None:
+        agentic.initialize_agents()
+    agentic.orchestrator_agent.model = StubGemini()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the Fi MCP server, speaking MCP over stdio.
+
+  FI_MCP_COMMAND=python FI_MCP_ARGS="benchmarks/stub_mcp_server.py" python -m benchmarks.serve
+
+STUB_MCP_LATENCY_MS adds a fixed delay to every tool call to model the
+remote data fetch.
+"""
+import asyncio
+import os
+import random
+from datetime import date, timedelta
+
+try:
+    from mcp.server.fastmcp import FastMCP
+except ImportError:  # mcp 2.x renamed it
+    from mcp.server.mcpserver import MCPServer as FastMCP
+
+server = FastMCP("fi-stub")
+LATENCY = float(os.getenv("STUB_MCP_LATENCY_MS", "0")) / 1000
+
+
+@server.tool()
+async def fetch_bank_transactions(count: int = 5) -> dict:
+    """Latest bank transactions, newest first."""
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    rng = random.Random(count)
+    today = date.today()
+    return {
+        "bankTransactions": [
+            {
+                "date": (today - timedelta(days=i)).isoformat(),
+                "narration": f"UPI/{rng.randint(10**11, 10**12 - 1)}/stub@okaxis/Payment",
+                "amount": round(rng.uniform(10, 5000), 2),
+                "type": rng.choice(["DEBIT", "CREDIT"]),
+            }
+            for i in range(count)
+        ]
+    }
+
+
+@server.tool()
+async def fetch_net_worth() -> dict:
+    """Total assets and liabilities."""
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    return {"assets": 1250000.0, "liabilities": 320000.0}
+
+
+if __name__ == "__main__":
+    server.run()
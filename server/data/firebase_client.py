@@ -1,8 +1,32 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
 import os
+from google.auth.credentials import AnonymousCredentials
 
-cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), "../utils/firebase_cred.json"))
+# firestore (default) uses the service account in utils/firebase_cred.json;
+# emulator talks to FIRESTORE_EMULATOR_HOST with no credentials; memory keeps
+# everything in process (data/memory_client.py) for benchmarks and offline runs.
+FIRESTORE_BACKEND = os.getenv("FIRESTORE_BACKEND", "firestore").lower()
 
-firebase_admin.initialize_app(cred)
-db = firestore.client()
\ No newline at end of file
+
+class _EmulatorCredential(credentials.Base):
+    """The emulator accepts any caller, so skip the service account lookup."""
+
+    def get_credential(self):
+        return AnonymousCredentials()
+
+
+if FIRESTORE_BACKEND == "memory":
+    from .memory_client import MemoryFirestore
+
+    db = MemoryFirestore()
+elif FIRESTORE_BACKEND == "emulator":
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        raise RuntimeError("FIRESTORE_BACKEND=emulator needs FIRESTORE_EMULATOR_HOST")
+    firebase_admin.initialize_app(_EmulatorCredential(), options={"projectId": os.getenv("GCLOUD_PROJECT", "finvista-local")})
+    db = firestore.client()
+else:
+    cred = credentials.Certificate(os.path.join(os.path.dirname(__file__), "../utils/firebase_cred.json"))
+
+    firebase_admin.initialize_app(cred)
+    db = firestore.client()
@@ -0,0 +1,72 @@
+from .firebase_client import db
+from utils.metrics import observe_dao
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+HOLDINGS = "holdings"
+
+MUTUAL_FUND = "mutual_fund"
+STOCK = "stock"
+
+# Firestore batches are capped at 500 writes
+BATCH_LIMIT = 500
+
+# Transactions are stored column-wise, one array per field. Firestore cannot
+# store nested arrays, and a folio only ever grows by appending rows, so this
+# keeps each folio to a single small document.
+TXN_COLUMNS = ("txn_types", "txn_dates", "txn_prices", "txn_units", "txn_amounts")
+
+def holding_doc_id(user_id: str, asset_type: str, folio_key: str) -> str:
+    """Deterministic document id so re-importing a statement upserts the folio."""
+    return f"{user_id}_{asset_type}_{folio_key}".replace("/", "-")
+
+def rows_to_columns(rows: list) -> dict:
+    """Convert [[type, date, price, units, amount], ...] rows into column arrays."""
+    columns = {name: [] for name in TXN_COLUMNS}
+    for row in rows:
+        for name, value in zip(TXN_COLUMNS, row):
+            columns[name].append(value)
+    return columns
+
+def columns_to_rows(doc: dict) -> list:
+    """Inverse of rows_to_columns, yielding the row format the pipelines consume."""
+    return [list(row) for row in zip(*(doc.get(name, []) for name in TXN_COLUMNS))]
+
+@observe_dao(HOLDINGS)
+def get_holdings_by_ids(doc_ids: list):
+    logger.info("Getting %d holdings by id", len(doc_ids))
+    refs = [db.collection(HOLDINGS).document(doc_id) for doc_id in doc_ids]
+    return [{**d.to_dict(), "id": d.id} for d in db.get_all(refs) if d.exists]
+
+@observe_dao(HOLDINGS)
+def get_holdings_by_user_id(user_id: str, asset_type: str, updated_after=None):
+    """Return a user's folios of one asset type, optionally only those changed after a timestamp."""
+    logger.info("Getting %s holdings for user %s (updated after %s)", asset_type, user_id, updated_after)
+    query = (
+        db.collection(HOLDINGS)
+        .where("user_id", "==", user_id)
+        .where("asset_type", "==", asset_type)
+    )
+    if updated_after is not None:
+        query = query.where("updated_at", ">", updated_after)
+    return [{**d.to_dict(), "id": d.id} for d in query.stream()]
+
+@observe_dao(HOLDINGS)
+def save_holdings(holdings: list):
+    """Upsert folio documents, each carrying an "id" key, in batches."""
+    logger.info("Saving %d holdings", len(holdings))
+    now = datetime.utcnow()
+    ids = []
+    for start in range(0, len(holdings), BATCH_LIMIT):
+        batch = db.batch()
+        for holding in holdings[start:start + BATCH_LIMIT]:
+            data = dict(holding)
+            doc_id = data.pop("id")
+            data.setdefault("created_at", now)
+            data["updated_at"] = now
+            batch.set(db.collection(HOLDINGS).document(doc_id), data)
+            ids.append(doc_id)
+        batch.commit()
+    return ids
@@ -0,0 +1,26 @@
+from .firebase_client import db
+from utils.metrics import observe_dao
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One document per statement upload, keyed by job id
+IMPORT_JOBS = "import_jobs"
+
+@observe_dao(IMPORT_JOBS)
+def create_import_job(job_id: str, data: dict):
+    logger.info("Creating import job %s for user %s", job_id, data.get("user_id"))
+    now = datetime.utcnow()
+    db.collection(IMPORT_JOBS).document(job_id).set({**data, "created_at": now, "updated_at": now})
+
+@observe_dao(IMPORT_JOBS)
+def update_import_job(job_id: str, updates: dict):
+    logger.debug("Updating import job %s", job_id)
+    db.collection(IMPORT_JOBS).document(job_id).set({**updates, "updated_at": datetime.utcnow()}, merge=True)
+
+@observe_dao(IMPORT_JOBS)
+def get_import_job(job_id: str):
+    logger.debug("Getting import job %s", job_id)
+    doc = db.collection(IMPORT_JOBS).document(job_id).get()
+    return {**doc.to_dict(), "id": doc.id} if doc.exists else None
@@ -0,0 +1,475 @@
+"""
+In-process stand-in for the Firestore client, selected with
+FIRESTORE_BACKEND=memory (see firebase_client).
+
+Covers the subset of the API the DAOs use: documents (get, set with merge,
+update, create, delete), queries (where, order_by, also on "__name__",
+limit, start_after, select, count, stream/get), get_all, write batches,
+transactions, on_snapshot listeners and the Increment / ArrayUnion /
+ArrayRemove / SERVER_TIMESTAMP / DELETE_FIELD transforms. Data lives in
+dicts for the life of the process; there are no indexes or security
+rules. Listeners are called on the writing thread, under the client lock,
+once per write or committed batch. Meant for benchmarks and offline runs,
+not as a behavioural reference - use the Firestore emulator for that.
+"""
+import logging
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import Conflict, NotFound
+from google.cloud.firestore_v1.transforms import (
+    DELETE_FIELD, SERVER_TIMESTAMP, ArrayRemove, ArrayUnion, Increment
+)
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+logger = logging.getLogger(__name__)
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+
+def _apply(current: dict, data: dict, merge: bool) -> dict:
+    """Write data over current, resolving transforms; nested dicts merge when merge is set."""
+    result = dict(current) if merge else {}
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            result.pop(key, None)
+        elif value is SERVER_TIMESTAMP:
+            result[key] = datetime.now(timezone.utc)
+        elif isinstance(value, Increment):
+            result[key] = (result.get(key) or 0) + value.value
+        elif isinstance(value, ArrayUnion):
+            existing = list(result.get(key) or [])
+            result[key] = existing + [v for v in value.values if v not in existing]
+        elif isinstance(value, ArrayRemove):
+            result[key] = [v for v in result.get(key) or [] if v not in value.values]
+        elif isinstance(value, dict) and merge and isinstance(result.get(key), dict):
+            result[key] = _apply(result[key], value, True)
+        elif isinstance(value, dict):
+            result[key] = _apply({}, value, False)
+        else:
+            result[key] = _clone(value)
+    return result
+
+
+def _clone(value):
+    # Snapshots hand out copies, as deserialising a real document would
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+def _lookup(data: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def _field(doc_id: str, data: dict, path: str):
+    # __name__ is the document id, as in order_by("__name__")
+    return doc_id if path == "__name__" else _lookup(data, path)
+
+
+def _sort_key(value):
+    # Missing fields sort first, as null does in Firestore
+    return (value is not None, value)
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a is not None and a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a is not None and a not in b,
+    "array-contains": lambda a, b: isinstance(a, list) and b in a,
+    "array-contains-any": lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+
+class MemorySnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return _clone(self._data)
+
+    def get(self, field_path: str):
+        return _lookup(self._data or {}, field_path)
+
+
+class MemoryDocumentReference:
+    def __init__(self, client, collection: str, doc_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    @property
+    def path(self) -> str:
+        return f"{self._collection}/{self.id}"
+
+    def _docs(self) -> dict:
+        return self._client._store.setdefault(self._collection, {})
+
+    def get(self, field_paths=None, transaction=None):
+        data = self._docs().get(self.id)
+        if data is not None and field_paths:
+            data = {f: _lookup(data, f) for f in field_paths}
+        return MemorySnapshot(self, data)
+
+    def set(self, data: dict, merge: bool = False):
+        with self._client._lock:
+            docs = self._docs()
+            docs[self.id] = _apply(docs.get(self.id, {}), data, merge)
+            self._client._changed(self)
+
+    def create(self, data: dict):
+        with self._client._lock:
+            if self.id in self._docs():
+                raise Conflict(f"Document already exists: {self.path}")
+            self.set(data)
+
+    def update(self, data: dict):
+        with self._client._lock:
+            docs = self._docs()
+            if self.id not in docs:
+                raise NotFound(f"No document to update: {self.path}")
+            docs[self.id] = _apply(docs[self.id], data, True)
+            self._client._changed(self)
+
+    def delete(self):
+        with self._client._lock:
+            if self._docs().pop(self.id, None) is not None:
+                self._client._changed(self)
+
+    def _matches(self):
+        data = self._docs().get(self.id)
+        if data is not None:
+            yield self.id, data
+
+    def _watches(self, reference) -> bool:
+        return reference._collection == self._collection and reference.id == self.id
+
+    def on_snapshot(self, callback):
+        return _Watch(self._client, self, callback)
+
+
+class _AggregationResult:
+    def __init__(self, alias: str, value):
+        self.alias = alias
+        self.value = value
+
+
+class _CountQuery:
+    def __init__(self, query, alias: str):
+        self._query = query
+        self._alias = alias or "count"
+
+    def get(self, transaction=None):
+        return [[_AggregationResult(self._alias, sum(1 for _ in self._query._matches()))]]
+
+
+class MemoryQuery:
+    def __init__(self, client, collection: str, filters=(), orders=(), limit=None, start_after=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._start_after = start_after
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters, "orders": self._orders, "limit": self._limit,
+            "start_after": self._start_after, "fields": self._fields,
+        }
+        state.update(changes)
+        return MemoryQuery(self._client, self._collection, **state)
+
+    def where(self, field_path: str = None, op_string: str = None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, _OPERATORS[op_string], value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction == DESCENDING),))
+
+    def limit(self, count: int):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start_after=document_fields_or_snapshot)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def count(self, alias: str = None):
+        return _CountQuery(self, alias)
+
+    def _matches(self):
+        docs = self._client._store.get(self._collection, {})
+        for doc_id, data in list(docs.items()):
+            if all(op(_lookup(data, field), value) for field, op, value in self._filters):
+                yield doc_id, data
+
+    def _sorted(self) -> list:
+        rows = list(self._matches())
+        # Firestore breaks ties on the document id; sort from the least significant key up
+        rows.sort(key=lambda row: row[0])
+        for field, descending in reversed(self._orders):
+            rows.sort(key=lambda row: _sort_key(_field(row[0], row[1], field)), reverse=descending)
+        if self._start_after is not None:
+            rows = self._after_cursor(rows)
+        return rows[:self._limit] if self._limit is not None else rows
+
+    def _after_cursor(self, rows: list) -> list:
+        cursor = self._start_after
+        if isinstance(cursor, MemorySnapshot):
+            for position, (doc_id, _) in enumerate(rows):
+                if doc_id == cursor.id:
+                    return rows[position + 1:]
+            cursor = cursor._data or {}
+        keys = [(field, descending) for field, descending in self._orders if field in cursor]
+
+        def past(doc_id, data):
+            for field, descending in keys:
+                a, b = _field(doc_id, data, field), cursor[field]
+                if isinstance(b, MemoryDocumentReference):
+                    b = b.id
+                if a != b:
+                    return a < b if descending else a > b
+            return False
+
+        return [row for row in rows if past(*row)]
+
+    def stream(self, transaction=None):
+        for doc_id, data in self._sorted():
+            if self._fields is not None:
+                data = {f: _lookup(data, f) for f in self._fields if _lookup(data, f) is not None}
+            yield MemorySnapshot(MemoryDocumentReference(self._client, self._collection, doc_id), data)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+    def _watches(self, reference) -> bool:
+        return reference._collection == self._collection
+
+    def on_snapshot(self, callback):
+        return _Watch(self._client, self, callback)
+
+
+class _Watch:
+    """
+    An on_snapshot listener: the current matches as "added" right away, then
+    the changes of every write that touches the watched documents. Ordering,
+    limits and cursors of a watched query are ignored.
+    """
+
+    def __init__(self, client, target, callback):
+        self._client = client
+        self._target = target
+        self._callback = callback
+        with client._lock:
+            self._ids = set()
+            client._listeners.append(self)
+            self._deliver(None)
+
+    @property
+    def is_active(self) -> bool:
+        return self._callback is not None
+
+    def _snapshot(self, doc_id: str, data):
+        return MemorySnapshot(MemoryDocumentReference(self._client, self._target._collection, doc_id), data)
+
+    def _deliver(self, writes):
+        """Call back with what the written references changed; None is the initial read."""
+        if self._callback is None:
+            return
+        current = {doc_id: data for doc_id, data in self._target._matches()}
+        if writes is None:
+            touched = list(current)
+        else:
+            touched = list(dict.fromkeys(ref.id for ref in writes if self._target._watches(ref)))
+            if not touched:
+                return
+        changes = []
+        for doc_id in touched:
+            if doc_id in current:
+                kind = ChangeType.MODIFIED if doc_id in self._ids else ChangeType.ADDED
+                changes.append(DocumentChange(kind, self._snapshot(doc_id, current[doc_id]), -1, -1))
+            elif doc_id in self._ids:
+                changes.append(DocumentChange(ChangeType.REMOVED, self._snapshot(doc_id, None), -1, -1))
+        self._ids = set(current)
+        if writes is not None and not changes:
+            return
+        docs = [self._snapshot(doc_id, data) for doc_id, data in current.items()]
+        try:
+            self._callback(docs, changes, datetime.now(timezone.utc))
+        except Exception:
+            # A failing callback ends the listener, as it would the real
+            # watch, without failing the write that triggered it
+            logger.exception("Snapshot listener on %s failed; unsubscribing", self._target._collection)
+            self.unsubscribe()
+
+    def unsubscribe(self):
+        with self._client._lock:
+            self._callback = None
+            if self in self._client._listeners:
+                self._client._listeners.remove(self)
+
+
+class MemoryCollectionReference(MemoryQuery):
+    def __init__(self, client, name: str):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, document_id: str = None):
+        return MemoryDocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: dict, document_id: str = None):
+        ref = self.document(document_id)
+        ref.create(data)
+        return datetime.now(timezone.utc), ref
+
+
+class MemoryWriteBatch:
+    """Queues writes and applies them together on commit, like a Firestore batch."""
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, data: dict, merge: bool = False):
+        self._writes.append((reference, lambda: reference.set(data, merge=merge)))
+
+    def create(self, reference, data: dict):
+        self._writes.append((reference, lambda: reference.create(data)))
+
+    def update(self, reference, data: dict):
+        self._writes.append((reference, lambda: reference.update(data)))
+
+    def delete(self, reference):
+        self._writes.append((reference, reference.delete))
+
+    def commit(self):
+        undo = []
+        with self._client._lock:
+            # Listeners see the batch once, after every write has applied
+            self._client._pending = []
+            try:
+                for reference, write in self._writes:
+                    docs = reference._docs()
+                    undo.append((docs, reference.id, docs.get(reference.id)))
+                    write()
+            except Exception:
+                # All or nothing: put back what the earlier writes replaced
+                for docs, doc_id, previous in reversed(undo):
+                    if previous is None:
+                        docs.pop(doc_id, None)
+                    else:
+                        docs[doc_id] = previous
+                self._client._pending = None
+                raise
+            pending, self._client._pending = self._client._pending, None
+            self._client._notify(pending)
+        results, self._writes = self._writes, []
+        return results
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """
+    Enough of firestore_v1.Transaction for @firestore.transactional: the
+    client lock is held from begin to commit or rollback, so transactions
+    serialise instead of retrying.
+    """
+
+    _read_only = False
+    _max_attempts = 1
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._id = None
+
+    def _clean_up(self):
+        self._writes = []
+
+    def _begin(self, retry_id=None):
+        self._client._lock.acquire()
+        self._id = uuid.uuid4().bytes
+
+    def _commit(self):
+        try:
+            return self.commit()
+        finally:
+            self._release()
+
+    def _rollback(self):
+        self._writes = []
+        self._release()
+
+    def _release(self):
+        if self._id is not None:
+            self._id = None
+            self._client._lock.release()
+
+
+class MemoryFirestore:
+    def __init__(self):
+        self._store = {}
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._pending = None  # References written by the batch being committed
+
+    def _changed(self, reference):
+        if not self._listeners:
+            return
+        if self._pending is not None:
+            self._pending.append(reference)
+        else:
+            self._notify([reference])
+
+    def _notify(self, writes):
+        for watch in list(self._listeners):
+            watch._deliver(writes)
+
+    def collection(self, name: str):
+        return MemoryCollectionReference(self, name)
+
+    def collections(self):
+        return [self.collection(name) for name in self._store]
+
+    def document(self, path: str):
+        collection, doc_id = path.split("/", 1)
+        return self.collection(collection).document(doc_id)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        for ref in references:
+            yield ref.get(field_paths)
+
+    def batch(self):
+        return MemoryWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return MemoryTransaction(self)
+
+    def reset(self):
+        """Drop every collection; benchmarks call this between runs."""
+        with self._lock:
+            self._store = {}
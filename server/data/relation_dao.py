@@ -1,30 +1,161 @@
 from .firebase_client import db
+from utils.metrics import observe_dao
+from .transaction_dao import TXNS
+from firebase_admin import firestore
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 RELS = "relations"
+# Reverse index: one document per transaction id pointing at its relation
+REL_INDEX = "relation_index"
 
+# Fields a listing may project with ?fields=
+RELATION_FIELDS = frozenset({
+    "user_id", "primary_transaction", "primary_amount", "related_transactions",
+    "settlement_notes", "created_at", "updated_at"
+})
+
+def transaction_amount(txn: dict) -> float:
+    """Size of a transaction used to pick a relation's primary member"""
+    return max(txn.get("deposit", 0) or 0, txn.get("withdrawn", 0) or 0)
+
+def _members(data: dict) -> set:
+    members = set(data.get("related_transactions") or [])
+    if data.get("primary_transaction"):
+        members.add(data["primary_transaction"])
+    return members
+
+def _set_index(batch, rel_id: str, data: dict, now):
+    primary = data.get("primary_transaction")
+    for txn_id in _members(data):
+        batch.set(db.collection(REL_INDEX).document(txn_id), {
+            "relation_id": rel_id,
+            "user_id": data.get("user_id"),
+            "is_primary": txn_id == primary,
+            "updated_at": now
+        })
+
+def _delete_index(batch, txn_ids):
+    for txn_id in txn_ids:
+        batch.delete(db.collection(REL_INDEX).document(txn_id))
+
+@observe_dao(RELS)
 def create_relation(data: dict):
     logger.info("Creating relation")
     now = datetime.utcnow()
     ref = db.collection(RELS).document()
     data.update({"created_at": now, "updated_at": now})
-    ref.set(data)
+    batch = db.batch()
+    batch.set(ref, data)
+    _set_index(batch, ref.id, data, now)
+    batch.commit()
     return {**data, "id": ref.id}
 
+@observe_dao(RELS)
+def bulk_create_relations(relations: list):
+    """Create many relations with their index entries in batches under Firestore's 500-write limit."""
+    logger.info("Bulk creating %d relations", len(relations))
+    now = datetime.utcnow()
+    created = []
+    batch = db.batch()
+    pending = 0
+    for data in relations:
+        writes = 1 + len(_members(data))
+        if pending and pending + writes > 500:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+        ref = db.collection(RELS).document()
+        data.update({"created_at": now, "updated_at": now})
+        batch.set(ref, data)
+        _set_index(batch, ref.id, data, now)
+        pending += writes
+        created.append({**data, "id": ref.id})
+    if pending:
+        batch.commit()
+    return created
+
+@observe_dao(RELS)
 def update_relation(rel_id: str, updates: dict):
     logger.info("Updating relation %s", rel_id)
-    updates["updated_at"] = datetime.utcnow()
-    db.collection(RELS).document(rel_id).update(updates)
-    doc = db.collection(RELS).document(rel_id).get()
+    now = datetime.utcnow()
+    updates["updated_at"] = now
+    ref = db.collection(RELS).document(rel_id)
+    if "related_transactions" in updates or "primary_transaction" in updates:
+        # Membership changed: the index needs the old member list to drop stale entries
+        old = ref.get()
+        old_data = old.to_dict() if old.exists else {}
+        new_data = {**old_data, **updates}
+        batch = db.batch()
+        batch.update(ref, updates)
+        _delete_index(batch, _members(old_data) - _members(new_data))
+        _set_index(batch, rel_id, new_data, now)
+        batch.commit()
+    else:
+        ref.update(updates)
+    doc = ref.get()
     if doc.exists:
         d = doc.to_dict()
         d["id"] = doc.id
         return d
     return None
 
+@observe_dao(RELS)
+def append_transaction(rel_id: str, txn_id: str, amount: float):
+    """
+    Add a transaction to a relation inside a Firestore transaction.
+
+    Only the new transaction's amount is compared against the cached
+    primary_amount, so the append is one read and one write however many
+    members the relation has, and concurrent appends retry instead of
+    overwriting each other.
+    """
+    logger.info("Appending transaction %s to relation %s", txn_id, rel_id)
+    rel_ref = db.collection(RELS).document(rel_id)
+
+    @firestore.transactional
+    def _append(transaction):
+        snapshot = rel_ref.get(transaction=transaction)
+        if not snapshot.exists:
+            raise Exception("Relation not found")
+        data = snapshot.to_dict()
+        if txn_id in data.get("related_transactions", []):
+            return {**data, "id": rel_id}
+
+        old_primary = data.get("primary_transaction")
+        primary_amount = data.get("primary_amount")
+        if primary_amount is None and old_primary:
+            # Relations created before primary_amount was cached
+            primary_doc = db.collection(TXNS).document(old_primary).get(transaction=transaction)
+            primary_amount = transaction_amount(primary_doc.to_dict()) if primary_doc.exists else None
+
+        now = datetime.utcnow()
+        updates = {"related_transactions": firestore.ArrayUnion([txn_id]), "updated_at": now}
+        is_primary = primary_amount is None or amount > primary_amount
+        if is_primary:
+            updates.update({"primary_transaction": txn_id, "primary_amount": amount})
+            if old_primary:
+                transaction.set(db.collection(REL_INDEX).document(old_primary), {"is_primary": False}, merge=True)
+        else:
+            updates["primary_amount"] = primary_amount
+        transaction.set(db.collection(REL_INDEX).document(txn_id), {
+            "relation_id": rel_id,
+            "user_id": data.get("user_id"),
+            "is_primary": is_primary,
+            "updated_at": now
+        })
+        transaction.update(rel_ref, updates)
+
+        related = data.get("related_transactions", []) + [txn_id]
+        data.update(updates)
+        data["related_transactions"] = related
+        return {**data, "id": rel_id}
+
+    return _append(db.transaction())
+
+@observe_dao(RELS)
 def get_relation(rel_id: str):
     logger.info("Getting relation %s", rel_id)
     doc = db.collection(RELS).document(rel_id).get()
@@ -34,16 +165,63 @@ def get_relation(rel_id: str):
         return d
     return None
 
-def get_relations_by_user_id(user_id: str):
+@observe_dao(RELS)
+def get_relations_by_user_id(user_id: str, fields: list = None):
     logger.info("Getting relations by user_id %s", user_id)
-    docs = db.collection(RELS).where("user_id", "==", user_id).stream()
+    query = db.collection(RELS).where("user_id", "==", user_id)
+    if fields:
+        query = query.select(fields)
+    docs = query.stream()
     return [{**d.to_dict(), "id": d.id} for d in docs]
 
+@observe_dao(RELS)
 def get_all_relations():
     logger.info("Getting all relations")
     docs = db.collection(RELS).stream()
     return [{**d.to_dict(), "id": d.id} for d in docs]
 
+@observe_dao(REL_INDEX)
+def get_relations_for_transactions(txn_ids: list) -> dict:
+    """Batch lookup of {transaction_id: {"relation_id", "is_primary"}} via the reverse index."""
+    logger.info("Looking up relations for %d transactions", len(txn_ids))
+    if not txn_ids:
+        return {}
+    refs = [db.collection(REL_INDEX).document(txn_id) for txn_id in set(txn_ids)]
+    result = {}
+    for doc in db.get_all(refs):
+        if doc.exists:
+            entry = doc.to_dict()
+            result[doc.id] = {"relation_id": entry["relation_id"], "is_primary": entry.get("is_primary", False)}
+    return result
+
+@observe_dao(RELS)
 def delete_relation(rel_id: str):
     logger.info("Deleting relation %s", rel_id)
-    db.collection(RELS).document(rel_id).delete()
\ No newline at end of file
+    ref = db.collection(RELS).document(rel_id)
+    doc = ref.get()
+    batch = db.batch()
+    if doc.exists:
+        _delete_index(batch, _members(doc.to_dict()))
+    batch.delete(ref)
+    batch.commit()
+
+@observe_dao(RELS)
+def rebuild_relation_index():
+    """Recreate index entries for every relation; used to backfill relations created before the index existed."""
+    logger.info("Rebuilding relation index")
+    now = datetime.utcnow()
+    count = 0
+    batch = db.batch()
+    pending = 0
+    for doc in db.collection(RELS).stream():
+        data = doc.to_dict()
+        _set_index(batch, doc.id, data, now)
+        pending += len(_members(data))
+        count += 1
+        if pending >= 400:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    if pending:
+        batch.commit()
+    return count
@@ -1,23 +1,68 @@
 from .firebase_client import db
+from utils.metrics import observe_dao
+from .transaction_dao import convert_dates_to_datetimes
+from firebase_admin import firestore
+from google.api_core.exceptions import Conflict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import hashlib
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 SPENDINGS = "spendings"
+# One counter document per user and month: {user_id}_{YYYY-MM}
+ROLLUPS = "spending_rollups"
+# One document per user whose rollups have been rebuilt from their spendings
+ROLLUP_STATE = "spending_rollup_state"
 
+# Fields a listing may project with ?fields=
+SPENDING_FIELDS = frozenset({"user_id", "date", "title", "category", "amount", "created_at", "updated_at"})
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Firestore batches are capped at 500 writes, rollup updates included
+BATCH_LIMIT = 500
+BULK_WRITE_WORKERS = int(os.getenv("BULK_WRITE_WORKERS", "8"))
+
+def _month(value) -> str:
+    return value.strftime("%Y-%m")
+
+def _rollup_ref(user_id: str, month: str):
+    return db.collection(ROLLUPS).document(f"{user_id}_{month}")
+
+def _apply_rollup(batch, spending: dict, sign: int, now):
+    """Add (sign=1) or remove (sign=-1) a spending from its month's per-category counters; batch may be a transaction."""
+    if not spending.get("user_id") or not spending.get("date"):
+        return
+    month = _month(spending["date"])
+    batch.set(_rollup_ref(spending["user_id"], month), {
+        "user_id": spending["user_id"],
+        "month": month,
+        "totals": {spending.get("category") or "uncategorized": firestore.Increment(sign * (spending.get("amount") or 0))},
+        "count": firestore.Increment(sign),
+        "updated_at": now
+    }, merge=True)
+
+@observe_dao(SPENDINGS)
 def create_spending(spending_data: dict):
     logger.info("Creating spending")
     now = datetime.utcnow()
     ref = db.collection(SPENDINGS).document()
     data = {
-        **spending_data,
+        **convert_dates_to_datetimes(dict(spending_data)),
         "created_at": now,
         "updated_at": now
     }
-    ref.set(data)
+    batch = db.batch()
+    batch.set(ref, data)
+    _apply_rollup(batch, data, 1, now)
+    batch.commit()
     return {"id": ref.id, **data}
 
+@observe_dao(SPENDINGS)
 def get_spending_by_id(spending_id: str):
     logger.info("Getting spending by id %s", spending_id)
     doc = db.collection(SPENDINGS).document(spending_id).get()
@@ -27,33 +72,251 @@ def get_spending_by_id(spending_id: str):
         return data
     return None
 
-def get_all_spendings():
-    logger.info("Getting all spendings")
-    docs = db.collection(SPENDINGS).stream()
+@observe_dao(SPENDINGS)
+def get_spendings_by_user_id(user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None, fields: list = None):
+    """
+    One page of a user's spendings, newest first.
+
+    Backed by the (user_id, date desc) composite index. The cursor is the id
+    of the last spending on the previous page; next_cursor is None on the
+    last page. fields projects each item onto those fields plus its id.
+    """
+    logger.info("Getting spendings for user %s (limit %d, cursor %s)", user_id, limit, cursor)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = (
+        db.collection(SPENDINGS)
+        .where("user_id", "==", user_id)
+        .order_by("date", direction=firestore.Query.DESCENDING)
+    )
+    if cursor:
+        last = db.collection(SPENDINGS).document(cursor).get()
+        if not last.exists:
+            raise ValueError("Invalid cursor")
+        query = query.start_after(last)
+    if fields:
+        query = query.select(fields)
+    docs = list(query.limit(limit).stream())
+    return {
+        "items": [{**d.to_dict(), "id": d.id} for d in docs],
+        "next_cursor": docs[-1].id if len(docs) == limit else None
+    }
+
+@observe_dao(ROLLUPS)
+def get_spending_rollups(user_id: str, start_month: str = None, end_month: str = None):
+    """Monthly per-category totals for a user, oldest month first; months are YYYY-MM."""
+    logger.info("Getting spending rollups for user %s (%s to %s)", user_id, start_month, end_month)
+    query = db.collection(ROLLUPS).where("user_id", "==", user_id)
+    if start_month:
+        query = query.where("month", ">=", start_month)
+    if end_month:
+        query = query.where("month", "<=", end_month)
+    docs = query.order_by("month").stream()
     return [{**d.to_dict(), "id": d.id} for d in docs]
 
+@observe_dao(SPENDINGS)
 def update_spending(spending_id: str, updates: dict):
     logger.info("Updating spending %s", spending_id)
-    updates["updated_at"] = datetime.utcnow()
-    db.collection(SPENDINGS).document(spending_id).update(updates)
+    now = datetime.utcnow()
+    updates = convert_dates_to_datetimes(updates)
+    updates["updated_at"] = now
+    ref = db.collection(SPENDINGS).document(spending_id)
+    if not {"user_id", "date", "category", "amount"} & updates.keys():
+        ref.update(updates)
+        return
+    # The counters need the old values to move the amount between buckets;
+    # reading them in the transaction keeps racing writes from both
+    # subtracting the same spending
 
+    @firestore.transactional
+    def _update(transaction):
+        old = ref.get(transaction=transaction)
+        old_data = old.to_dict() if old.exists else {}
+        transaction.update(ref, updates)
+        _apply_rollup(transaction, old_data, -1, now)
+        _apply_rollup(transaction, {**old_data, **updates}, 1, now)
+
+    _update(db.transaction())
+
+@observe_dao(SPENDINGS)
 def delete_spending(spending_id: str):
     logger.info("Deleting spending %s", spending_id)
-    db.collection(SPENDINGS).document(spending_id).delete()
+    ref = db.collection(SPENDINGS).document(spending_id)
+
+    @firestore.transactional
+    def _delete(transaction):
+        # Read in the transaction so concurrent deletes subtract the rollup once
+        doc = ref.get(transaction=transaction)
+        if doc.exists:
+            _apply_rollup(transaction, doc.to_dict(), -1, datetime.utcnow())
+        transaction.delete(ref)
+
+    _delete(db.transaction())
 
+def spending_doc_id(spending: dict, occurrence: int = 0) -> str:
+    """
+    Deterministic document id for bulk ingestion.
+
+    A client-supplied idempotency_key wins; otherwise the row's content is
+    hashed. occurrence numbers identical rows within one request, so two
+    equal coffees on the same day stay two spendings while a retry of the
+    same request maps onto the same ids.
+    """
+    key = spending.get("idempotency_key")
+    if key:
+        source = f"{spending.get('user_id')}|key|{key}"
+    else:
+        day = spending.get("date")
+        source = "|".join(str(part) for part in (
+            spending.get("user_id"),
+            day.isoformat() if hasattr(day, "isoformat") else day,
+            spending.get("title"),
+            spending.get("category"),
+            spending.get("amount"),
+            occurrence
+        ))
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+def _chunk(rows: list):
+    """Split (doc_id, data) rows so each chunk's spendings plus its rollup documents fit in one batch."""
+    chunk, months = [], set()
+    for doc_id, data in rows:
+        month = (data.get("user_id"), _month(data["date"])) if data.get("date") else None
+        extra = 1 + (month is not None and month not in months)
+        if chunk and len(chunk) + len(months) + extra > BATCH_LIMIT:
+            yield chunk
+            chunk, months = [], set()
+        chunk.append((doc_id, data))
+        if month is not None:
+            months.add(month)
+    if chunk:
+        yield chunk
+
+def _write_chunk(chunk: list, now):
+    """
+    Create the chunk's missing spendings and their rollups in one batch.
+
+    Writes use create() so a concurrent retry that got there first fails the
+    whole batch instead of double-counting rollups; the chunk is then
+    re-checked and only the still-missing rows are written.
+    """
+    while True:
+        refs = [db.collection(SPENDINGS).document(doc_id) for doc_id, _ in chunk]
+        existing = {doc.id for doc in db.get_all(refs) if doc.exists}
+        pending = [(doc_id, data) for doc_id, data in chunk if doc_id not in existing]
+        if not pending:
+            return [], [doc_id for doc_id, _ in chunk]
+
+        batch = db.batch()
+        rollups = {}
+        for doc_id, data in pending:
+            batch.create(db.collection(SPENDINGS).document(doc_id), data)
+            if data.get("user_id") and data.get("date"):
+                rollup = rollups.setdefault((data["user_id"], _month(data["date"])), {"totals": {}, "count": 0})
+                category = data.get("category") or "uncategorized"
+                rollup["totals"][category] = rollup["totals"].get(category, 0) + (data.get("amount") or 0)
+                rollup["count"] += 1
+        for (user_id, month), rollup in rollups.items():
+            batch.set(_rollup_ref(user_id, month), {
+                "user_id": user_id,
+                "month": month,
+                "totals": {c: firestore.Increment(v) for c, v in rollup["totals"].items()},
+                "count": firestore.Increment(rollup["count"]),
+                "updated_at": now
+            }, merge=True)
+        try:
+            batch.commit()
+        except Conflict:
+            logger.info("Chunk raced with another writer, re-checking %d rows", len(chunk))
+            continue
+        return [doc_id for doc_id, _ in pending], sorted(existing)
+
+@observe_dao(SPENDINGS)
 def bulk_create_spendings(spendings: list):
-    logger.info("Bulk creating spendings")
-    batch = db.batch()
+    """
+    Idempotently create spendings in concurrent batches.
+
+    Returns {"created": [...], "skipped": [...], "duplicates": n} with
+    document ids; rows already written by an earlier attempt are skipped, so
+    a timed-out import can simply be retried. duplicates counts rows that
+    repeat an idempotency_key already used earlier in the same request;
+    they map onto that row's id and are not written again, so
+    len(created) + len(skipped) + duplicates is the number of rows sent.
+    """
+    logger.info("Bulk creating %d spendings", len(spendings))
     now = datetime.utcnow()
-    refs = []
+    rows, seen, occurrences = [], set(), {}
+    duplicates = 0
     for spending in spendings:
-        ref = db.collection(SPENDINGS).document()
-        data = {
-            **spending,
-            "created_at": now,
-            "updated_at": now
-        }
-        batch.set(ref, data)
-        refs.append(ref.id)
-    batch.commit()
-    return refs
\ No newline at end of file
+        data = convert_dates_to_datetimes(dict(spending))
+        base_id = spending_doc_id(data)
+        occurrence = occurrences.get(base_id, 0)
+        occurrences[base_id] = occurrence + 1
+        doc_id = spending_doc_id(data, occurrence) if occurrence else base_id
+        if doc_id in seen:
+            # Repeated idempotency key within one request
+            duplicates += 1
+            continue
+        seen.add(doc_id)
+        data.pop("idempotency_key", None)
+        data.update({"created_at": now, "updated_at": now})
+        rows.append((doc_id, data))
+
+    chunks = list(_chunk(rows))
+    created, skipped = [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(BULK_WRITE_WORKERS, len(chunks)))) as pool:
+        for chunk_created, chunk_skipped in pool.map(lambda c: _write_chunk(c, now), chunks):
+            created.extend(chunk_created)
+            skipped.extend(chunk_skipped)
+    logger.info("Bulk created %d spendings, skipped %d, %d duplicates", len(created), len(skipped), duplicates)
+    return {"created": created, "skipped": skipped, "duplicates": duplicates}
+
+@observe_dao(ROLLUPS)
+def rollups_rebuilt(user_id: str) -> bool:
+    return db.collection(ROLLUP_STATE).document(user_id).get().exists
+
+@observe_dao(ROLLUPS)
+def rebuild_spending_rollups(user_id: str = None) -> int:
+    """
+    Recompute the rollup counters from the spendings themselves, for one
+    user or everyone; used to backfill spendings written before the
+    counters existed. Months left without spendings are deleted. Returns
+    the number of rollup documents written.
+    """
+    logger.info("Rebuilding spending rollups for %s", user_id or "all users")
+    spendings = db.collection(SPENDINGS)
+    rollups_query = db.collection(ROLLUPS)
+    if user_id:
+        spendings = spendings.where("user_id", "==", user_id)
+        rollups_query = rollups_query.where("user_id", "==", user_id)
+
+    rollups = {}
+    users = {user_id} if user_id else set()
+    for doc in spendings.select(["user_id", "date", "category", "amount"]).stream():
+        data = doc.to_dict()
+        if not data.get("user_id") or not data.get("date"):
+            continue
+        users.add(data["user_id"])
+        rollup = rollups.setdefault((data["user_id"], _month(data["date"])), {"totals": {}, "count": 0})
+        category = data.get("category") or "uncategorized"
+        rollup["totals"][category] = rollup["totals"].get(category, 0) + (data.get("amount") or 0)
+        rollup["count"] += 1
+    current = {f"{u}_{m}" for u, m in rollups}
+    stale = [doc.reference for doc in rollups_query.select([]).stream() if doc.id not in current]
+
+    now = datetime.utcnow()
+    batch, pending = db.batch(), 0
+    writes = [(ref, None) for ref in stale]
+    writes += [(_rollup_ref(u, m), {"user_id": u, "month": m, **rollup, "updated_at": now}) for (u, m), rollup in rollups.items()]
+    writes += [(db.collection(ROLLUP_STATE).document(u), {"rebuilt_at": now}) for u in users]
+    for ref, data in writes:
+        if data is None:
+            batch.delete(ref)
+        else:
+            batch.set(ref, data)
+        pending += 1
+        if pending >= BATCH_LIMIT:
+            batch.commit()
+            batch, pending = db.batch(), 0
+    if pending:
+        batch.commit()
+    return len(rollups)
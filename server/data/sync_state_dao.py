@@ -0,0 +1,28 @@
+from .firebase_client import db
+from utils.metrics import observe_dao
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One document per user and source: {user_id}_{source}
+SYNC_STATE = "sync_state"
+
+def _state_ref(user_id: str, source: str):
+    return db.collection(SYNC_STATE).document(f"{user_id}_{source}")
+
+@observe_dao(SYNC_STATE)
+def get_sync_state(user_id: str, source: str):
+    logger.debug("Getting %s sync state for user %s", source, user_id)
+    doc = _state_ref(user_id, source).get()
+    return {**doc.to_dict(), "id": doc.id} if doc.exists else None
+
+@observe_dao(SYNC_STATE)
+def update_sync_state(user_id: str, source: str, updates: dict):
+    logger.info("Updating %s sync state for user %s", source, user_id)
+    _state_ref(user_id, source).set({
+        **updates,
+        "user_id": user_id,
+        "source": source,
+        "updated_at": datetime.utcnow()
+    }, merge=True)
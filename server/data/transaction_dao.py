@@ -1,10 +1,35 @@
 from .firebase_client import db
+from .transaction_schema import AMOUNT_FIELDS, LEGACY_FIELDS, SCHEMA_VERSION, normalise_transaction, normalise_update
+from utils.metrics import observe_dao
+from firebase_admin import firestore
+from google.api_core.exceptions import Conflict, NotFound
 from datetime import datetime, time, date
+import hashlib
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
 TXNS = "transactions"
+# Checkpoints of data migrations, one document per migration
+MIGRATIONS = "migrations"
+
+# Firestore batches are capped at 500 writes
+BATCH_LIMIT = 500
+# Ids of unmigratable documents kept on the migration checkpoint
+MAX_REPORTED_FAILURES = 100
+# Field path of the document id, for ordering and cursors
+DOCUMENT_ID = "__name__"
+
+# Bank reference numbers: 12-digit UPI/IMPS RRNs, or an explicit REF/UTR token
+BANK_REFERENCE = re.compile(r"\b(?:REF|UTR|RRN)[\s:#/-]*([A-Z0-9]{6,22})\b|\b(\d{12})\b")
+
+# Fields a listing may project with ?fields=
+TRANSACTION_FIELDS = frozenset({
+    "user_id", "date", "narration", "amount_paise", "withdrawn", "deposit", "closing_balance",
+    "type", "mode", "tags", "remarks", "processed", "category", "merchant", "schema_version",
+    "created_at", "updated_at"
+})
 
 def convert_dates_to_datetimes(data: dict) -> dict:
     for key, value in data.items():
@@ -12,18 +37,53 @@ def convert_dates_to_datetimes(data: dict) -> dict:
             data[key] = datetime.combine(value, time.min)
     return data
 
+def normalise_narration(narration: str) -> str:
+    """Upper-case, punctuation-free, single-spaced narration for comparisons."""
+    return " ".join(re.sub(r"[^A-Z0-9@.]+", " ", (narration or "").upper()).split())
+
+def bank_reference(txn: dict) -> str:
+    """The row's bank reference: an explicit reference field, else one found in the narration."""
+    explicit = txn.get("reference") or txn.get("ref")
+    if explicit:
+        return str(explicit).strip().upper()
+    match = BANK_REFERENCE.search((txn.get("narration") or "").upper())
+    return (match.group(1) or match.group(2)) if match else ""
+
+def transaction_fingerprint(txn: dict, occurrence: int = 0) -> str:
+    """
+    Deterministic document id for ingested bank rows.
+
+    Hashes the user, day, signed amount in paise, normalised narration and
+    bank reference, so the same row fetched again maps onto the same
+    document. occurrence numbers identical rows without a reference within
+    one fetch (two equal tea-stall payments on one day stay two
+    transactions).
+    """
+    day = txn.get("date")
+    if isinstance(day, datetime):
+        day = day.date()
+    if txn.get("amount_paise") is not None:
+        paise = txn["amount_paise"]
+    else:
+        paise = round(float(txn.get("amount") or (txn.get("deposit") or 0) - (txn.get("withdrawn") or 0)) * 100)
+    source = "|".join(str(part) for part in (
+        txn.get("user_id"),
+        day.isoformat() if hasattr(day, "isoformat") else day,
+        paise,
+        normalise_narration(txn.get("narration")),
+        bank_reference(txn),
+        occurrence
+    ))
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+@observe_dao(TXNS)
 def batch_create(transactions: list):
-    logger.info("Creating transactions")
+    logger.info("Creating %d transactions", len(transactions))
     batch = db.batch()
-    logger.info("Batch created %s", batch)
     now = datetime.utcnow()
-    logger.info("Now %s", now)
     refs = []
-    logger.info("Refs %s", refs)
     for t in transactions:
-        logger.info("Transaction %s", t)
         ref = db.collection(TXNS).document()
-        logger.info("Ref %s", ref)
         # Check if t is already a dictionary or has a dict() method
         if isinstance(t, dict):
             data = t
@@ -32,41 +92,113 @@ def batch_create(transactions: list):
         else:
             # Try to convert to dictionary using __dict__ if available
             data = vars(t) if hasattr(t, '__dict__') else {}
+        logger.debug("Transaction %s: %s", ref.id, data)
         
-        logger.info("Data %s", data)
-        
-        # Convert any date objects to datetime
-        data = convert_dates_to_datetimes(data)
-        
-        # Safely access deposit and withdrawn values
-        deposit = data.get('deposit', 0)
-        withdrawn = data.get('withdrawn', 0)
-        
+        # Signed paise, timestamp date, credit/debit type
+        data = normalise_transaction(data)
         data.update({
-            "closing_balance": deposit - withdrawn,
             "created_at": now,
             "updated_at": now
         })
         batch.set(ref, data)
         refs.append(ref.id)
-    logger.info("Refs %s", refs)
     batch.commit()
-    logger.info("Batch committed")
+    logger.debug("Created transactions %s", refs)
     return refs
 
+@observe_dao(TXNS)
+def create_missing_transactions(transactions: list, occurrences: dict = None):
+    """
+    Insert-if-absent under fingerprint ids; returns {"created": [...],
+    "skipped": [...], "duplicates": n}. duplicates counts rows repeating a
+    bank reference already seen in this call (or earlier calls sharing
+    occurrences), which are the same row and not written again.
+
+    Rows already stored are left untouched, so tags and categories added
+    since the first ingest survive a re-sync. Each chunk is checked with one
+    batched read and written with create(), so a concurrent sync that got
+    there first fails the batch instead of overwriting; the chunk is then
+    re-checked and only the still-missing rows are written.
+
+    Callers ingesting one statement over several calls pass the same
+    occurrences dict each time, so identical rows split across calls keep
+    distinct ids.
+    """
+    logger.info("Ingesting %d transactions", len(transactions))
+    now = datetime.utcnow()
+    rows = []
+    duplicates = 0
+    occurrences = {} if occurrences is None else occurrences
+    for t in transactions:
+        data = normalise_transaction(t)
+        base_id = transaction_fingerprint(data)
+        occurrence = occurrences.get(base_id, 0)
+        occurrences[base_id] = occurrence + 1
+        if occurrence and bank_reference(data):
+            # Same bank reference twice in one fetch is the same row
+            duplicates += 1
+            continue
+        doc_id = transaction_fingerprint(data, occurrence) if occurrence else base_id
+        data.update({"created_at": now, "updated_at": now})
+        rows.append((doc_id, data))
+
+    created, skipped = [], []
+    for start in range(0, len(rows), BATCH_LIMIT):
+        chunk = rows[start:start + BATCH_LIMIT]
+        while True:
+            refs = [db.collection(TXNS).document(doc_id) for doc_id, _ in chunk]
+            existing = {doc.id for doc in db.get_all(refs) if doc.exists}
+            pending = [(doc_id, data) for doc_id, data in chunk if doc_id not in existing]
+            if pending:
+                batch = db.batch()
+                for doc_id, data in pending:
+                    batch.create(db.collection(TXNS).document(doc_id), data)
+                try:
+                    batch.commit()
+                except Conflict:
+                    logger.info("Chunk raced with another sync, re-checking %d rows", len(chunk))
+                    continue
+            created.extend(doc_id for doc_id, _ in pending)
+            skipped.extend(sorted(existing))
+            break
+    logger.info(
+        "Ingested %d new transactions, skipped %d already stored and %d repeated",
+        len(created), len(skipped), duplicates
+    )
+    return {"created": created, "skipped": skipped, "duplicates": duplicates}
+
+def _canonical_update(updates: dict, current: dict = None) -> dict:
+    update = normalise_update(updates, current)
+    if current and AMOUNT_FIELDS & updates.keys():
+        # The amount now lives in amount_paise; drop what it was folded from
+        update.update({k: firestore.DELETE_FIELD for k in LEGACY_FIELDS if k in current})
+    return update
+
+@observe_dao(TXNS)
 def update_transaction(txn_id: str, updates: dict):
     logger.info("Updating transaction %s", txn_id)
+    ref = db.collection(TXNS).document(txn_id)
+    current = None
+    if AMOUNT_FIELDS & updates.keys():
+        snapshot = ref.get()
+        if not snapshot.exists:
+            raise NotFound(f"Transaction {txn_id} not found")
+        current = snapshot.to_dict()
+    updates = _canonical_update(updates, current)
     updates["updated_at"] = datetime.utcnow()
-    logger.info("Updates %s", updates)
-    db.collection(TXNS).document(txn_id).update(updates)
+    logger.debug("Updates %s", updates)
+    ref.update(updates)
     doc = db.collection(TXNS).document(txn_id).get()
-    d = doc.to_dict(); d["id"] = doc.id; logger.info("Doc %s", d); return d
+    d = doc.to_dict(); d["id"] = doc.id; logger.debug("Doc %s", d); return d
 
+@observe_dao(TXNS)
 def get_transactions_by_ids(ids: list):
-    logger.info("Getting transactions by ids %s", ids)
+    logger.info("Getting %d transactions by id", len(ids))
+    if not ids:
+        return []
     transactions = []
-    for doc_id in ids:
-        doc = db.collection(TXNS).document(doc_id).get()
+    # One batched read instead of a round trip per id
+    for doc in db.get_all([db.collection(TXNS).document(doc_id) for doc_id in ids]):
         if doc.exists:
             transaction_data = doc.to_dict()
             transaction_data["id"] = doc.id
@@ -74,6 +206,7 @@ def get_transactions_by_ids(ids: list):
     logger.info("Found %d transactions", len(transactions))
     return transactions
 
+@observe_dao(TXNS)
 def get_all_transactions(processed_status=None):
     logger.info("Getting all transactions")
     collection = db.collection(TXNS)
@@ -82,18 +215,28 @@ def get_all_transactions(processed_status=None):
         collection = collection.where('processed', '==', processed_status)
     
     docs = collection.stream()
-    logger.info("Docs %s", docs)
     return [{**d.to_dict(), "id": d.id} for d in docs]
 
-def get_transactions_by_user_id(user_id: str):
+@observe_dao(TXNS)
+def get_transactions_by_user_id(user_id: str, fields: list = None):
     logger.info("Getting transactions by user_id %s", user_id)
-    docs = db.collection(TXNS).where("user_id", "==", user_id).stream()
+    query = db.collection(TXNS).where("user_id", "==", user_id)
+    if fields:
+        query = query.select(fields)
+    docs = query.stream()
     return [{**d.to_dict(), "id": d.id} for d in docs]
 
+def watch_transactions_by_user_id(user_id: str, callback):
+    """Register a Firestore listener on a user's transactions; call .unsubscribe() on the result to stop it."""
+    logger.info("Watching transactions for user %s", user_id)
+    return db.collection(TXNS).where("user_id", "==", user_id).on_snapshot(callback)
+
+@observe_dao(TXNS)
 def bulk_update_transactions(updates: list):
     logger.info("Bulk updating transactions")
     batch = db.batch()
     now = datetime.utcnow()
+    prepared = []
     for update in updates:
         # Handle both id and transaction_id formats
         if "id" in update:
@@ -104,11 +247,93 @@ def bulk_update_transactions(updates: list):
             if "updates" in update:
                 update = update["updates"]
         else:
-            logger.error(f"Missing ID field in update: {update}")
+            logger.error("Missing ID field in update: %s", update)
             continue
-            
+        prepared.append((txn_id, update))
+
+    # Amount and type changes are merged with the stored row, read in one batch
+    needs_current = [db.collection(TXNS).document(txn_id) for txn_id, update in prepared if AMOUNT_FIELDS & update.keys()]
+    current = {doc.id: doc.to_dict() for doc in db.get_all(needs_current) if doc.exists} if needs_current else {}
+    for txn_id, update in prepared:
+        if AMOUNT_FIELDS & update.keys() and txn_id not in current:
+            raise NotFound(f"Transaction {txn_id} not found")
+        update = _canonical_update(update, current.get(txn_id))
         update["updated_at"] = now
-        ref = db.collection(TXNS).document(txn_id)
-        batch.update(ref, update)
+        batch.update(db.collection(TXNS).document(txn_id), update)
     batch.commit()
-    logger.info("Bulk update completed")
\ No newline at end of file
+    logger.info("Bulk update completed")
+
+def _fabricated_balance(data: dict) -> bool:
+    # batch_create used to store deposit - withdrawn as the closing balance
+    closing = data.get("closing_balance")
+    amount = (data.get("deposit") or 0) - (data.get("withdrawn") or 0)
+    return closing is not None and "balance" not in data and amount != 0 and closing == amount
+
+def migrate_transaction_schema(page_size: int = 200, restart: bool = False, max_pages: int = None) -> dict:
+    """
+    Rewrite stored transactions into the canonical schema (data.transaction_schema).
+
+    Documents are read in id order, a page at a time, and each page is
+    rewritten in one Firestore transaction together with the checkpoint in
+    migrations/transactions_schema_v<N>. An interrupted run resumes after
+    the last page committed; restart=True starts from the first document.
+    Documents already at SCHEMA_VERSION are skipped. Documents that cannot
+    be normalised (an unsigned amount without a credit/debit type, an
+    unreadable date) are left as they are and listed in failed_ids.
+
+    Returns the checkpoint: last_id, migrated, current, failed, failed_ids
+    and status ("done", or "paused" when max_pages ran out first).
+    """
+    page_size = max(1, min(page_size, BATCH_LIMIT - 1))
+    checkpoint_ref = db.collection(MIGRATIONS).document(f"{TXNS}_schema_v{SCHEMA_VERSION}")
+    snapshot = checkpoint_ref.get()
+    state = {"last_id": None, "migrated": 0, "current": 0, "failed": 0, "failed_ids": []}
+    if snapshot.exists and not restart:
+        state.update(snapshot.to_dict())
+    logger.info("Migrating transactions to schema v%d from %s", SCHEMA_VERSION, state["last_id"] or "the start")
+
+    @firestore.transactional
+    def _migrate_page(transaction, refs):
+        page = dict(state, failed_ids=list(state["failed_ids"]))
+        now = datetime.utcnow()
+        docs = [doc for doc in db.get_all(refs, transaction=transaction) if doc.exists]
+        for doc in docs:
+            data = doc.to_dict()
+            if data.get("schema_version") == SCHEMA_VERSION:
+                page["current"] += 1
+                continue
+            if _fabricated_balance(data):
+                data["closing_balance"] = None
+            try:
+                canonical = normalise_transaction(data)
+            except ValueError as e:
+                logger.warning("Leaving transaction %s unmigrated: %s", doc.id, e)
+                page["failed"] += 1
+                if len(page["failed_ids"]) < MAX_REPORTED_FAILURES:
+                    page["failed_ids"].append(doc.id)
+                continue
+            canonical["updated_at"] = now
+            transaction.set(doc.reference, canonical)
+            page["migrated"] += 1
+        page.update({"last_id": refs[-1].id, "status": "running", "updated_at": now})
+        transaction.set(checkpoint_ref, page)
+        return page
+
+    pages = 0
+    while max_pages is None or pages < max_pages:
+        query = db.collection(TXNS).order_by(DOCUMENT_ID).select([]).limit(page_size)
+        if state["last_id"]:
+            query = query.start_after({DOCUMENT_ID: db.collection(TXNS).document(state["last_id"])})
+        refs = [doc.reference for doc in query.stream()]
+        if refs:
+            state = _migrate_page(db.transaction(), refs)
+            pages += 1
+            logger.info("Migrated transactions up to %s: %d rewritten, %d failed", state["last_id"], state["migrated"], state["failed"])
+        if len(refs) < page_size:
+            state["status"] = "done"
+            break
+    else:
+        state["status"] = "paused"
+    state["updated_at"] = datetime.utcnow()
+    checkpoint_ref.set(state)
+    return state
@@ -0,0 +1,151 @@
+"""
+Canonical shape of a stored transaction.
+
+  amount_paise     int, signed: credits positive, debits negative
+  withdrawn        float rupees, -amount_paise / 100 for debits, else 0
+  deposit          float rupees, amount_paise / 100 for credits, else 0
+  type             "credit" or "debit", from the sign
+  date             timestamp (midnight for day-only dates)
+  closing_balance  the bank's running balance in rupees, or None
+  processed        "", "unprocessed" or "analyzed"
+  tags             list
+  schema_version   SCHEMA_VERSION
+
+withdrawn and deposit stay for the API and the agents; new readers sum
+amount_paise, which stays exact. Rows used to arrive in three shapes: REST
+(withdrawn/deposit), the LLM cleaner's (amount/balance, type "DIRECT") and
+seeded rows with a boolean processed flag. normalise_transaction folds all
+of them into this one on every write, and
+scripts/migrate_transactions.py rewrites documents stored before it.
+"""
+from datetime import date, datetime, time
+
+SCHEMA_VERSION = 1
+
+CREDIT, DEBIT = "credit", "debit"
+TRANSACTION_TYPES = (CREDIT, DEBIT)
+TYPE_ALIASES = {
+    "credit": CREDIT, "cr": CREDIT, "c": CREDIT, "deposit": CREDIT,
+    "debit": DEBIT, "dr": DEBIT, "d": DEBIT, "withdrawal": DEBIT,
+}
+
+PROCESSED_STATES = ("", "unprocessed", "analyzed")
+
+# Fields that decide amount_paise, withdrawn, deposit and type
+AMOUNT_FIELDS = frozenset({"amount_paise", "amount", "withdrawn", "deposit", "type"})
+# Legacy fields folded into canonical ones and dropped
+LEGACY_FIELDS = ("amount", "balance")
+
+DATE_FORMATS = ("%d/%m/%y", "%d/%m/%Y", "%d-%m-%Y")
+
+def to_paise(value) -> int:
+    """Rupees (number or numeric string) as integer paise."""
+    if isinstance(value, str):
+        value = value.replace(",", "").strip() or 0
+    return round(float(value or 0) * 100)
+
+def to_timestamp(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time.min)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            for fmt in DATE_FORMATS:
+                try:
+                    return datetime.strptime(value, fmt)
+                except ValueError:
+                    continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+def transaction_type(value):
+    """The canonical type for an alias such as "DR" or "Credit", or None."""
+    return TYPE_ALIASES.get(str(value).strip().lower()) if value is not None else None
+
+def _processed(value) -> str:
+    # seeder.py used to store booleans
+    if value is True:
+        return "analyzed"
+    if value is False:
+        return "unprocessed"
+    if value is None:
+        return ""
+    value = str(value).strip().lower()
+    if value not in PROCESSED_STATES:
+        raise ValueError(f"processed must be one of {', '.join(repr(s) for s in PROCESSED_STATES)}, not {value!r}")
+    return value
+
+def _balance(value):
+    return to_paise(value) / 100 if value not in (None, "") else None
+
+def amount_paise(data: dict) -> int:
+    """Signed paise from whichever amount fields a row carries; raises ValueError when the side is unknown."""
+    if data.get("amount_paise") is not None:
+        return int(data["amount_paise"])
+    withdrawn, deposit = to_paise(data.get("withdrawn")), to_paise(data.get("deposit"))
+    if withdrawn or deposit or data.get("amount") in (None, ""):
+        return deposit - withdrawn
+    paise = to_paise(data["amount"])
+    side = transaction_type(data.get("type"))
+    if paise <= 0 or side == CREDIT:
+        return paise
+    if side == DEBIT:
+        return -paise
+    raise ValueError(f"Cannot tell debit from credit: amount {data['amount']!r} with type {data.get('type')!r}")
+
+def _amount_fields(paise: int, side=None) -> dict:
+    return {
+        "amount_paise": paise,
+        "withdrawn": -paise / 100 if paise < 0 else 0.0,
+        "deposit": paise / 100 if paise > 0 else 0.0,
+        "type": DEBIT if paise < 0 else CREDIT if paise > 0 else side or CREDIT,
+    }
+
+def normalise_transaction(data: dict) -> dict:
+    """
+    Canonical copy of a transaction for writing. Raises ValueError when its
+    date, processed state or amount side cannot be read.
+    """
+    txn = {k: v for k, v in data.items() if k not in LEGACY_FIELDS}
+    txn["date"] = to_timestamp(data.get("date"))
+    txn.update(_amount_fields(amount_paise(data), transaction_type(data.get("type"))))
+    closing = data.get("closing_balance")
+    txn["closing_balance"] = _balance(closing if closing is not None else data.get("balance"))
+    txn["processed"] = _processed(data.get("processed"))
+    txn["tags"] = list(data.get("tags") or [])
+    txn["schema_version"] = SCHEMA_VERSION
+    return txn
+
+def normalise_update(updates: dict, current: dict = None) -> dict:
+    """
+    Canonical form of a partial update. Updates touching AMOUNT_FIELDS are
+    merged with the current document first: withdrawn/deposit/amount
+    replace its amount, a type on its own flips the sign of the existing
+    one.
+    """
+    out = {k: v for k, v in updates.items() if k not in LEGACY_FIELDS}
+    if "date" in updates:
+        out["date"] = to_timestamp(updates["date"])
+    if "processed" in updates:
+        out["processed"] = _processed(updates["processed"])
+    if "closing_balance" in updates or "balance" in updates:
+        closing = updates.get("closing_balance")
+        out["closing_balance"] = _balance(closing if closing is not None else updates.get("balance"))
+    if "tags" in updates:
+        out["tags"] = list(updates["tags"] or [])
+    if AMOUNT_FIELDS & updates.keys():
+        if current is None:
+            raise ValueError("Changing a transaction's amount or type needs its current document")
+        side = transaction_type(updates.get("type"))
+        if "type" in updates and side is None:
+            raise ValueError(f"type must be one of {', '.join(TRANSACTION_TYPES)}, not {updates['type']!r}")
+        if AMOUNT_FIELDS & updates.keys() == {"type"}:
+            paise = abs(amount_paise({**current, "type": side}))
+            paise = -paise if side == DEBIT else paise
+        else:
+            paise = amount_paise({"type": current.get("type"), **{k: updates[k] for k in AMOUNT_FIELDS if k in updates}})
+        out.update(_amount_fields(paise, side))
+        out["schema_version"] = SCHEMA_VERSION
+    return out
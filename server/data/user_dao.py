@@ -1,14 +1,79 @@
 from .firebase_client import db
+from utils.metrics import observe_dao
 from datetime import datetime
+from utils.cache import TTLCache
+import os
 
 USERS = "users"
 
+# Authenticated requests resolve the user on every call; cache the records so
+# most of them need no Firestore read. Entries are keyed both by id and by
+# email and are invalidated by update_user/bulk_update_users, which look up
+# the email before writing so the email entry goes even when the id one has.
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_MAX_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "300")),
+)
+
+def _cache_user(user: dict):
+    user_cache.set(("id", user["id"]), user)
+    user_cache.set(("email", user["email"]), user)
+
+def invalidate_cached_user(user_id: str, *emails):
+    """
+    Drop a user's cache entries. The email entry can outlive the id entry,
+    so callers pass the emails the user may be cached under (the one before
+    the write, and any new one).
+    """
+    user = user_cache.pop(("id", user_id))
+    stale = set(emails)
+    if user:
+        stale.add(user.get("email"))
+    for email in stale - {None}:
+        user_cache.pop(("email", email))
+
+def _current_emails(user_ids: list) -> dict:
+    """{user_id: email} before a write, from the cache or one batched read."""
+    emails, missing = {}, []
+    for user_id in user_ids:
+        user = user_cache.get(("id", user_id))
+        if user:
+            emails[user_id] = user.get("email")
+        else:
+            missing.append(user_id)
+    if missing:
+        for doc in db.get_all([db.collection(USERS).document(user_id) for user_id in missing]):
+            if doc.exists:
+                emails[doc.id] = doc.to_dict().get("email")
+    return emails
+
+@observe_dao(USERS)
 def get_user_by_email(email: str):
     docs = db.collection(USERS).where("email", "==", email).limit(1).stream()
     for d in docs:
         data = d.to_dict(); data["id"] = d.id; return data
     return None
 
+@observe_dao(USERS)
+def get_user_by_id(user_id: str):
+    doc = db.collection(USERS).document(user_id).get()
+    if doc.exists:
+        data = doc.to_dict()
+        data["id"] = doc.id
+        return data
+    return None
+
+def get_cached_user(user_id: str = None, email: str = None):
+    """Resolve a user by id (a direct document read) or email, serving repeat lookups from the cache."""
+    key = ("id", user_id) if user_id else ("email", email)
+    user = user_cache.get(key)
+    if user is None:
+        user = get_user_by_id(user_id) if user_id else get_user_by_email(email)
+        if user:
+            _cache_user(user)
+    return dict(user) if user else None
+
+@observe_dao(USERS)
 def create_user(name: str, email: str, hashed_password: str):
     now = datetime.utcnow()
     ref = db.collection(USERS).document()
@@ -21,6 +86,7 @@ def create_user(name: str, email: str, hashed_password: str):
     })
     return { "id": ref.id, "name": name, "email": email, "hashed_password": hashed_password, "created_at": now, "updated_at": now }
 
+@observe_dao(USERS)
 def get_users_by_ids(user_ids: list):
     if not user_ids:
         return []
@@ -33,16 +99,25 @@ def get_users_by_ids(user_ids: list):
             users.append(data)
     return users
 
+@observe_dao(USERS)
 def update_user(user_id: str, updates: dict):
+    previous = _current_emails([user_id])
     updates["updated_at"] = datetime.utcnow()
     db.collection(USERS).document(user_id).update(updates)
+    invalidate_cached_user(user_id, previous.get(user_id), updates.get("email"))
     
+@observe_dao(USERS)
 def bulk_update_users(updates: list):
     batch = db.batch()
     now = datetime.utcnow()
+    previous = _current_emails([update["id"] for update in updates])
+    new_emails = []
     for update in updates:
         user_id = update.pop("id")
         update["updated_at"] = now
         ref = db.collection(USERS).document(user_id)
         batch.update(ref, update)
-    batch.commit()
\ No newline at end of file
+        new_emails.append((user_id, update.get("email")))
+    batch.commit()
+    for user_id, email in new_emails:
+        invalidate_cached_user(user_id, previous.get(user_id), email)
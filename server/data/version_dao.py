@@ -0,0 +1,29 @@
+from .firebase_client import db
+from utils.metrics import observe_dao
+from firebase_admin import firestore
+import logging
+
+logger = logging.getLogger(__name__)
+
+@observe_dao()
+def get_collection_version(collection: str, user_id: str):
+    """
+    Cheap change marker for a user's documents in one collection: (latest updated_at, document count).
+
+    Both are index-only reads: a limit-1 projection over the
+    (user_id, updated_at desc) index and a count aggregation. The count is
+    what notices deletes, which leave no updated_at behind.
+    """
+    logger.debug("Getting %s version for user %s", collection, user_id)
+    query = db.collection(collection).where("user_id", "==", user_id)
+    latest = (
+        query.order_by("updated_at", direction=firestore.Query.DESCENDING)
+        .select(["updated_at"])
+        .limit(1)
+        .get()
+    )
+    count = query.count().get()
+    return (
+        latest[0].to_dict().get("updated_at") if latest else None,
+        count[0][0].value if count else 0
+    )
@@ -1 +0,0 @@
-from . import agentic
\ No newline at end of file
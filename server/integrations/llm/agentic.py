@@ -25,12 +25,9 @@ from .tools import (
 
 from .mutual_fund_pipeline import MutualFundDataAgent
 from .stocks_pipeline import StockDataAgent
+from utils.metrics import agent_callbacks
+from utils.tracing import traced, trace_events
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Import ADK components
@@ -41,14 +38,6 @@ from google.adk.sessions import InMemorySessionService
 import google.generativeai as genai
 from google.genai import types
 
-# Configure Gemini API
-# Get API key from environment variable
-API_KEY = os.environ.get("GEMINI_API_KEY")
-logger.info(f"GEMINI_API_KEY: {API_KEY}")
-if not API_KEY:
-    logger.warning("GEMINI_API_KEY not found in environment variables. Please set it in the .env file.")
-genai.configure(api_key=API_KEY)
-
 # Create orchestrator agent
 def create_orchestrator_agent():
     """Create the orchestrator agent with all tools directly attached."""
@@ -143,7 +132,8 @@ def create_orchestrator_agent():
         description="FinVista orchestrator agent for financial transaction processing",
         instruction=instruction,
         model="gemini-2.5-flash",
-        tools=orchestrator_tools
+        tools=orchestrator_tools,
+        **agent_callbacks()
     )
     
     return orchestrator_agent
@@ -164,6 +154,12 @@ def initialize_agents():
     global orchestrator_agent, orchestrator_runner
     
     try:
+        # Configure Gemini API from the environment
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            logger.warning("GEMINI_API_KEY not found in environment variables. Please set it in the .env file.")
+        genai.configure(api_key=api_key)
+
         # Create the orchestrator agent
         orchestrator_agent = create_orchestrator_agent()
         
@@ -176,13 +172,14 @@ def initialize_agents():
             session_service=session_service
         )
         
-        logger.info(f"Orchestrator agent '{orchestrator_agent.name}' initialized successfully")
+        logger.info("Orchestrator agent '%s' initialized successfully", orchestrator_agent.name)
         return True
     except Exception as e:
-        logger.error(f"Failed to initialize agents: {str(e)}")
+        logger.error("Failed to initialize agents: %s", e)
         return False
 
 # Function to process user requests through the orchestrator agent
+@traced("agentic.process_request")
 async def process_request(request: str, user_id: str = None) -> Dict[str, Any]:
     """
     Process a user request through the orchestrator agent.
@@ -221,7 +218,7 @@ async def process_request(request: str, user_id: str = None) -> Dict[str, Any]:
             
             # Check if session has expired
             if current_time - timestamp > SESSION_EXPIRATION_TIME:
-                logger.info(f"Session {session_id} for user {user_id} has expired. Creating a new one.")
+                logger.info("Session %s for user %s has expired. Creating a new one.", session_id, user_id)
                 # Create a new session
                 session = await orchestrator_runner.session_service.create_session(
                     app_name=app_name, 
@@ -230,11 +227,11 @@ async def process_request(request: str, user_id: str = None) -> Dict[str, Any]:
                 session_id = session.id
                 # Update the session with current timestamp
                 active_sessions[user_id] = (session_id, current_time)
-                logger.info(f"Created new session with ID: {session_id} for user: {user_id}")
+                logger.info("Created new session with ID: %s for user: %s", session_id, user_id)
             else:
                 # Update timestamp for the existing session
                 active_sessions[user_id] = (session_id, current_time)
-                logger.info(f"Using existing session with ID: {session_id} for user: {user_id}")
+                logger.info("Using existing session with ID: %s for user: %s", session_id, user_id)
         else:
             # Create a new session with the session service
             session = await orchestrator_runner.session_service.create_session(
@@ -244,7 +241,7 @@ async def process_request(request: str, user_id: str = None) -> Dict[str, Any]:
             session_id = session.id
             # Store the session ID and timestamp
             active_sessions[user_id] = (session_id, current_time)
-            logger.info(f"Created new session with ID: {session_id} for user: {user_id}")
+            logger.info("Created new session with ID: %s for user: %s", session_id, user_id)
         
         # Process the request through the orchestrator agent
         # Create a proper user content object using the types module
@@ -255,16 +252,16 @@ async def process_request(request: str, user_id: str = None) -> Dict[str, Any]:
         # Run the agent asynchronously with the proper parameters
         response = None
         try:
-            async for event in orchestrator_runner.run_async(
+            async for event in trace_events(orchestrator_runner.run_async(
                 user_id=user_id,
                 session_id=session_id,
                 new_message=user_content
-            ):
+            )):
                 if event.is_final_response():
                     response_text = event.content.parts[0].text
                     response = {"response": response_text}
         except Exception as e:
-            logger.error(f"Error during agent execution: {str(e)}")
+            logger.error("Error during agent execution: %s", e)
             return {
                 "error": "Failed to process request",
                 "message": str(e)
@@ -272,13 +269,8 @@ async def process_request(request: str, user_id: str = None) -> Dict[str, Any]:
         
         return response if response else {"response": "No response generated"}
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}")
+        logger.error("Error processing request: %s", e)
         return {
             "error": "Failed to process request",
             "message": str(e)
         }
-
-# Initialize agents when the module is imported
-if __name__ != "__main__":
-    logger.info("Initializing FinVista agent system...")
-    initialize_agents()
@@ -0,0 +1,104 @@
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Keyword lists in priority order: when a scheme name matches keywords from
+# several categories, the category listed first wins.
+FUND_CATEGORIES = {
+    'large_cap': ['large cap', 'bluechip', 'large & mid cap'],
+    'mid_cap': ['mid cap', 'midcap'],
+    'small_cap': ['small cap', 'smallcap'],
+    'multi_cap': ['multi cap', 'multicap', 'diversified'],
+    'flexi_cap': ['flexi cap', 'flexicap'],
+    'balanced_hybrid': ['balanced', 'advantage', 'hybrid', 'conservative', 'aggressive'],
+    'sectoral_thematic': ['gold', 'banking', 'pharma', 'it', 'technology', 'auto', 'infra', 'energy', 'fmcg'],
+    'index': ['index', 'nifty', 'sensex', 'etf'],
+    'debt': ['debt', 'bond', 'gilt', 'liquid', 'ultra short', 'short term', 'medium term', 'long term'],
+    'international': ['international', 'global', 'us', 'nasdaq', 'emerging'],
+}
+
+# Keywords this short must match a whole word; longer ones only need to start
+# one, so 'infra' still matches "Infrastructure".
+WHOLE_WORD_MAX_LENGTH = 3
+
+# Manual corrections keyed by ISIN, applied before keyword matching
+CATEGORY_OVERRIDES: Dict[str, str] = {}
+
+OTHER = 'Other'
+
+
+def _display_name(category: str) -> str:
+    return category.replace('_', ' ').title()
+
+
+class FundCategorizer:
+    """
+    Categorises schemes by name with a single precompiled regex.
+
+    Keywords are anchored at word boundaries, so 'it' no longer matches
+    "Equity" and 'us' no longer matches "Focused". Results are memoised by
+    ISIN, which makes re-categorising a known universe a dictionary lookup.
+    """
+
+    def __init__(self, categories: Optional[Dict[str, List[str]]] = None,
+                 overrides: Optional[Dict[str, str]] = None):
+        categories = categories if categories is not None else FUND_CATEGORIES
+        self.overrides = dict(CATEGORY_OVERRIDES if overrides is None else overrides)
+
+        self._rank = {}
+        self._keyword_category = {}
+        for rank, (category, keywords) in enumerate(categories.items()):
+            self._rank[category] = rank
+            for keyword in keywords:
+                self._keyword_category.setdefault(keyword, category)
+
+        # Longest keywords first so "large & mid cap" is preferred over "mid cap"
+        keywords = sorted(self._keyword_category, key=len, reverse=True)
+        prefixes = [re.escape(k) for k in keywords if len(k) > WHOLE_WORD_MAX_LENGTH]
+        words = [re.escape(k) for k in keywords if len(k) <= WHOLE_WORD_MAX_LENGTH]
+        branches = []
+        if prefixes:
+            branches.append(r'\b(?:' + '|'.join(prefixes) + r')')
+        if words:
+            branches.append(r'\b(?:' + '|'.join(words) + r')\b')
+        self._pattern = re.compile('|'.join(branches) or r'(?!)')
+
+        self._cache: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _match(self, fund_name: str) -> str:
+        best = None
+        for match in self._pattern.finditer(fund_name.lower()):
+            category = self._keyword_category[match.group(0)]
+            if best is None or self._rank[category] < self._rank[best]:
+                best = category
+                if self._rank[best] == 0:
+                    break
+        return _display_name(best) if best else OTHER
+
+    def categorize(self, fund_name: str, isin: Optional[str] = None) -> str:
+        """Return the display category for a scheme, consulting overrides and the ISIN cache first"""
+        if isin:
+            if isin in self.overrides:
+                return self.overrides[isin]
+            cached = self._cache.get(isin)
+            if cached is not None:
+                return cached
+        category = self._match(fund_name or '')
+        if isin:
+            with self._lock:
+                self._cache[isin] = category
+        return category
+
+    def categorize_many(self, schemes: Iterable[Tuple[str, Optional[str]]]) -> List[str]:
+        """Bulk variant for ingestion: takes (scheme name, ISIN) pairs"""
+        return [self.categorize(name, isin) for name, isin in schemes]
+
+    def set_override(self, isin: str, category: str):
+        with self._lock:
+            self.overrides[isin] = category
+            self._cache.pop(isin, None)
+
+
+# Shared instance so the ISIN cache survives across pipeline instances
+default_categorizer = FundCategorizer()
@@ -1,10 +1,15 @@
+import asyncio
+import json
 import os
 import logging
 from dotenv import load_dotenv
 from google.adk import Agent, Runner
 from google.adk.tools.function_tool import FunctionTool as Tool
-from google.adk.agents import SequentialAgent
+from google.adk.agents import BaseAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
 from google.adk.sessions import InMemorySessionService
+from google.genai import types
 import google.generativeai as genai
 
 # Custom exception for pipeline termination
@@ -16,37 +21,37 @@ class MCPFailureException(Exception):
 
 # Load environment variables from .env file
 load_dotenv()
-from .tools import save_bulk_transactions, bulk_update_transactions, get_all_transactions, get_current_user_id, get_sample_transactions
+from .tools import SYNC_WINDOW_START, save_bulk_transactions, bulk_update_transactions, get_all_transactions, get_current_user_id, get_sample_transactions, get_sync_watermark
 from .mcp import initialiseFiMCP
+from services.statement_parser import parse_rows, rows_from_payload
+from services.sync_service import sync_transactions, sync_window_start
+from utils.metrics import agent_callbacks
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Configure Gemini API
-API_KEY = os.environ.get("GEMINI_API_KEY")
-if not API_KEY:
-    logger.warning("GEMINI_API_KEY not found in environment variables.")
-genai.configure(api_key=API_KEY)
-
-def create_transaction_fetcher_agent(mcp_tools: list):
+def create_transaction_fetcher_agent(mcp_tools: list, user_id: str):
     """Agent 1: Fetches transactions using gemini-2.5-flash."""
+    # Only rows newer than the user's sync watermark need to be transferred
+    def get_sync_watermark_wrapper():
+        return get_sync_watermark(user_id)
+
     return Agent(
         name="transaction_fetcher",
         model="gemini-2.5-flash",
         description="Fetches financial transactions from MCP or sample data.",
         instruction='''
-        1. Try to fetch 5 latest transactions from the MCP using the available MCP tools.
+        1. Call get_sync_watermark_wrapper first.
+           - If it returns a "fetch_since" date, fetch only transactions on or after that date from the MCP.
+           - If "fetch_since" is empty, fetch the 5 latest transactions from the MCP.
         2. If the MCP fails or no MCP tools are available.
         3. Return the raw transaction data without any processing.
         4. Ensure the data is properly formatted for the next agent in the pipeline.
         
         Output the fetched transactions in a structured format that can be easily processed by subsequent agents.
         ''',
-        tools=mcp_tools
+        tools=mcp_tools + [Tool(get_sync_watermark_wrapper)],
+        output_key="fetched_transactions",
+        **agent_callbacks()
     )
 
 def create_user_id_fetcher_agent(user_id: str):
@@ -71,11 +76,12 @@ def create_user_id_fetcher_agent(user_id: str):
            - Return the user_id in a clear format for use by subsequent agents
            - This user_id will be used to associate all transactions with the correct user
         ''',
-        tools=[Tool(get_user_id_wrapper)]
+        tools=[Tool(get_user_id_wrapper)],
+        **agent_callbacks()
     )
 
 def create_data_cleaner_agent():
-    """Agent 3: Cleans and stores transaction data using gemini-2.5-pro."""
+    """Fallback for Agent 3: cleans and stores the rows the statement parser could not read, using gemini-2.5-pro."""
     return Agent(
         name="data_cleaner",
         model="gemini-2.5-pro",
@@ -90,11 +96,15 @@ def create_data_cleaner_agent():
         2. If previous agents succeeded, you will receive:
            - Raw transaction data from the transaction_fetcher agent
            - User ID from the user_id_fetcher agent
+           - If the statement_parser agent reported rows it could not parse, it has already stored
+             every other row: clean and store ONLY the rows it listed.
         
         3. Clean the transaction data:
            - Convert all `date` fields to ISO 8601 datetime strings (e.g., "2025-07-24T00:00:00") or Python `datetime.datetime` objects.
-           - Remove duplicates based on a combination of fields such as `date`, `amount`, and `narration`.
-           - Standardize field names to match the schema: `amount`, `narration`, `date`, `type`, `mode`, `balance`, `user_id`.
+           - Do not deduplicate: `save_bulk_transactions` skips rows that are already stored.
+           - Keep any bank reference (UPI/IMPS reference number, UTR) in the narration or a `reference` field.
+           - Standardize field names to match the schema: `withdrawn`, `deposit`, `narration`, `date`, `type`, `mode`, `closing_balance`, `user_id`.
+           - Money going out goes in `withdrawn` with type "debit"; money coming in goes in `deposit` with type "credit". Both are positive rupee amounts and the other one is 0.
            - Ensure all fields are Firestore-compatible (no `datetime.date` types or unsupported objects).
            - Add the user_id to each transaction record.
 
@@ -105,33 +115,154 @@ def create_data_cleaner_agent():
         [
             {
                 "user_id": "user_123",
-                "amount": 248.0,
+                "withdrawn": 248.0,
+                "deposit": 0,
                 "narration": "UPI-ALIENKIND PRIVATE",
                 "date": "2025-07-24T00:00:00",
-                "type": "DIRECT",
+                "type": "debit",
                 "mode": "OTHERS",
-                "balance": 8242.88,
+                "closing_balance": 8242.88,
                 "processed": "unprocessed"
             },
             {
                 "user_id": "user_123",
-                "amount": 6000.0,
+                "withdrawn": 0,
+                "deposit": 6000.0,
                 "narration": "UPI-KISHOR R JADHAV",
                 "date": "2025-07-22T00:00:00",
-                "type": "DIRECT",
+                "type": "credit",
                 "mode": "OTHERS",
-                "balance": 11560.88,
+                "closing_balance": 11560.88,
                 "processed": "unprocessed"
             }
         ]
         ```
         
         6. Confirm successful storage and pass the transaction count to the next agent.
-        7. Strictly add "processed": "unprocessed" to each transaction and strictly add type as "DIRECT".
+        7. Strictly add "processed": "unprocessed" to each transaction and strictly set type to "debit" or "credit" to match the amount.
         ''',
-        tools=[Tool(save_bulk_transactions)]
+        tools=[Tool(save_bulk_transactions)],
+        **agent_callbacks()
     )
 
+def _tool_payloads(response):
+    """Decoded JSON carried by one MCP tool response (structuredContent, or text content parts)."""
+    if not isinstance(response, dict) or response.get("isError"):
+        return
+    structured = response.get("structuredContent")
+    if isinstance(structured, (dict, list)):
+        yield structured
+        return
+    parts = response.get("content") or [{"text": response.get("result")}]
+    for part in parts:
+        text = part.get("text") if isinstance(part, dict) else None
+        if isinstance(text, (dict, list)):
+            yield text
+        elif isinstance(text, str):
+            try:
+                yield json.loads(text)
+            except ValueError:
+                continue
+
+def _json_in_text(text: str):
+    """The first JSON object or array embedded in an agent's reply, or None."""
+    decoder = json.JSONDecoder()
+    for i, char in enumerate(text or ""):
+        if char in "[{":
+            try:
+                return decoder.raw_decode(text[i:])[0]
+            except ValueError:
+                continue
+    return None
+
+class StatementParserAgent(BaseAgent):
+    """
+    Agent 3: parses the fetched statement without a model call.
+
+    Takes the MCP tool responses the fetcher recorded in this invocation,
+    parses every row with services.statement_parser and stores them through
+    sync_transactions. Only rows the parser cannot read are handed to the
+    LLM cleaner, which is skipped when there are none.
+    """
+    user_id: str
+    fallback: BaseAgent
+
+    def __init__(self, user_id: str, fallback: BaseAgent):
+        super().__init__(
+            name="statement_parser",
+            description="Parses fetched bank transactions deterministically and stores them; the LLM cleaner handles leftovers.",
+            user_id=user_id,
+            fallback=fallback,
+            sub_agents=[fallback],
+        )
+
+    def _fetched_payloads(self, ctx: InvocationContext) -> list:
+        payloads = []
+        for event in ctx.session.events:
+            if event.invocation_id != ctx.invocation_id or event.author != "transaction_fetcher" or not event.content:
+                continue
+            for part in event.content.parts or []:
+                response = part.function_response
+                if response and response.name != "get_sync_watermark_wrapper":
+                    payloads.extend(_tool_payloads(response.response))
+        if not payloads:
+            # No tool output recorded (e.g. sample data): fall back to JSON in the fetcher's reply
+            payload = _json_in_text(ctx.session.state.get("fetched_transactions") or "")
+            if payload is not None:
+                payloads.append(payload)
+        return payloads
+
+    def _reply(self, ctx: InvocationContext, text: str, state: dict = None) -> Event:
+        return Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            actions=EventActions(state_delta=state or {}),
+        )
+
+    async def _run_async_impl(self, ctx: InvocationContext):
+        fetched = ctx.session.state.get("fetched_transactions") or ""
+        if "MCP_FAILURE:" in fetched:
+            yield self._reply(ctx, "PIPELINE_TERMINATED: MCP failed in previous step")
+            return
+
+        payloads = self._fetched_payloads(ctx)
+        if not payloads:
+            logger.info("No structured transaction data fetched, handing over to %s", self.fallback.name)
+            async for event in self.fallback.run_async(ctx):
+                yield event
+            return
+
+        transactions, unparsed = [], []
+        for payload in payloads:
+            transactions.extend(parse_rows(rows_from_payload(payload), self.user_id, unparsed))
+        # Read before storing: the fallback's rows are judged against the same window
+        start = await asyncio.to_thread(sync_window_start, self.user_id)
+        result = await asyncio.to_thread(sync_transactions, self.user_id, transactions, window_start=start) if transactions else {
+            "created": [], "skipped": 0, "stale": 0, "watermark": None
+        }
+        summary = {
+            "parsed": len(transactions),
+            "created": len(result["created"]),
+            "skipped": result["skipped"],
+            "stale": result["stale"],
+            "unparsed": len(unparsed),
+        }
+        logger.info("Statement parser for user %s: %s", self.user_id, summary)
+        text = (
+            f"Parsed and stored {summary['parsed']} transactions for user {self.user_id}: "
+            f"{summary['created']} new, {summary['skipped']} already stored, {summary['stale']} before the sync window."
+        )
+        if unparsed:
+            rows = json.dumps([u["row"] for u in unparsed], default=str)
+            text += f"\n{len(unparsed)} rows could not be parsed and still need cleaning and storing:\n{rows}"
+        yield self._reply(ctx, text, {"statement_parse": summary, SYNC_WINDOW_START: start.isoformat() if start else None})
+
+        if unparsed:
+            async for event in self.fallback.run_async(ctx):
+                yield event
+
 def create_data_tagger_agent(user_id: str):
     """Agent 4: Tags transactions with categories using gemini-2.5-pro."""
     def get_user_id_wrapper():
@@ -169,7 +300,6 @@ def create_data_tagger_agent(user_id: str):
                        "category": "standardized_category",
                        "merchant": "extracted_merchant_name",
                        "tags": ["relevant", "tags"],
-                       "type": "standardized_type",
                        "processed": "analyzed"
                    }
                }
@@ -179,13 +309,14 @@ def create_data_tagger_agent(user_id: str):
         7. For ambiguous transactions, use 'UNCATEGORIZED' rather than guessing.
         8. Maintain consistency by using standard naming for similar transactions.
         9. Directly return the return without any additional summarization and text after the response from bulk_update_transactions tool.
-        10. Strictly add "processed": "analyzed" to each transaction.
+        10. Strictly add "processed": "analyzed" to each transaction. Do not change amounts or `type` (always "debit" or "credit").
         ''',
         tools=[
             Tool(get_all_transactions),
             Tool(bulk_update_transactions),
             Tool(get_user_id_wrapper)
-        ]
+        ],
+        **agent_callbacks()
     )
 
 async def create_four_agent_pipeline(user_id: str):
@@ -198,16 +329,16 @@ async def create_four_agent_pipeline(user_id: str):
         mcp_tools = []
         
     # Create all 4 agents
-    transaction_fetcher = create_transaction_fetcher_agent(mcp_tools)
+    transaction_fetcher = create_transaction_fetcher_agent(mcp_tools, user_id)
     user_id_fetcher = create_user_id_fetcher_agent(user_id)
-    data_cleaner = create_data_cleaner_agent()
+    statement_parser = StatementParserAgent(user_id, fallback=create_data_cleaner_agent())
     data_tagger = create_data_tagger_agent(user_id)
     
     # Create sequential pipeline
     return SequentialAgent(
         name="four_agent_data_pipeline",
-        sub_agents=[transaction_fetcher, user_id_fetcher, data_cleaner, data_tagger],
-        description="A 4-agent pipeline: fetch transactions (flash), fetch user ID (flash), clean & store data (pro), tag transactions (pro)."
+        sub_agents=[transaction_fetcher, user_id_fetcher, statement_parser, data_tagger],
+        description="A 4-agent pipeline: fetch transactions (flash), fetch user ID (flash), parse & store data (LLM cleaner only for unparsed rows), tag transactions (pro)."
     )
 
 # Global variables for the pipeline and runner
@@ -218,6 +349,11 @@ async def initialize_pipeline(User_id: str):
     """Initializes the 4-agent pipeline and runner asynchronously."""
     global pipeline, runner
     if pipeline is None:
+        # Configure Gemini API from the environment
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            logger.warning("GEMINI_API_KEY not found in environment variables.")
+        genai.configure(api_key=api_key)
         pipeline = await create_four_agent_pipeline(User_id)
         session_service = InMemorySessionService()
         runner = Runner(
@@ -230,7 +366,7 @@ async def initialize_pipeline(User_id: str):
         logger.info("Agent distribution:")
         logger.info("  - transaction_fetcher: gemini-2.5-flash (with MCP failure detection)")
         logger.info("  - user_id_fetcher: gemini-2.5-flash (with termination check)") 
-        logger.info("  - data_cleaner: gemini-2.5-pro (with termination check)")
+        logger.info("  - statement_parser: deterministic, data_cleaner (gemini-2.5-pro) for unparsed rows only")
         logger.info("  - data_tagger: gemini-2.5-pro (with termination check)")
         
     # Create a session with the session service
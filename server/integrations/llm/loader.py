@@ -0,0 +1,70 @@
+"""
+Deferred loading of the agent system.
+
+google-adk, google-genai and the agents built on them take seconds to import
+and construct, so nothing on the CRUD path imports them. The app lifespan
+starts a background warm-up, and the /ai routes depend on get_agent_system,
+which waits for that warm-up or does the work itself on first use.
+
+  AGENT_WARMUP   background (default): load right after startup, off the event loop
+                 lazy: load on the first /ai request
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+_system = None
+_warmup = None
+_lock = threading.Lock()
+
+
+def _load() -> SimpleNamespace:
+    global _system
+    with _lock:
+        if _system is None:
+            start = time.perf_counter()
+            from google.genai import types
+            from . import agentic, initial_analyser
+
+            # The benchmark stub installs its own orchestrator first; keep it
+            if agentic.orchestrator_runner is None:
+                agentic.initialize_agents()
+            _system = SimpleNamespace(agentic=agentic, initial_analyser=initial_analyser, types=types)
+            logger.info("Agent system loaded in %.2fs", time.perf_counter() - start)
+    return _system
+
+
+def _log_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Agent warm-up failed: %s", task.exception())
+
+
+def start_agent_warmup():
+    """Begin loading the agent system in a worker thread; called from the app lifespan."""
+    global _warmup
+    if os.getenv("AGENT_WARMUP", "background").lower() != "background" or _warmup is not None:
+        return
+    _warmup = asyncio.get_running_loop().create_task(asyncio.to_thread(_load))
+    _warmup.add_done_callback(_log_failure)
+
+
+async def get_agent_system() -> SimpleNamespace:
+    """
+    FastAPI dependency: the loaded agentic and initial_analyser modules and
+    google.genai.types. The first callers wait for the warm-up; later ones
+    return immediately.
+    """
+    if _system is not None:
+        return _system
+    if _warmup is not None:
+        try:
+            # Shielded so a client disconnect does not cancel everyone's warm-up
+            return await asyncio.shield(_warmup)
+        except Exception:
+            pass  # Already logged; try again below
+    return await asyncio.to_thread(_load)
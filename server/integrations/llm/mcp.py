@@ -1,25 +1,203 @@
+"""
+Long-lived connections to MCP servers.
+
+Each MCPToolset over stdio runs its own `npx mcp-remote` subprocess (Node
+start-up plus a TLS handshake) until it is closed. MCPClientPool keeps one
+toolset per server for the life of the process and shares it between
+pipeline builds:
+
+- tool lists are cached for MCP_TOOLS_TTL seconds;
+- a health loop re-lists tools every MCP_HEALTH_INTERVAL seconds, and a
+  failure closes the session so the next call reconnects;
+- failed connects back off exponentially, from MCP_BACKOFF_BASE up to
+  MCP_BACKOFF_MAX seconds;
+- at most MCP_MAX_SESSIONS servers are connected at once, and the least
+  recently used one is closed to make room;
+- close(), called from the app lifespan, shuts every subprocess down.
+
+The Fi server is reached over streamable HTTP when FI_MCP_URL is set (no
+subprocess), otherwise over stdio with FI_MCP_COMMAND and FI_MCP_ARGS
+(default `npx mcp-remote https://mcp.fi.money:8080/mcp/stream`). Pointing
+those at benchmarks/stub_mcp_server.py gives a local stand-in.
+
+google-adk is imported on first connect, so importing this module is cheap.
+"""
+import asyncio
+import logging
 import os
-from dotenv import load_dotenv
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
+import random
+import shlex
+import time
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-async def initialiseFiMCP():
+FI_MCP = "fi"
+FI_MCP_DEFAULT_ARGS = "mcp-remote https://mcp.fi.money:8080/mcp/stream"
+
+
+class MCPUnavailable(Exception):
+    """The server could not be reached, or is backing off after recent failures."""
+
+
+class _Server:
+    def __init__(self, name: str, params_factory):
+        self.name = name
+        self.params_factory = params_factory
+        self.toolset = None
+        self.connected = False
+        self.tools = None
+        self.tools_at = 0.0
+        self.last_used = 0.0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.lock = asyncio.Lock()
+
+
+class MCPClientPool:
+    def __init__(
+        self,
+        max_sessions: int = 4,
+        tools_ttl: float = 300,
+        health_interval: float = 60,
+        backoff_base: float = 1,
+        backoff_max: float = 60,
+        timeout: float = 30,
+    ):
+        self.max_sessions = max_sessions
+        self.tools_ttl = tools_ttl
+        self.health_interval = health_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._servers = {}
+        self._health_task = None
+
+    def register(self, name: str, params_factory):
+        """Declare a server; params_factory builds its ADK connection params on first connect."""
+        if name not in self._servers:
+            self._servers[name] = _Server(name, params_factory)
+
+    async def get_tools(self, name: str) -> list:
+        """The server's tools, from cache while fresh; connects (or reconnects) as needed."""
+        server = self._servers[name]
+        server.last_used = time.monotonic()
+        if server.connected and server.tools is not None and time.monotonic() - server.tools_at < self.tools_ttl:
+            return server.tools
+        async with server.lock:
+            if server.connected and server.tools is not None and time.monotonic() - server.tools_at < self.tools_ttl:
+                return server.tools
+            return await self._refresh(server)
 
-    # Initialize the MCPToolset with the connection parameters including authentication
-    toolset = MCPToolset(
-        connection_params=StdioServerParameters(
-            command='npx',
-            args=[
-                'mcp-remote', 
-                'https://mcp.fi.money:8080/mcp/stream'
-            ],
-        )
+    async def _refresh(self, server: _Server) -> list:
+        # Caller holds server.lock
+        now = time.monotonic()
+        if now < server.retry_at:
+            raise MCPUnavailable(f"MCP server {server.name} unavailable, retrying in {server.retry_at - now:.0f}s")
+        if not server.connected:
+            await self._make_room(server)
+        if server.toolset is None:
+            from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset
+
+            server.toolset = MCPToolset(connection_params=server.params_factory(self.timeout))
+        start = time.perf_counter()
+        try:
+            tools = await asyncio.wait_for(server.toolset.get_tools(), self.timeout)
+        except Exception as e:
+            server.failures += 1
+            delay = min(self.backoff_base * 2 ** (server.failures - 1), self.backoff_max)
+            server.retry_at = time.monotonic() + delay * random.uniform(0.5, 1)
+            logger.warning("MCP server %s failed (%d in a row): %s", server.name, server.failures, e)
+            await self._disconnect(server)
+            raise MCPUnavailable(f"MCP server {server.name} unavailable: {e}") from e
+
+        if not server.connected:
+            logger.info("Connected to MCP server %s in %.2fs", server.name, time.perf_counter() - start)
+        server.connected = True
+        server.tools = tools
+        server.tools_at = time.monotonic()
+        server.failures = 0
+        server.retry_at = 0.0
+        self._ensure_health_checks()
+        return tools
+
+    async def _make_room(self, server: _Server):
+        connected = [s for s in self._servers.values() if s.connected and s is not server]
+        while len(connected) >= self.max_sessions:
+            # Servers mid-refresh are skipped rather than waited on, so two
+            # connects racing for the last slot cannot block each other
+            idle = [s for s in connected if not s.lock.locked()]
+            if not idle:
+                raise MCPUnavailable(f"All {self.max_sessions} MCP sessions are busy")
+            victim = min(idle, key=lambda s: s.last_used)
+            connected.remove(victim)
+            logger.info("Closing least recently used MCP server %s", victim.name)
+            await self._disconnect(victim)
+
+    async def _disconnect(self, server: _Server):
+        server.connected = False
+        if server.toolset is not None:
+            # The toolset stays: tools handed out keep pointing at it and
+            # reopen the session (and subprocess) on their next call
+            try:
+                await server.toolset.close()
+            except Exception as e:
+                logger.warning("Error closing MCP server %s: %s", server.name, e)
+
+    def _ensure_health_checks(self):
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for server in list(self._servers.values()):
+                if not server.connected:
+                    continue
+                async with server.lock:
+                    try:
+                        await self._refresh(server)
+                    except MCPUnavailable:
+                        pass  # Logged in _refresh; next use reconnects after the backoff
+
+    async def close(self):
+        """Stop health checks and close every session; called from the app lifespan."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for server in self._servers.values():
+            if server.toolset is not None:
+                await self._disconnect(server)
+                server.toolset = None
+                server.tools = None
+
+
+def _fi_params(timeout: float):
+    from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams, StreamableHTTPConnectionParams
+    from mcp import StdioServerParameters
+
+    url = os.getenv("FI_MCP_URL")
+    if url:
+        return StreamableHTTPConnectionParams(url=url, timeout=timeout)
+    return StdioConnectionParams(
+        server_params=StdioServerParameters(
+            command=os.getenv("FI_MCP_COMMAND", "npx"),
+            args=shlex.split(os.getenv("FI_MCP_ARGS", FI_MCP_DEFAULT_ARGS)),
+        ),
+        timeout=timeout,
     )
 
-    # Get the tools from the toolset
-    tools = await toolset.get_tools()
 
-    return tools
-    
\ No newline at end of file
+mcp_pool = MCPClientPool(
+    max_sessions=int(os.getenv("MCP_MAX_SESSIONS", "4")),
+    tools_ttl=float(os.getenv("MCP_TOOLS_TTL", "300")),
+    health_interval=float(os.getenv("MCP_HEALTH_INTERVAL", "60")),
+    backoff_base=float(os.getenv("MCP_BACKOFF_BASE", "1")),
+    backoff_max=float(os.getenv("MCP_BACKOFF_MAX", "60")),
+    timeout=float(os.getenv("MCP_TIMEOUT", "30")),
+)
+mcp_pool.register(FI_MCP, _fi_params)
+
+
+async def initialiseFiMCP():
+    """Tools of the Fi MCP server, over the pooled long-lived session."""
+    return await mcp_pool.get_tools(FI_MCP)
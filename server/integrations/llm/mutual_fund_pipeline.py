@@ -5,6 +5,9 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 import logging
 
+from .portfolio_common import group_holdings, top_and_bottom
+from .fund_categories import FUND_CATEGORIES, FundCategorizer, default_categorizer
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -37,6 +40,126 @@ class PortfolioAnalysis:
     top_performers: List[FundHolding]
     underperformers: List[FundHolding]
 
+# Sample portfolio served when no user-specific holdings are requested. Built
+# once at import; callers must treat it as read-only.
+SAMPLE_MUTUAL_FUND_DATA = {
+    "mutual_funds": [
+        {
+            "schemeName": "Parag Parikh Flexi Cap Fund - Direct Plan - Growth",
+            "isin": "INF879O01027",
+            "folioId": "22334455",
+            "txns": [
+                [1, "2023-11-15", 130.0, 300.0, 39000.0],
+                [1, "2023-12-15", 132.0, 295.45, 39000.0],
+                [1, "2024-01-15", 135.0, 288.89, 39000.0],
+                [1, "2024-02-15", 138.0, 282.61, 39000.0],
+                [1, "2024-03-15", 140.0, 278.57, 39000.0],
+                [1, "2024-04-15", 142.0, 274.65, 39000.0],
+                [2, "2024-05-15", 145.0, -100.0, -14500.0]
+            ]
+        },
+        {
+            "schemeName": "Axis Bluechip Fund - Direct Plan - Growth",
+            "isin": "INF846K01DP9",
+            "folioId": "44556677",
+            "txns": [
+                [1, "2023-12-05", 150.0, 200.0, 30000.0],
+                [1, "2024-01-05", 152.0, 197.37, 30000.0],
+                [1, "2024-02-05", 155.0, 193.55, 30000.0],
+                [1, "2024-03-05", 158.0, 189.87, 30000.0],
+                [1, "2024-04-05", 160.0, 187.5, 30000.0],
+                [1, "2024-05-05", 162.0, 185.19, 30000.0],
+                [2, "2024-06-05", 165.0, -50.0, -8250.0],
+                [1, "2024-07-05", 168.0, 178.57, 30000.0]
+            ]
+        },
+        {
+            "schemeName": "HDFC Equity Fund - Direct Plan - Growth",
+            "isin": "INF179K01014",
+            "folioId": "12345678",
+            "txns": [
+                [1, "2024-01-15", 120.0, 500.0, 60000.0],
+                [1, "2024-02-15", 122.5, 491.8, 60250.0],
+                [1, "2024-03-15", 125.0, 480.0, 60000.0],
+                [1, "2024-04-15", 128.0, 468.75, 60000.0],
+                [1, "2024-05-15", 130.0, 461.54, 60000.0],
+                [1, "2024-06-15", 132.0, 454.55, 60000.0],
+                [2, "2024-07-15", 135.0, -200.0, -27000.0]
+            ]
+        },
+        {
+            "schemeName": "Kotak Flexicap Fund - Direct Plan - Growth",
+            "isin": "INF174K01369",
+            "folioId": "99887766",
+            "txns": [
+                [1, "2024-02-20", 140.0, 250.0, 35000.0],
+                [1, "2024-03-20", 142.0, 246.48, 35000.0],
+                [1, "2024-04-20", 145.0, 241.38, 35000.0],
+                [1, "2024-05-20", 148.0, 236.49, 35000.0],
+                [1, "2024-06-20", 150.0, 233.33, 35000.0],
+                [2, "2024-07-20", 153.0, -100.0, -15300.0],
+                [1, "2024-08-20", 155.0, 225.81, 35000.0]
+            ]
+        },
+        {
+            "schemeName": "Mirae Asset Emerging Bluechip Fund - Direct Plan - Growth",
+            "isin": "INF769K01DN2",
+            "folioId": "66778899",
+            "txns": [
+                [1, "2024-04-01", 95.0, 500.0, 47500.0],
+                [1, "2024-05-01", 97.0, 489.69, 47500.0],
+                [1, "2024-06-01", 100.0, 475.0, 47500.0],
+                [1, "2024-07-01", 102.0, 465.69, 47500.0],
+                [2, "2024-08-01", 105.0, -150.0, -15750.0],
+                [1, "2024-09-01", 108.0, 439.81, 47500.0]
+            ]
+        },
+        {
+            "schemeName": "Nippon India Large Cap Fund - Direct Plan - Growth",
+            "isin": "INF204K01E10",
+            "folioId": "33445566",
+            "txns": [
+                [1, "2024-01-10", 110.0, 450.0, 49500.0],
+                [1, "2024-02-10", 112.0, 441.96, 49500.0],
+                [1, "2024-03-10", 115.0, 430.43, 49500.0],
+                [1, "2024-04-10", 118.0, 419.49, 49500.0],
+                [1, "2024-05-10", 120.0, 412.5, 49500.0],
+                [3, "2024-06-10", 122.0, 20.0, 2440.0],
+                [1, "2024-07-10", 125.0, 396.0, 49500.0]
+            ]
+        },
+        {
+            "schemeName": "SBI Small Cap Fund - Direct Plan - Growth",
+            "isin": "INF200K01142",
+            "folioId": "87654321",
+            "txns": [
+                [1, "2024-01-01", 100.0, 400.0, 40000.0],
+                [1, "2024-02-01", 102.0, 392.16, 40000.0],
+                [1, "2024-03-01", 105.0, 380.95, 40000.0],
+                [1, "2024-04-01", 108.0, 370.37, 40000.0],
+                [1, "2024-05-01", 110.0, 363.64, 40000.0],
+                [1, "2024-06-01", 112.0, 357.14, 40000.0],
+                [1, "2024-07-01", 115.0, 347.83, 40000.0],
+                [2, "2024-08-01", 118.0, -100.0, -11800.0]
+            ]
+        },
+        {
+            "schemeName": "ICICI Prudential Technology Fund - Direct Plan - Growth",
+            "isin": "INF109K01234",
+            "folioId": "11223344",
+            "txns": [
+                [1, "2024-03-10", 125.0, 300.0, 37500.0],
+                [1, "2024-04-10", 128.0, 292.97, 37500.0],
+                [1, "2024-05-10", 130.0, 288.46, 37500.0],
+                [1, "2024-06-10", 132.0, 284.09, 37500.0],
+                [1, "2024-07-10", 135.0, 277.78, 37500.0],
+                [1, "2024-08-10", 138.0, 271.74, 37500.0],
+                [3, "2024-09-10", 140.0, 10.0, 1400.0]
+            ]
+        }
+    ]
+}
+
 class MutualFundDataAgent:
     """Agent responsible for providing mutual fund mock data"""
     
@@ -45,157 +168,32 @@ class MutualFundDataAgent:
     
     def get_mutual_fund_sample_data(self) -> Dict[str, Any]:
         """Return sample mutual fund data sorted by increasing positive performance"""
-        return {
-            "mutual_funds": [
-            {
-                "schemeName": "Parag Parikh Flexi Cap Fund - Direct Plan - Growth",
-                "isin": "INF879O01027",
-                "folioId": "22334455",
-                "txns": [
-                    [1, "2023-11-15", 130.0, 300.0, 39000.0],
-                    [1, "2023-12-15", 132.0, 295.45, 39000.0],
-                    [1, "2024-01-15", 135.0, 288.89, 39000.0],
-                    [1, "2024-02-15", 138.0, 282.61, 39000.0],
-                    [1, "2024-03-15", 140.0, 278.57, 39000.0],
-                    [1, "2024-04-15", 142.0, 274.65, 39000.0],
-                    [2, "2024-05-15", 145.0, -100.0, -14500.0]
-                ]
-            },
-            {
-                "schemeName": "Axis Bluechip Fund - Direct Plan - Growth",
-                "isin": "INF846K01DP9",
-                "folioId": "44556677",
-                "txns": [
-                    [1, "2023-12-05", 150.0, 200.0, 30000.0],
-                    [1, "2024-01-05", 152.0, 197.37, 30000.0],
-                    [1, "2024-02-05", 155.0, 193.55, 30000.0],
-                    [1, "2024-03-05", 158.0, 189.87, 30000.0],
-                    [1, "2024-04-05", 160.0, 187.5, 30000.0],
-                    [1, "2024-05-05", 162.0, 185.19, 30000.0],
-                    [2, "2024-06-05", 165.0, -50.0, -8250.0],
-                    [1, "2024-07-05", 168.0, 178.57, 30000.0]
-                ]
-            },
-            {
-                "schemeName": "HDFC Equity Fund - Direct Plan - Growth",
-                "isin": "INF179K01014",
-                "folioId": "12345678",
-                "txns": [
-                    [1, "2024-01-15", 120.0, 500.0, 60000.0],
-                    [1, "2024-02-15", 122.5, 491.8, 60250.0],
-                    [1, "2024-03-15", 125.0, 480.0, 60000.0],
-                    [1, "2024-04-15", 128.0, 468.75, 60000.0],
-                    [1, "2024-05-15", 130.0, 461.54, 60000.0],
-                    [1, "2024-06-15", 132.0, 454.55, 60000.0],
-                    [2, "2024-07-15", 135.0, -200.0, -27000.0]
-                ]
-            },
-            {
-                "schemeName": "Kotak Flexicap Fund - Direct Plan - Growth",
-                "isin": "INF174K01369",
-                "folioId": "99887766",
-                "txns": [
-                    [1, "2024-02-20", 140.0, 250.0, 35000.0],
-                    [1, "2024-03-20", 142.0, 246.48, 35000.0],
-                    [1, "2024-04-20", 145.0, 241.38, 35000.0],
-                    [1, "2024-05-20", 148.0, 236.49, 35000.0],
-                    [1, "2024-06-20", 150.0, 233.33, 35000.0],
-                    [2, "2024-07-20", 153.0, -100.0, -15300.0],
-                    [1, "2024-08-20", 155.0, 225.81, 35000.0]
-                ]
-            },
-            {
-                "schemeName": "Mirae Asset Emerging Bluechip Fund - Direct Plan - Growth",
-                "isin": "INF769K01DN2",
-                "folioId": "66778899",
-                "txns": [
-                    [1, "2024-04-01", 95.0, 500.0, 47500.0],
-                    [1, "2024-05-01", 97.0, 489.69, 47500.0],
-                    [1, "2024-06-01", 100.0, 475.0, 47500.0],
-                    [1, "2024-07-01", 102.0, 465.69, 47500.0],
-                    [2, "2024-08-01", 105.0, -150.0, -15750.0],
-                    [1, "2024-09-01", 108.0, 439.81, 47500.0]
-                ]
-            },
-            {
-                "schemeName": "Nippon India Large Cap Fund - Direct Plan - Growth",
-                "isin": "INF204K01E10",
-                "folioId": "33445566",
-                "txns": [
-                    [1, "2024-01-10", 110.0, 450.0, 49500.0],
-                    [1, "2024-02-10", 112.0, 441.96, 49500.0],
-                    [1, "2024-03-10", 115.0, 430.43, 49500.0],
-                    [1, "2024-04-10", 118.0, 419.49, 49500.0],
-                    [1, "2024-05-10", 120.0, 412.5, 49500.0],
-                    [3, "2024-06-10", 122.0, 20.0, 2440.0],
-                    [1, "2024-07-10", 125.0, 396.0, 49500.0]
-                ]
-            },
-            {
-                "schemeName": "SBI Small Cap Fund - Direct Plan - Growth",
-                "isin": "INF200K01142",
-                "folioId": "87654321",
-                "txns": [
-                    [1, "2024-01-01", 100.0, 400.0, 40000.0],
-                    [1, "2024-02-01", 102.0, 392.16, 40000.0],
-                    [1, "2024-03-01", 105.0, 380.95, 40000.0],
-                    [1, "2024-04-01", 108.0, 370.37, 40000.0],
-                    [1, "2024-05-01", 110.0, 363.64, 40000.0],
-                    [1, "2024-06-01", 112.0, 357.14, 40000.0],
-                    [1, "2024-07-01", 115.0, 347.83, 40000.0],
-                    [2, "2024-08-01", 118.0, -100.0, -11800.0]
-                ]
-            },
-            {
-                "schemeName": "ICICI Prudential Technology Fund - Direct Plan - Growth",
-                "isin": "INF109K01234",
-                "folioId": "11223344",
-                "txns": [
-                    [1, "2024-03-10", 125.0, 300.0, 37500.0],
-                    [1, "2024-04-10", 128.0, 292.97, 37500.0],
-                    [1, "2024-05-10", 130.0, 288.46, 37500.0],
-                    [1, "2024-06-10", 132.0, 284.09, 37500.0],
-                    [1, "2024-07-10", 135.0, 277.78, 37500.0],
-                    [1, "2024-08-10", 138.0, 271.74, 37500.0],
-                    [3, "2024-09-10", 140.0, 10.0, 1400.0]
-                ]
-            }
-        ]
-    }
+        return SAMPLE_MUTUAL_FUND_DATA
 
     
-    async def fetch_mutual_fund_transactions(self) -> Dict[str, Any]:
-        """Return mock mutual fund data"""
-        logger.info("Using mock mutual fund data")
-        return self.get_mutual_fund_sample_data()
+    async def fetch_mutual_fund_transactions(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Return the user's imported mutual fund holdings, or mock data when no user is given"""
+        if user_id is None:
+            logger.info("Using mock mutual fund data")
+            return self.get_mutual_fund_sample_data()
+
+        from services.holding_service import get_user_holdings
+        from data.holding_dao import MUTUAL_FUND
+
+        logger.info(f"Fetching mutual fund holdings for user {user_id}")
+        folios = await asyncio.to_thread(get_user_holdings, user_id, MUTUAL_FUND)
+        return {"mutual_funds": folios}
 
 class MutualFundAnalysisAgent:
     """Agent responsible for processing and analyzing mutual fund data"""
     
-    def __init__(self):
-        self.fund_categories = {
-            'large_cap': ['large cap', 'bluechip', 'large & mid cap'],
-            'mid_cap': ['mid cap', 'midcap'],
-            'small_cap': ['small cap', 'smallcap'],
-            'multi_cap': ['multi cap', 'multicap', 'diversified'],
-            'flexi_cap': ['flexi cap', 'flexicap'],
-            'balanced_hybrid': ['balanced', 'advantage', 'hybrid', 'conservative', 'aggressive'],
-            'sectoral_thematic': ['gold', 'banking', 'pharma', 'it', 'auto', 'infra', 'energy', 'fmcg'],
-            'index': ['index', 'nifty', 'sensex', 'etf'],
-            'debt': ['debt', 'bond', 'gilt', 'liquid', 'ultra short', 'short term', 'medium term', 'long term'],
-            'international': ['international', 'global', 'us', 'nasdaq', 'emerging']
-        }
+    def __init__(self, categorizer: Optional[FundCategorizer] = None):
+        self.categorizer = categorizer or default_categorizer
+        self.fund_categories = FUND_CATEGORIES
     
-    def categorize_fund(self, fund_name: str) -> str:
-        """Categorize fund based on its name"""
-        fund_name_lower = fund_name.lower()
-        
-        for category, keywords in self.fund_categories.items():
-            for keyword in keywords:
-                if keyword in fund_name_lower:
-                    return category.replace('_', ' ').title()
-
-        return 'Other'
+    def categorize_fund(self, fund_name: str, isin: Optional[str] = None) -> str:
+        """Categorize fund based on its name, using ISIN overrides and cache when available"""
+        return self.categorizer.categorize(fund_name, isin)
     
     def calculate_fund_metrics(self, fund_data: Dict[str, Any]) -> FundHolding:
         """Calculate metrics for a single fund"""
@@ -211,8 +209,8 @@ class MutualFundAnalysisAgent:
         total_invested = sum(txn[4] for txn in transactions if txn[0] == 1)  # Buy amounts
         total_invested -= sum(txn[4] for txn in transactions if txn[0] == 2)  # Subtract sell amounts
         
-        # Get latest price (most recent transaction)
-        latest_price = transactions[0][2] if transactions else 0
+        # Get latest price (most recent transaction; stored rows are oldest first)
+        latest_price = max(transactions, key=lambda txn: txn[1])[2] if transactions else 0
         
         # Calculate current value and returns
         current_value = total_units * latest_price
@@ -235,7 +233,7 @@ class MutualFundAnalysisAgent:
             returns_percent=returns_percent,
             latest_price=latest_price,
             transactions=transactions,
-            fund_category=self.categorize_fund(full_name)
+            fund_category=fund_data.get('fundCategory') or self.categorize_fund(full_name, fund_data.get('isin'))
         )
     
     def calculate_portfolio_timeline(self, holdings: List[FundHolding]) -> List[Dict[str, Any]]:
@@ -266,7 +264,7 @@ class MutualFundAnalysisAgent:
                     invested -= sum(txn[4] for txn in relevant_txns if txn[0] == 2)
                     
                     # Use the latest price from relevant transactions
-                    latest_price = relevant_txns[0][2]
+                    latest_price = max(relevant_txns, key=lambda txn: txn[1])[2]
                     
                     total_value += units * latest_price
                     total_invested += invested
@@ -282,28 +280,18 @@ class MutualFundAnalysisAgent:
     
     def classify_holdings(self, holdings: List[FundHolding]) -> Dict[str, List[FundHolding]]:
         """Classify holdings by fund category"""
-        classification = {}
-        
-        for holding in holdings:
-            category = holding.fund_category
-            if category not in classification:
-                classification[category] = []
-            classification[category].append(holding)
-        
-        return classification
+        return group_holdings(holdings, lambda h: h.fund_category)
     
     def get_top_performers_and_losers(self, holdings: List[FundHolding], count: int = 3) -> tuple:
         """Get top performers and underperformers"""
-        sorted_holdings = sorted(holdings, key=lambda h: h.returns_percent, reverse=True)
-        
-        top_performers = sorted_holdings[:count]
-        underperformers = sorted_holdings[-count:] if len(sorted_holdings) >= count else []
-        underperformers.reverse()  # Show worst first
-        
-        return top_performers, underperformers
+        return top_and_bottom(holdings, count)
     
     async def analyze_portfolio(self, mf_data: Dict[str, Any]) -> PortfolioAnalysis:
         """Perform complete portfolio analysis"""
+        return self.build_portfolio_analysis(mf_data)
+    
+    def build_portfolio_analysis(self, mf_data: Dict[str, Any]) -> PortfolioAnalysis:
+        """Synchronous analysis core, safe to run in a worker process"""
         try:
             mf_transactions = mf_data.get('mutual_funds', [])
             
@@ -358,29 +346,32 @@ class MutualFundPipeline:
         self.data_agent = MutualFundDataAgent()
         self.analysis_agent = MutualFundAnalysisAgent()
     
-    async def get_portfolio_analysis(self) -> Dict[str, Any]:
-        """Get complete portfolio analysis"""
+    async def get_portfolio_analysis(self, user_id: Optional[str] = None, executor=None, lean: bool = False) -> Dict[str, Any]:
+        """Get complete portfolio analysis, optionally offloading the analysis to an executor"""
         try:
             # Step 1: Fetch data using data agent
             logger.info("Fetching mutual fund data...")
-            mf_data = await self.data_agent.fetch_mutual_fund_transactions()
+            mf_data = await self.data_agent.fetch_mutual_fund_transactions(user_id)
             
             if not mf_data:
                 raise Exception("Failed to fetch mutual fund data")
             
             # Step 2: Analyze data using analysis agent
             logger.info("Analyzing portfolio...")
+            if executor is not None:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, analyze_mutual_fund_data, mf_data, lean)
             analysis = await self.analysis_agent.analyze_portfolio(mf_data)
             
             # Step 3: Format for frontend consumption
-            return self._format_for_frontend(analysis)
+            return self._format_for_frontend(analysis, lean)
             
         except Exception as e:
             logger.error(f"Pipeline error: {e}")
             raise
     
-    def _format_for_frontend(self, analysis: PortfolioAnalysis) -> Dict[str, Any]:
-        """Format analysis data for frontend consumption"""
+    def _format_for_frontend(self, analysis: PortfolioAnalysis, lean: bool = False) -> Dict[str, Any]:
+        """Format analysis data for frontend consumption; lean omits each holding's raw transactions"""
         return {
             'holdings': [
                 {
@@ -395,7 +386,7 @@ class MutualFundPipeline:
                     'returnsPercent': h.returns_percent,
                     'latestPrice': h.latest_price,
                     'fundCategory': h.fund_category,
-                    'transactions': h.transactions
+                    **({} if lean else {'transactions': h.transactions})
                 }
                 for h in analysis.holdings
             ],
@@ -437,6 +428,11 @@ class MutualFundPipeline:
             ]
         }
 
+def analyze_mutual_fund_data(mf_data: Dict[str, Any], lean: bool = False) -> Dict[str, Any]:
+    """Analyze raw mutual fund data and format it; module-level so it can be pickled to a process pool"""
+    analysis = MutualFundAnalysisAgent().build_portfolio_analysis(mf_data)
+    return MutualFundPipeline()._format_for_frontend(analysis, lean)
+
 # Main function for testing
 async def main():
     """Test the pipeline"""
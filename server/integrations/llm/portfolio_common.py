@@ -0,0 +1,48 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def group_holdings(holdings: List[Any], key: Callable[[Any], str]) -> Dict[str, List[Any]]:
+    """Group holdings by a classification key, preserving input order"""
+    classification = {}
+    for holding in holdings:
+        classification.setdefault(key(holding), []).append(holding)
+    return classification
+
+
+def top_and_bottom(holdings: List[Any], count: int = 3) -> Tuple[List[Any], List[Any]]:
+    """Return (top performers, underperformers worst-first) by returns_percent"""
+    sorted_holdings = sorted(holdings, key=lambda h: h.returns_percent, reverse=True)
+
+    top_performers = sorted_holdings[:count]
+    underperformers = sorted_holdings[-count:] if len(sorted_holdings) >= count else []
+    underperformers.reverse()  # Show worst first
+
+    return top_performers, underperformers
+
+
+def merge_timelines(series: Dict[str, Optional[List[Dict[str, Any]]]], value_key: str = 'value') -> List[Dict[str, Any]]:
+    """
+    Merge per-asset timelines into one net-worth series.
+
+    Each input series is a date-sorted list of points with an ISO 'date' and a
+    value_key. Every component's last known value is carried forward to dates
+    on which only other components changed.
+    """
+    components = {name: points for name, points in series.items() if points}
+    cursors = {name: 0 for name in components}
+    latest = {name: 0 for name in components}
+
+    all_dates = sorted({point['date'] for points in components.values() for point in points})
+    merged = []
+    for date in all_dates:
+        point = {'date': date}
+        for name, points in components.items():
+            i = cursors[name]
+            while i < len(points) and points[i]['date'] <= date:
+                latest[name] = points[i][value_key]
+                i += 1
+            cursors[name] = i
+            point[name] = latest[name]
+        point['netWorth'] = sum(latest.values())
+        merged.append(point)
+    return merged
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+import logging
+
+from data.transaction_schema import amount_paise
+from .mutual_fund_pipeline import MutualFundPipeline
+from .stocks_pipeline import StockPipeline
+from .portfolio_common import merge_timelines
+
+logger = logging.getLogger(__name__)
+
+
+def _to_iso_date(value: Any) -> Optional[str]:
+    """Normalise a stored transaction date (timestamp or string) to YYYY-MM-DD"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).date().isoformat()
+        except ValueError:
+            pass
+        for fmt in ("%d/%m/%y", "%d/%m/%Y"):
+            try:
+                return datetime.strptime(value, fmt).date().isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+def calculate_bank_timeline(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Build an end-of-day bank balance series from stored transactions.
+
+    Transactions imported from the bank carry its running 'closing_balance';
+    REST-created ones have None, so for those the balance is accumulated
+    from amount_paise. Documents not yet migrated to the canonical schema
+    keep the old rules: the pipeline's 'balance' field, else the flows
+    (their closing_balance was filled in as deposit - withdrawn).
+    """
+    dated = [(d, t) for t in transactions if (d := _to_iso_date(t.get('date')))]
+    dated.sort(key=lambda pair: pair[0])
+
+    timeline = []
+    balance = 0.0
+    for day, txn in dated:
+        closing = txn.get('closing_balance') if txn.get('schema_version') else txn.get('balance')
+        if isinstance(closing, (int, float)):
+            balance = float(closing)
+        else:
+            try:
+                balance += amount_paise(txn) / 100
+            except ValueError:
+                logger.warning("Bank timeline skips transaction %s with an amount of unknown side", txn.get('id'))
+        if timeline and timeline[-1]['date'] == day:
+            timeline[-1]['value'] = balance
+        else:
+            timeline.append({'date': day, 'value': balance})
+    return timeline
+
+
+class PortfolioOverviewPipeline:
+    """Runs the mutual fund and stock pipelines together and merges them with the bank balance"""
+
+    def __init__(self):
+        self.mutual_fund_pipeline = MutualFundPipeline()
+        self.stock_pipeline = StockPipeline()
+
+    async def _fetch_bank_timeline(self, user_id: Optional[str]) -> List[Dict[str, Any]]:
+        if user_id is None:
+            return []
+        from services.transaction_service import get_user_transactions
+
+        transactions = await asyncio.to_thread(get_user_transactions, user_id)
+        return calculate_bank_timeline(transactions)
+
+    async def get_overview(self, user_id: Optional[str] = None, executor=None) -> Dict[str, Any]:
+        """Compute all components concurrently; a failing component is reported rather than failing the whole overview"""
+        mutual_funds, stocks, bank_timeline = await asyncio.gather(
+            self.mutual_fund_pipeline.get_portfolio_analysis(user_id, executor),
+            self.stock_pipeline.get_portfolio_analysis(user_id, executor),
+            self._fetch_bank_timeline(user_id),
+            return_exceptions=True,
+        )
+
+        errors = {}
+        for name, result in (('mutualFunds', mutual_funds), ('stocks', stocks), ('bank', bank_timeline)):
+            if isinstance(result, Exception):
+                logger.error(f"Portfolio overview component {name} failed: {result}")
+                errors[name] = str(result)
+        if isinstance(mutual_funds, Exception):
+            mutual_funds = None
+        if isinstance(stocks, Exception):
+            stocks = None
+        if isinstance(bank_timeline, Exception):
+            bank_timeline = []
+
+        net_worth_timeline = merge_timelines({
+            'mutualFunds': mutual_funds['portfolioTimeline'] if mutual_funds else None,
+            'stocks': stocks['portfolioTimeline'] if stocks else None,
+            'bank': bank_timeline,
+        })
+
+        mf_value = mutual_funds['summary']['totalValue'] if mutual_funds else 0
+        stock_value = stocks['summary']['totalValue'] if stocks else 0
+        bank_balance = bank_timeline[-1]['value'] if bank_timeline else 0
+
+        return {
+            'summary': {
+                'netWorth': mf_value + stock_value + bank_balance,
+                'mutualFundValue': mf_value,
+                'stockValue': stock_value,
+                'bankBalance': bank_balance,
+            },
+            'netWorthTimeline': net_worth_timeline,
+            'mutualFunds': mutual_funds,
+            'stocks': stocks,
+            'errors': errors,
+        }
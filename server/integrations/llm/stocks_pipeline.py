@@ -5,6 +5,8 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 import logging
 
+from .portfolio_common import group_holdings, top_and_bottom
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -40,6 +42,141 @@ class StockPortfolioAnalysis:
     underperformers: List[StockHolding]
     dividend_income: float
 
+# Sample portfolio served when no user-specific holdings are requested. Built
+# once at import; callers must treat it as read-only.
+SAMPLE_STOCK_DATA = {
+    "stocks": [
+        {
+            "symbol": "RELIANCE",
+            "companyName": "Reliance Industries Limited",
+            "exchange": "NSE",
+            "sector": "Oil & Gas",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2023-10-15", 2450.0, 50, 122500.0],  # Buy
+                [1, "2023-11-20", 2380.0, 25, 59500.0],   # Buy
+                [2, "2024-01-10", 2650.0, 15, 39750.0],   # Sell
+                [4, "2024-03-15", 0.0, 0, 800.0],         # Dividend
+                [1, "2024-05-20", 2720.0, 20, 54400.0],   # Buy
+            ]
+        },
+        {
+            "symbol": "TCS",
+            "companyName": "Tata Consultancy Services Limited",
+            "exchange": "NSE",
+            "sector": "Information Technology",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2023-12-01", 3600.0, 30, 108000.0],  # Buy
+                [1, "2024-02-15", 3450.0, 20, 69000.0],   # Buy
+                [4, "2024-04-10", 0.0, 0, 1500.0],        # Dividend
+                [2, "2024-06-25", 3850.0, 10, 38500.0],   # Sell
+                [1, "2024-07-15", 3900.0, 15, 58500.0],   # Buy
+            ]
+        },
+        {
+            "symbol": "HDFCBANK",
+            "companyName": "HDFC Bank Limited",
+            "exchange": "NSE",
+            "sector": "Banking & Financial Services",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2024-01-05", 1650.0, 60, 99000.0],   # Buy
+                [1, "2024-03-10", 1580.0, 40, 63200.0],   # Buy
+                [4, "2024-05-20", 0.0, 0, 1200.0],        # Dividend
+                [2, "2024-07-08", 1720.0, 20, 34400.0],   # Sell
+            ]
+        },
+        {
+            "symbol": "INFY",
+            "companyName": "Infosys Limited",
+            "exchange": "NSE",
+            "sector": "Information Technology",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2024-02-12", 1450.0, 40, 58000.0],   # Buy
+                [1, "2024-04-18", 1380.0, 30, 41400.0],   # Buy
+                [4, "2024-06-15", 0.0, 0, 900.0],         # Dividend
+                [1, "2024-08-05", 1520.0, 25, 38000.0],   # Buy
+            ]
+        },
+        {
+            "symbol": "TATAMOTORS",
+            "companyName": "Tata Motors Limited",
+            "exchange": "NSE",
+            "sector": "Automobile",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2023-11-10", 650.0, 100, 65000.0],   # Buy
+                [1, "2024-01-22", 720.0, 50, 36000.0],    # Buy
+                [2, "2024-04-15", 850.0, 30, 25500.0],    # Sell
+                [1, "2024-07-20", 890.0, 40, 35600.0],    # Buy
+            ]
+        },
+        {
+            "symbol": "BHARTIARTL",
+            "companyName": "Bharti Airtel Limited",
+            "exchange": "NSE",
+            "sector": "Telecom",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2024-03-05", 850.0, 80, 68000.0],    # Buy
+                [1, "2024-05-12", 920.0, 50, 46000.0],    # Buy
+                [4, "2024-07-10", 0.0, 0, 650.0],         # Dividend
+                [2, "2024-08-15", 1050.0, 25, 26250.0],   # Sell
+            ]
+        },
+        {
+            "symbol": "ASIANPAINT",
+            "companyName": "Asian Paints Limited",
+            "exchange": "NSE",
+            "sector": "Consumer Goods",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2024-01-15", 3200.0, 20, 64000.0],   # Buy
+                [1, "2024-04-08", 3050.0, 15, 45750.0],   # Buy
+                [4, "2024-06-25", 0.0, 0, 700.0],         # Dividend
+            ]
+        },
+        {
+            "symbol": "ADANIPORTS",
+            "companyName": "Adani Ports and Special Economic Zone Limited",
+            "exchange": "NSE",
+            "sector": "Infrastructure",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2024-02-20", 720.0, 70, 50400.0],    # Buy
+                [2, "2024-06-10", 850.0, 20, 17000.0],    # Sell
+                [1, "2024-08-12", 780.0, 30, 23400.0],    # Buy
+            ]
+        },
+        {
+            "symbol": "WIPRO",
+            "companyName": "Wipro Limited",
+            "exchange": "NSE",
+            "sector": "Information Technology",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2024-04-01", 420.0, 120, 50400.0],   # Buy
+                [4, "2024-07-05", 0.0, 0, 480.0],         # Dividend
+                [1, "2024-08-20", 450.0, 80, 36000.0],    # Buy
+            ]
+        },
+        {
+            "symbol": "MARUTI",
+            "companyName": "Maruti Suzuki India Limited",
+            "exchange": "NSE",
+            "sector": "Automobile",
+            "marketCap": "Large Cap",
+            "txns": [
+                [1, "2024-03-12", 10500.0, 8, 84000.0],   # Buy
+                [1, "2024-06-18", 11200.0, 5, 56000.0],   # Buy
+                [4, "2024-08-10", 0.0, 0, 520.0],         # Dividend
+            ]
+        }
+    ]
+}
+
 class StockDataAgent:
     """Agent responsible for providing stock mock data"""
     
@@ -48,143 +185,20 @@ class StockDataAgent:
     
     def get_stock_sample_data(self) -> Dict[str, Any]:
         """Return sample stock data with various transaction types"""
-        return {
-            "stocks": [
-                {
-                    "symbol": "RELIANCE",
-                    "companyName": "Reliance Industries Limited",
-                    "exchange": "NSE",
-                    "sector": "Oil & Gas",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2023-10-15", 2450.0, 50, 122500.0],  # Buy
-                        [1, "2023-11-20", 2380.0, 25, 59500.0],   # Buy
-                        [2, "2024-01-10", 2650.0, 15, 39750.0],   # Sell
-                        [4, "2024-03-15", 0.0, 0, 800.0],         # Dividend
-                        [1, "2024-05-20", 2720.0, 20, 54400.0],   # Buy
-                    ]
-                },
-                {
-                    "symbol": "TCS",
-                    "companyName": "Tata Consultancy Services Limited",
-                    "exchange": "NSE",
-                    "sector": "Information Technology",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2023-12-01", 3600.0, 30, 108000.0],  # Buy
-                        [1, "2024-02-15", 3450.0, 20, 69000.0],   # Buy
-                        [4, "2024-04-10", 0.0, 0, 1500.0],        # Dividend
-                        [2, "2024-06-25", 3850.0, 10, 38500.0],   # Sell
-                        [1, "2024-07-15", 3900.0, 15, 58500.0],   # Buy
-                    ]
-                },
-                {
-                    "symbol": "HDFCBANK",
-                    "companyName": "HDFC Bank Limited",
-                    "exchange": "NSE",
-                    "sector": "Banking & Financial Services",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2024-01-05", 1650.0, 60, 99000.0],   # Buy
-                        [1, "2024-03-10", 1580.0, 40, 63200.0],   # Buy
-                        [4, "2024-05-20", 0.0, 0, 1200.0],        # Dividend
-                        [2, "2024-07-08", 1720.0, 20, 34400.0],   # Sell
-                    ]
-                },
-                {
-                    "symbol": "INFY",
-                    "companyName": "Infosys Limited",
-                    "exchange": "NSE",
-                    "sector": "Information Technology",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2024-02-12", 1450.0, 40, 58000.0],   # Buy
-                        [1, "2024-04-18", 1380.0, 30, 41400.0],   # Buy
-                        [4, "2024-06-15", 0.0, 0, 900.0],         # Dividend
-                        [1, "2024-08-05", 1520.0, 25, 38000.0],   # Buy
-                    ]
-                },
-                {
-                    "symbol": "TATAMOTORS",
-                    "companyName": "Tata Motors Limited",
-                    "exchange": "NSE",
-                    "sector": "Automobile",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2023-11-10", 650.0, 100, 65000.0],   # Buy
-                        [1, "2024-01-22", 720.0, 50, 36000.0],    # Buy
-                        [2, "2024-04-15", 850.0, 30, 25500.0],    # Sell
-                        [1, "2024-07-20", 890.0, 40, 35600.0],    # Buy
-                    ]
-                },
-                {
-                    "symbol": "BHARTIARTL",
-                    "companyName": "Bharti Airtel Limited",
-                    "exchange": "NSE",
-                    "sector": "Telecom",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2024-03-05", 850.0, 80, 68000.0],    # Buy
-                        [1, "2024-05-12", 920.0, 50, 46000.0],    # Buy
-                        [4, "2024-07-10", 0.0, 0, 650.0],         # Dividend
-                        [2, "2024-08-15", 1050.0, 25, 26250.0],   # Sell
-                    ]
-                },
-                {
-                    "symbol": "ASIANPAINT",
-                    "companyName": "Asian Paints Limited",
-                    "exchange": "NSE",
-                    "sector": "Consumer Goods",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2024-01-15", 3200.0, 20, 64000.0],   # Buy
-                        [1, "2024-04-08", 3050.0, 15, 45750.0],   # Buy
-                        [4, "2024-06-25", 0.0, 0, 700.0],         # Dividend
-                    ]
-                },
-                {
-                    "symbol": "ADANIPORTS",
-                    "companyName": "Adani Ports and Special Economic Zone Limited",
-                    "exchange": "NSE",
-                    "sector": "Infrastructure",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2024-02-20", 720.0, 70, 50400.0],    # Buy
-                        [2, "2024-06-10", 850.0, 20, 17000.0],    # Sell
-                        [1, "2024-08-12", 780.0, 30, 23400.0],    # Buy
-                    ]
-                },
-                {
-                    "symbol": "WIPRO",
-                    "companyName": "Wipro Limited",
-                    "exchange": "NSE",
-                    "sector": "Information Technology",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2024-04-01", 420.0, 120, 50400.0],   # Buy
-                        [4, "2024-07-05", 0.0, 0, 480.0],         # Dividend
-                        [1, "2024-08-20", 450.0, 80, 36000.0],    # Buy
-                    ]
-                },
-                {
-                    "symbol": "MARUTI",
-                    "companyName": "Maruti Suzuki India Limited",
-                    "exchange": "NSE",
-                    "sector": "Automobile",
-                    "marketCap": "Large Cap",
-                    "txns": [
-                        [1, "2024-03-12", 10500.0, 8, 84000.0],   # Buy
-                        [1, "2024-06-18", 11200.0, 5, 56000.0],   # Buy
-                        [4, "2024-08-10", 0.0, 0, 520.0],         # Dividend
-                    ]
-                }
-            ]
-        }
+        return SAMPLE_STOCK_DATA
     
-    async def fetch_stock_transactions(self) -> Dict[str, Any]:
-        """Return mock stock data"""
-        logger.info("Using mock stock data")
-        return self.get_stock_sample_data()
+    async def fetch_stock_transactions(self, user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Return the user's imported stock holdings, or mock data when no user is given"""
+        if user_id is None:
+            logger.info("Using mock stock data")
+            return self.get_stock_sample_data()
+
+        from services.holding_service import get_user_holdings
+        from data.holding_dao import STOCK
+
+        logger.info(f"Fetching stock holdings for user {user_id}")
+        holdings = await asyncio.to_thread(get_user_holdings, user_id, STOCK)
+        return {"stocks": holdings}
 
 class StockAnalysisAgent:
     """Agent responsible for processing and analyzing stock data"""
@@ -339,40 +353,22 @@ class StockAnalysisAgent:
     
     def classify_by_sector(self, holdings: List[StockHolding]) -> Dict[str, List[StockHolding]]:
         """Classify holdings by sector"""
-        classification = {}
-        
-        for holding in holdings:
-            sector = holding.sector
-            if sector not in classification:
-                classification[sector] = []
-            classification[sector].append(holding)
-        
-        return classification
+        return group_holdings(holdings, lambda h: h.sector)
     
     def classify_by_market_cap(self, holdings: List[StockHolding]) -> Dict[str, List[StockHolding]]:
         """Classify holdings by market cap"""
-        classification = {}
-        
-        for holding in holdings:
-            market_cap = holding.market_cap_category
-            if market_cap not in classification:
-                classification[market_cap] = []
-            classification[market_cap].append(holding)
-        
-        return classification
+        return group_holdings(holdings, lambda h: h.market_cap_category)
     
     def get_top_performers_and_losers(self, holdings: List[StockHolding], count: int = 3) -> tuple:
         """Get top performers and underperformers"""
-        sorted_holdings = sorted(holdings, key=lambda h: h.returns_percent, reverse=True)
-        
-        top_performers = sorted_holdings[:count]
-        underperformers = sorted_holdings[-count:] if len(sorted_holdings) >= count else []
-        underperformers.reverse()  # Show worst first
-        
-        return top_performers, underperformers
+        return top_and_bottom(holdings, count)
     
     async def analyze_portfolio(self, stock_data: Dict[str, Any]) -> StockPortfolioAnalysis:
         """Perform complete stock portfolio analysis"""
+        return self.build_portfolio_analysis(stock_data)
+    
+    def build_portfolio_analysis(self, stock_data: Dict[str, Any]) -> StockPortfolioAnalysis:
+        """Synchronous analysis core, safe to run in a worker process"""
         try:
             stock_transactions = stock_data.get('stocks', [])
             
@@ -435,29 +431,32 @@ class StockPipeline:
         self.data_agent = StockDataAgent()
         self.analysis_agent = StockAnalysisAgent()
     
-    async def get_portfolio_analysis(self) -> Dict[str, Any]:
-        """Get complete stock portfolio analysis"""
+    async def get_portfolio_analysis(self, user_id: Optional[str] = None, executor=None, lean: bool = False) -> Dict[str, Any]:
+        """Get complete stock portfolio analysis, optionally offloading the analysis to an executor"""
         try:
             # Step 1: Fetch data using data agent
             logger.info("Fetching stock data...")
-            stock_data = await self.data_agent.fetch_stock_transactions()
+            stock_data = await self.data_agent.fetch_stock_transactions(user_id)
             
             if not stock_data:
                 raise Exception("Failed to fetch stock data")
             
             # Step 2: Analyze data using analysis agent
             logger.info("Analyzing stock portfolio...")
+            if executor is not None:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(executor, analyze_stock_data, stock_data, lean)
             analysis = await self.analysis_agent.analyze_portfolio(stock_data)
             
             # Step 3: Format for frontend consumption
-            return self._format_for_frontend(analysis)
+            return self._format_for_frontend(analysis, lean)
             
         except Exception as e:
             logger.error(f"Stock pipeline error: {e}")
             raise
     
-    def _format_for_frontend(self, analysis: StockPortfolioAnalysis) -> Dict[str, Any]:
-        """Format analysis data for frontend consumption"""
+    def _format_for_frontend(self, analysis: StockPortfolioAnalysis, lean: bool = False) -> Dict[str, Any]:
+        """Format analysis data for frontend consumption; lean omits each holding's raw transactions"""
         return {
             'holdings': [
                 {
@@ -473,7 +472,7 @@ class StockPipeline:
                     'averageBuyPrice': h.average_buy_price,
                     'sector': h.sector,
                     'marketCapCategory': h.market_cap_category,
-                    'transactions': h.transactions
+                    **({} if lean else {'transactions': h.transactions})
                 }
                 for h in analysis.holdings
             ],
@@ -531,6 +530,11 @@ class StockPipeline:
             ]
         }
 
+def analyze_stock_data(stock_data: Dict[str, Any], lean: bool = False) -> Dict[str, Any]:
+    """Analyze raw stock data and format it; module-level so it can be pickled to a process pool"""
+    analysis = StockAnalysisAgent().build_portfolio_analysis(stock_data)
+    return StockPipeline()._format_for_frontend(analysis, lean)
+
 # Main function for testing
 async def main():
     """Test the stock pipeline"""
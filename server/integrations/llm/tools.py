@@ -6,17 +6,18 @@ from typing import List, Dict, Any, Optional, Union, Tuple
 from datetime import datetime, date, timedelta
 import re
 from services.transaction_service import (
-    create_transactions as save_bulk_transactions_service,
     update_single_transaction as update_single_transaction_service,
     get_all_transactions as get_all_transactions_service,
     bulk_update_transaction_data as bulk_update_transactions_service,
     get_user_transactions
 )
+from services.sync_service import sync_transactions, get_watermark, SYNC_LOOKBACK_DAYS
 from services.relation_service import (
     create_new_relation as create_relation_service,
     update_existing_relation as update_relation_service
 )
 from data.firebase_client import db
+from utils.tracing import traced
 
 import logging
 logger = logging.getLogger(__name__)
@@ -24,30 +25,50 @@ logger = logging.getLogger(__name__)
 # Global variable to store current user_id for the request context
 _current_user_id = None
 
+# Session state key: fetch window start (ISO date, or None for no window) of this pipeline run
+SYNC_WINDOW_START = "sync_window_start"
+
 def set_current_user_id(user_id: str):
     """Set the current user ID for the request context."""
     global _current_user_id
     _current_user_id = user_id
 
 # Transaction Management Tools
-def save_bulk_transactions(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+@traced("tool.save_bulk_transactions")
+def save_bulk_transactions(transactions: List[Dict[str, Any]], tool_context=None) -> Dict[str, Any]:
     """
-    Save multiple transactions at once using the transaction service.
+    Save fetched bank transactions, skipping any that are already stored.
+    
+    Rows are identified by date, amount, narration and bank reference, so
+    saving the same rows again is harmless and no deduplication is needed
+    beforehand.
     
     Args:
         transactions: List of transaction dictionaries with required fields
         
     Returns:
-        Dict containing status and results
+        Dict containing status, the ids of newly stored transactions and counts
     """
     try:
-        logger.info("Saving bulk transactions...")
-        transaction_ids = save_bulk_transactions_service(transactions)
-        logger.info("Transaction IDs: %s", transaction_ids)
+        user_id = next((t.get("user_id") for t in transactions if t.get("user_id")), _current_user_id)
+        logger.info("Saving %d bulk transactions for user %s", len(transactions), user_id)
+        # Injected by ADK; the statement parser already stored part of this fetch
+        # and advanced the watermark, so keep the window it started from
+        state = tool_context.state if tool_context is not None else {}
+        if SYNC_WINDOW_START in state:
+            start = state[SYNC_WINDOW_START]
+            result = sync_transactions(user_id, transactions, window_start=date.fromisoformat(start) if start else None)
+        else:
+            result = sync_transactions(user_id, transactions)
+        logger.debug("Transaction IDs: %s", result["created"])
         return {
             "status": "success",
-            "message": f"Successfully saved {len(transactions)} transactions.",
-            "transaction_ids": transaction_ids
+            "message": (
+                f"Saved {len(result['created'])} new transactions; "
+                f"{result['skipped']} were already stored and {result['stale']} predate the last sync."
+            ),
+            "transaction_ids": result["created"],
+            "watermark": result["watermark"]
         }
     except Exception as e:
         logger.error("Error saving bulk transactions: %s", e)
@@ -56,6 +77,35 @@ def save_bulk_transactions(transactions: List[Dict[str, Any]]) -> Dict[str, Any]
             "message": str(e)
         }
 
+@traced("tool.get_sync_watermark")
+def get_sync_watermark(user_id: str) -> Dict[str, Any]:
+    """
+    Find which bank transactions still need fetching for a user.
+    
+    Args:
+        user_id: The user whose transactions are being synced
+        
+    Returns:
+        Dict with "watermark" (latest stored transaction date) and "fetch_since"
+        (fetch transactions on or after this date); both are None before the
+        first sync, meaning fetch the latest transactions
+    """
+    try:
+        watermark = get_watermark(user_id)
+        fetch_since = watermark - timedelta(days=SYNC_LOOKBACK_DAYS) if watermark else None
+        return {
+            "status": "success",
+            "watermark": watermark.isoformat() if watermark else None,
+            "fetch_since": fetch_since.isoformat() if fetch_since else None
+        }
+    except Exception as e:
+        logger.error("Error reading sync watermark: %s", e)
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+@traced("tool.update_single_transaction")
 def update_single_transaction(transaction_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     """
     Update a single transaction by ID using the transaction service.
@@ -69,10 +119,9 @@ def update_single_transaction(transaction_id: str, updates: Dict[str, Any]) -> D
     """
     try:
         logger.info("Updating single transaction...")
-        logger.info("Transaction ID: %s", transaction_id)
-        logger.info("Updates: %s", updates)
+        logger.debug("Transaction ID: %s, updates: %s", transaction_id, updates)
         updated_transaction = update_single_transaction_service(transaction_id, updates)
-        logger.info("Updated transaction: %s", updated_transaction)
+        logger.debug("Updated transaction: %s", updated_transaction)
         return {
             "status": "success",
             "message": f"Successfully updated transaction {transaction_id}.",
@@ -85,6 +134,7 @@ def update_single_transaction(transaction_id: str, updates: Dict[str, Any]) -> D
             "message": str(e)
         }
 
+@traced("tool.bulk_update_transactions")
 def bulk_update_transactions(updates: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Update multiple transactions at once using the transaction service.
@@ -96,10 +146,10 @@ def bulk_update_transactions(updates: List[Dict[str, Any]]) -> Dict[str, Any]:
         Dict containing status and results
     """
     try:
-        logger.info("Bulk updating transactions...")
-        logger.info("Updates: %s", updates)
+        logger.info("Bulk updating %d transactions", len(updates))
+        logger.debug("Updates: %s", updates)
         results = bulk_update_transactions_service(updates)
-        logger.info("Results: %s", results)
+        logger.debug("Results: %s", results)
         return {
             "status": "success",
             "message": f"Successfully updated {len(updates)} transactions.",
@@ -112,6 +162,7 @@ def bulk_update_transactions(updates: List[Dict[str, Any]]) -> Dict[str, Any]:
             "message": str(e)
         }
 
+@traced("tool.get_all_transactions")
 def get_all_transactions() -> List[Dict[str, Any]]:
     """
     Get all transactions using the transaction service.
@@ -126,6 +177,7 @@ def get_all_transactions() -> List[Dict[str, Any]]:
         return []
 
 # Relation Management Tools
+@traced("tool.create_relation")
 def create_relation(source_id: str, target_id: str, relation_type: str, 
                     metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
@@ -142,7 +194,7 @@ def create_relation(source_id: str, target_id: str, relation_type: str,
     """
     try:
         # Get the current user ID
-        current_user_id = get_current_user_id()
+        current_user_id = get_current_user_id(_current_user_id)
         
         # Create relation data object according to the schema
         relation_data = {
@@ -176,6 +228,7 @@ def create_relation(source_id: str, target_id: str, relation_type: str,
         }
     
 
+@traced("tool.update_relation")
 def update_relation(relation_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     """
     Update an existing relation.
@@ -202,6 +255,7 @@ def update_relation(relation_id: str, updates: Dict[str, Any]) -> Dict[str, Any]
         }
     
 
+@traced("tool.get_current_user_id")
 def get_current_user_id(user_id: str) -> str:
     """Get the current user ID from the request context.
     
@@ -214,6 +268,7 @@ def get_current_user_id(user_id: str) -> str:
     return user_id
 
 
+@traced("tool.get_sample_transactions")
 def get_sample_transactions() -> List[Dict[str, Any]]:
     """
     Returns the sample transaction data used for initializing the database.
@@ -235,6 +290,7 @@ def get_sample_transactions() -> List[Dict[str, Any]]:
 
 
 # Dynamic Transaction Query Tool
+@traced("tool.execute_dynamic_transaction_query")
 def execute_dynamic_transaction_query(query: str) -> Dict[str, Any]:
     """
     Execute a dynamic transaction query based on natural language input.
@@ -249,13 +305,13 @@ def execute_dynamic_transaction_query(query: str) -> Dict[str, Any]:
     """
     try:
         # Get current user ID for filtering transactions
-        current_user_id = get_current_user_id()
-        logger.info(f"Executing dynamic query for user {current_user_id}: {query}")
+        current_user_id = get_current_user_id(_current_user_id)
+        logger.info("Executing dynamic query for user %s: %s", current_user_id, query)
         
         # Get all user transactions as base dataset
-        logger.info(f"[QUERY DEBUG] Fetching all transactions for user_id: {current_user_id}")
+        logger.debug("Fetching all transactions for user_id: %s", current_user_id)
         all_transactions = get_user_transactions(current_user_id)
-        logger.info(f"[QUERY DEBUG] Retrieved {len(all_transactions)} total transactions")
+        logger.debug("Retrieved %s total transactions", len(all_transactions))
         if not all_transactions:
             return {
                 "status": "success",
@@ -265,7 +321,7 @@ def execute_dynamic_transaction_query(query: str) -> Dict[str, Any]:
         
         # Parse time period from query
         time_period, start_date, end_date = _parse_time_period(query)
-        logger.info(f"[QUERY DEBUG] Parsed time period: {time_period}, start_date: {start_date}, end_date: {end_date}")
+        logger.debug("Parsed time period: %s, start_date: %s, end_date: %s", time_period, start_date, end_date)
         if not time_period:
             return {
                 "status": "error",
@@ -273,14 +329,14 @@ def execute_dynamic_transaction_query(query: str) -> Dict[str, Any]:
             }
         
         # Filter transactions by date range
-        logger.info(f"[QUERY DEBUG] Applying date filter: {start_date} to {end_date}")
+        logger.debug("Applying date filter: %s to %s", start_date, end_date)
         filtered_transactions = _filter_by_date_range(all_transactions, start_date, end_date)
-        logger.info(f"[QUERY DEBUG] After date filtering: {len(filtered_transactions)} transactions remain")
+        logger.debug("After date filtering: %s transactions remain", len(filtered_transactions))
         
         # Determine query type (transaction amount, spending, income, etc.)
-        logger.info(f"[QUERY DEBUG] Analyzing transactions based on query type: '{query}'")
+        logger.debug("Analyzing transactions based on query type: '%s'", query)
         result = _analyze_transactions_by_query(query, filtered_transactions)
-        logger.info(f"[QUERY DEBUG] Analysis result type: {result.get('type', 'unknown')}")
+        logger.debug("Analysis result type: %s", result.get('type', 'unknown'))
         
         # Add context to the response
         result["time_period"] = time_period
@@ -297,7 +353,7 @@ def execute_dynamic_transaction_query(query: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        logger.error(f"Error executing dynamic transaction query: {e}")
+        logger.error("Error executing dynamic transaction query: %s", e)
         return {
             "status": "error",
             "message": f"Unable to process this query: {str(e)}"
@@ -379,10 +435,10 @@ def _filter_by_date_range(transactions: List[Dict[str, Any]], start_date: date,
         Filtered list of transactions
     """
     if not start_date or not end_date:
-        logger.info(f"[QUERY DEBUG] No date range provided, returning all {len(transactions)} transactions")
+        logger.debug("No date range provided, returning all %s transactions", len(transactions))
         return transactions
     
-    logger.info(f"[QUERY DEBUG] Filtering {len(transactions)} transactions by date range: {start_date} to {end_date}")
+    logger.debug("Filtering %s transactions by date range: %s to %s", len(transactions), start_date, end_date)
     filtered = []
     date_parse_failures = 0
     date_format_issues = 0
@@ -410,29 +466,29 @@ def _filter_by_date_range(transactions: List[Dict[str, Any]], start_date: date,
                         except ValueError:
                             date_parse_failures += 1
                             if date_parse_failures <= 3:  # Limit logging to avoid spam
-                                logger.warning(f"[QUERY DEBUG] Could not parse date '{txn.get('date')}' for transaction {txn_id}")
+                                logger.debug("Could not parse date '%s' for transaction %s", txn.get('date'), txn_id)
                             continue
         elif isinstance(txn.get("date"), (datetime, date)):
             txn_date = txn["date"].date() if isinstance(txn["date"], datetime) else txn["date"]
         else:
             date_format_issues += 1
             if date_format_issues <= 3:  # Limit logging to avoid spam
-                logger.warning(f"[QUERY DEBUG] Transaction {txn_id} has no date field or invalid date type: {type(txn.get('date'))}")
+                logger.debug("Transaction %s has no date field or invalid date type: %s", txn_id, type(txn.get('date')))
             continue
         
         if txn_date and start_date <= txn_date <= end_date:
             filtered.append(txn)
             if len(filtered) <= 3 or len(filtered) % 50 == 0:  # Log first few and then every 50th
-                logger.info(f"[QUERY DEBUG] Transaction {txn_id} with date {txn_date} INCLUDED in results")
+                logger.debug("Transaction %s with date %s INCLUDED in results", txn_id, txn_date)
         else:
             if i < 5:  # Only log first few excluded transactions to avoid spam
-                logger.info(f"[QUERY DEBUG] Transaction {txn_id} with date {txn_date} EXCLUDED from results")
+                logger.debug("Transaction %s with date %s EXCLUDED from results", txn_id, txn_date)
     
-    logger.info(f"[QUERY DEBUG] Date filtering complete: {len(filtered)}/{len(transactions)} transactions matched")
+    logger.debug("Date filtering complete: %s/%s transactions matched", len(filtered), len(transactions))
     if date_parse_failures > 0:
-        logger.warning(f"[QUERY DEBUG] {date_parse_failures} transactions had unparseable dates")
+        logger.warning("%s transactions had unparseable dates", date_parse_failures)
     if date_format_issues > 0:
-        logger.warning(f"[QUERY DEBUG] {date_format_issues} transactions had missing or invalid date fields")
+        logger.warning("%s transactions had missing or invalid date fields", date_format_issues)
             
     return filtered
 
@@ -451,48 +507,48 @@ def _analyze_transactions_by_query(query: str, transactions: List[Dict[str, Any]
     query = query.lower()
     result = {}
     
-    logger.info(f"[QUERY DEBUG] Analyzing {len(transactions)} transactions for query type matching: '{query}'")
+    logger.debug("Analyzing %s transactions for query type matching: '%s'", len(transactions), query)
     
     # Check for different query types
     if re.search(r'transaction\s+amount|spent|spend|spending', query):
         # Calculate total spending
-        logger.info(f"[QUERY DEBUG] Query matched SPENDING pattern")
+        logger.debug("Query matched SPENDING pattern")
         
         # Log some sample transactions for debugging
-        for i, txn in enumerate(transactions[:5]):
-            logger.info(f"[QUERY DEBUG] Sample transaction {i+1}: id={txn.get('id', 'unknown')}, withdrawn={txn.get('withdrawn', 0)}, deposit={txn.get('deposit', 0)}, narration={txn.get('narration', 'none')}")
+        for i, txn in enumerate(transactions[:5] if logger.isEnabledFor(logging.DEBUG) else ()):
+            logger.debug("Sample transaction %s: id=%s, withdrawn=%s, deposit=%s, narration=%s", i+1, txn.get('id', 'unknown'), txn.get('withdrawn', 0), txn.get('deposit', 0), txn.get('narration', 'none'))
         
         total_withdrawn = sum(txn.get("withdrawn", 0) for txn in transactions)
-        logger.info(f"[QUERY DEBUG] Total spending (withdrawn) amount: {total_withdrawn}")
+        logger.debug("Total spending (withdrawn) amount: %s", total_withdrawn)
         result["total_amount"] = total_withdrawn
         result["type"] = "spending"
         
     elif re.search(r'income|deposit|earning|earned', query):
         # Calculate total income
-        logger.info(f"[QUERY DEBUG] Query matched INCOME pattern")
+        logger.debug("Query matched INCOME pattern")
         
         # Log some sample transactions for debugging
-        for i, txn in enumerate(transactions[:5]):
-            logger.info(f"[QUERY DEBUG] Sample transaction {i+1}: id={txn.get('id', 'unknown')}, deposit={txn.get('deposit', 0)}, withdrawn={txn.get('withdrawn', 0)}, narration={txn.get('narration', 'none')}")
+        for i, txn in enumerate(transactions[:5] if logger.isEnabledFor(logging.DEBUG) else ()):
+            logger.debug("Sample transaction %s: id=%s, deposit=%s, withdrawn=%s, narration=%s", i+1, txn.get('id', 'unknown'), txn.get('deposit', 0), txn.get('withdrawn', 0), txn.get('narration', 'none'))
         
         total_deposit = sum(txn.get("deposit", 0) for txn in transactions)
-        logger.info(f"[QUERY DEBUG] Total income (deposit) amount: {total_deposit}")
+        logger.debug("Total income (deposit) amount: %s", total_deposit)
         result["total_amount"] = total_deposit
         result["type"] = "income"
         
     elif re.search(r'balance|net|difference', query):
         # Calculate net balance (income - spending)
-        logger.info(f"[QUERY DEBUG] Query matched BALANCE/NET pattern")
+        logger.debug("Query matched BALANCE/NET pattern")
         
         # Log some sample transactions for debugging
-        for i, txn in enumerate(transactions[:5]):
-            logger.info(f"[QUERY DEBUG] Sample transaction {i+1}: id={txn.get('id', 'unknown')}, deposit={txn.get('deposit', 0)}, withdrawn={txn.get('withdrawn', 0)}, narration={txn.get('narration', 'none')}")
+        for i, txn in enumerate(transactions[:5] if logger.isEnabledFor(logging.DEBUG) else ()):
+            logger.debug("Sample transaction %s: id=%s, deposit=%s, withdrawn=%s, narration=%s", i+1, txn.get('id', 'unknown'), txn.get('deposit', 0), txn.get('withdrawn', 0), txn.get('narration', 'none'))
         
         total_deposit = sum(txn.get("deposit", 0) for txn in transactions)
         total_withdrawn = sum(txn.get("withdrawn", 0) for txn in transactions)
         net_change = total_deposit - total_withdrawn
         
-        logger.info(f"[QUERY DEBUG] Total income: {total_deposit}, Total spending: {total_withdrawn}, Net change: {net_change}")
+        logger.debug("Total income: %s, Total spending: %s, Net change: %s", total_deposit, total_withdrawn, net_change)
         
         result["total_amount"] = net_change
         result["deposit"] = total_deposit
@@ -1,18 +1,44 @@
+from dotenv import load_dotenv
+
+# Load environment variables from .env file before any module reads them
+load_dotenv()
+
+from contextlib import asynccontextmanager
 from typing import Union
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-from integrations.llm.initial_analyser import initialize_pipeline
-from integrations.llm.agentic import initialize_agents
-from routers import auth, transactions, relations, spendings, ai, mutual_funds
+from integrations.llm.loader import start_agent_warmup
+from integrations.llm.mcp import mcp_pool
+from routers import auth, transactions, relations, spendings, ai, mutual_funds, holdings, portfolio, ledger, changes, metrics
+from utils.executors import shutdown_pools
+from utils.passwords import shutdown_hasher
+from services.change_feed_service import change_hub
+from services.import_service import shutdown_imports
+from utils.responses import ORJSONResponse, add_compression
+from utils.metrics import MetricsMiddleware
+from utils.tracing import TracingMiddleware, configure_tracing, shutdown_tracing
+from utils.logging_config import configure_logging, shutdown_logging
 
-# Load environment variables from .env file
-load_dotenv()
+configure_logging()
+configure_tracing()
 
 from fastapi.middleware.cors import CORSMiddleware
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Agents load in the background; CRUD routes serve immediately
+    start_agent_warmup()
+    yield
+    await mcp_pool.close()
+    shutdown_imports()
+    change_hub.close()
+    shutdown_pools()
+    shutdown_hasher()
+    shutdown_tracing()
+    shutdown_logging()
+
 # Initialize the FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +48,10 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+add_compression(app)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
@@ -36,4 +66,9 @@ app.include_router(transactions.router)
 app.include_router(relations.router)
 app.include_router(spendings.router)
 app.include_router(ai.router)
-app.include_router(mutual_funds.router)
\ No newline at end of file
+app.include_router(mutual_funds.router)
+app.include_router(holdings.router)
+app.include_router(portfolio.router)
+app.include_router(ledger.router)
+app.include_router(changes.router)
+app.include_router(metrics.router)
\ No newline at end of file
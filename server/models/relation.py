@@ -10,5 +10,6 @@ class RelationIn(BaseModel):
 
 class Relation(RelationIn):
     id: str
+    primary_amount: Optional[float] = None
     created_at: datetime
     updated_at: datetime
\ No newline at end of file
@@ -3,11 +3,17 @@ from typing import Optional
 from datetime import datetime, date
 
 class SpendingIn(BaseModel):
+    user_id: str
     date: date
     title: str
     category: str
     amount: float
 
+class SpendingBulkIn(SpendingIn):
+    # Client-chosen key that makes retried bulk rows idempotent;
+    # rows without one are keyed by a hash of their content
+    idempotency_key: Optional[str] = None
+
 class Spending(SpendingIn):
     id: str
     created_at: datetime
@@ -15,6 +15,8 @@ class TransactionIn(BaseModel):
 
 class Transaction(TransactionIn):
     id: str
-    closing_balance: float
+    amount_paise: int
+    closing_balance: Optional[float] = None
+    schema_version: int
     created_at: datetime
     updated_at: datetime
\ No newline at end of file
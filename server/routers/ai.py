@@ -1,13 +1,10 @@
-from fastapi import APIRouter, HTTPException
+import logging
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from integrations.llm.agentic import process_request
-from integrations.llm.initial_analyser import initialize_pipeline, runner
-from integrations.llm.agentic import logger
-
-# Import new GenAI SDK
-from google import genai
-from google.genai import types
+from integrations.llm.loader import get_agent_system
+from utils.tracing import trace_events
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/ai",
@@ -21,33 +18,33 @@ class QueryRequest(BaseModel):
 
 
 @router.post("/run-initial-pipeline")
-async def run_initial_pipeline(user_id: str):
+async def run_initial_pipeline(user_id: str, agents=Depends(get_agent_system)):
     """Endpoint to trigger the initial data cleaning and tagging pipeline."""
     try:
         # Initialize the pipeline runner and session
-        current_runner, session = await initialize_pipeline(user_id)
+        current_runner, session = await agents.initial_analyser.initialize_pipeline(user_id)
         if not current_runner or not session:
             raise HTTPException(status_code=500, detail="Initial pipeline runner or session not available.")
         
         # Construct the user content using new GenAI SDK types
-        user_content = types.UserContent(
+        user_content = agents.types.UserContent(
             parts=[
-                types.Part.from_text(text="Start the initial data processing")
+                agents.types.Part.from_text(text="Start the initial data processing")
             ]
         )
 
         
         # Call the async run method of your runner with proper arguments
-        async_gen = current_runner.run_async(
+        async_gen = trace_events(current_runner.run_async(
             user_id=session.user_id,   # Pass user ID from session
             session_id=session.id,     # Pass session ID from session object
             new_message=user_content   # Use UserContent instance
-        )
+        ))
         
         # Collect assistant responses
         responses = []
         async for event in async_gen:
-            logger.info(f"Received event type: {type(event).__name__}")
+            logger.info("Received event type: %s", type(event).__name__)
             
             # Depending on event structure, extract content from assistant responses
             if hasattr(event, 'role') and event.role == 'assistant' and hasattr(event, 'content'):
@@ -70,10 +67,10 @@ async def run_initial_pipeline(user_id: str):
 
 
 @router.post("/query")
-async def query_agent(request: QueryRequest):
+async def query_agent(request: QueryRequest, agents=Depends(get_agent_system)):
     """Endpoint to process a user query through the main FinVista agent."""
     try:
-        response = await process_request(request.query, request.user_id)
+        response = await agents.agentic.process_request(request.query, request.user_id)
         return {"status": "success", "response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,19 +2,26 @@ from fastapi import APIRouter, HTTPException
 from typing import List
 from models.user import UserIn
 from services.auth_service import authenticate_or_register
+from utils.passwords import PasswordHasherBusy, get_hasher_stats
 from data.user_dao import get_users_by_ids, update_user, bulk_update_users
 
 router = APIRouter(prefix="/auth")
 
 @router.post("/login")
-def login(data: UserIn):
+async def login(data: UserIn):
     try:
         name = data.name if data.name else "Alex"
-        user = authenticate_or_register(name, data.email, data.password)
+        user = await authenticate_or_register(name, data.email, data.password)
         return {"user": user}
+    except PasswordHasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/hashing-stats")
+def hashing_stats():
+    return get_hasher_stats()
+
 @router.post("/users/bulk-fetch")
 def bulk_fetch_users(user_ids: List[str]):
     try:
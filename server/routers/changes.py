@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from services.change_feed_service import CLOSED, change_hub
+from utils.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["changes"])
+
+# Close code when the server-side listener cannot start or died; clients reconnect
+FEED_UNAVAILABLE = 1011
+
+async def _forward(websocket: WebSocket, queue: asyncio.Queue):
+    try:
+        while True:
+            message = await queue.get()
+            if message is CLOSED:
+                await websocket.close(code=FEED_UNAVAILABLE, reason="Change feed listener stopped")
+                return
+            await websocket.send_text(dumps(message).decode())
+    except WebSocketDisconnect:
+        pass
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    # Clients do not send anything; reading is how a closed socket is noticed
+    # while no changes are flowing
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/ws/users/{user_id}/changes")
+async def changes(websocket: WebSocket, user_id: str, since: Optional[datetime] = None):
+    """
+    Push added/modified/removed deltas of the user's transactions as they
+    happen. The first message is a {"type": "catch_up"} with the rows
+    updated after `since` (the latest updated_at the client has read; all
+    rows when omitted) and the ids still present. A {"type": "resync"}
+    message means deltas were dropped and the client should refetch. The
+    socket is closed with code 1011 when the listener cannot start or dies,
+    so the client reconnects.
+    """
+    await websocket.accept()
+    async with AsyncExitStack() as stack:
+        try:
+            queue = await stack.enter_async_context(change_hub.subscribe(user_id, since))
+        except Exception as e:
+            logger.error("Could not start the change feed for user %s: %s", user_id, e)
+            await websocket.close(code=FEED_UNAVAILABLE, reason="Change feed unavailable")
+            return
+        tasks = [
+            asyncio.create_task(_forward(websocket, queue)),
+            asyncio.create_task(_wait_for_disconnect(websocket)),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
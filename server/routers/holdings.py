@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from utils.responses import ORJSONResponse
+from data.holding_dao import MUTUAL_FUND, STOCK
+from services.holding_service import (
+    import_mutual_fund_statement,
+    import_stock_statement,
+    get_user_holdings
+)
+
+router = APIRouter(prefix="/holdings", tags=["holdings"])
+
+@router.post("/user/{user_id}/mutual-funds/import")
+def import_mutual_funds(user_id: str, file: UploadFile = File(...)):
+    """Import a CAS CSV export into the user's mutual fund folios."""
+    try:
+        return import_mutual_fund_statement(user_id, file.file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/user/{user_id}/stocks/import")
+def import_stocks(user_id: str, file: UploadFile = File(...)):
+    """Import a broker tradebook CSV into the user's stock holdings."""
+    try:
+        return import_stock_statement(user_id, file.file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/user/{user_id}")
+def get_by_user_id(user_id: str, asset_type: str = MUTUAL_FUND):
+    if asset_type not in (MUTUAL_FUND, STOCK):
+        raise HTTPException(status_code=422, detail=f"asset_type must be '{MUTUAL_FUND}' or '{STOCK}'")
+    try:
+        return ORJSONResponse(get_user_holdings(user_id, asset_type))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
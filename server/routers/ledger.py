@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Request
+from typing import Optional
+from data.transaction_dao import TXNS, TRANSACTION_FIELDS
+from data.relation_dao import RELS
+from services.ledger_service import get_user_ledger
+from utils.http_cache import check_data_version
+from utils.responses import ORJSONResponse
+from utils.fields import parse_fields
+
+router = APIRouter(prefix="/users", tags=["ledger"])
+
+@router.get("/{user_id}/ledger")
+async def get_ledger(user_id: str, request: Request, fields: Optional[str] = None):
+    """
+    Transactions with their relations joined in, plus the relations keyed by
+    id. Supports If-None-Match; fields= projects the transactions.
+    """
+    try:
+        projection = parse_fields(fields, TRANSACTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    not_modified, headers = await check_data_version(request, user_id, (TXNS, RELS))
+    if not_modified:
+        return not_modified
+    try:
+        ledger = await get_user_ledger(user_id, projection)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(ledger, headers=headers)
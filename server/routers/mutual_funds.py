@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Request
+from typing import Optional
 import sys
 import os
 
@@ -7,21 +7,29 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from integrations.llm.mutual_fund_pipeline import MutualFundPipeline
-from integrations.llm.stocks_pipeline import StockPipeline 
+from integrations.llm.stocks_pipeline import StockPipeline
+from utils.responses import ORJSONResponse
+from utils.http_cache import check_data_version
+from data.holding_dao import HOLDINGS
 
 router = APIRouter(prefix="/api/mutual-funds", tags=["mutual-funds"])
 
 @router.get("/analysis")
-async def get_mutual_fund_analysis():
+async def get_mutual_fund_analysis(request: Request, user_id: Optional[str] = None, lean: bool = False):
     """
-    Get comprehensive mutual fund portfolio analysis
+    Get comprehensive mutual fund portfolio analysis. Without a user_id the
+    sample portfolio is analysed; lean=true omits each holding's transactions.
     """
+    not_modified, headers = await check_data_version(request, user_id, (HOLDINGS,))
+    if not_modified:
+        return not_modified
     try:
         pipeline = MutualFundPipeline()
-        analysis_data = await pipeline.get_portfolio_analysis()
+        analysis_data = await pipeline.get_portfolio_analysis(user_id, lean=lean)
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
+            headers=headers,
             content={
                 "success": True,
                 "data": analysis_data,
@@ -36,16 +44,20 @@ async def get_mutual_fund_analysis():
         )
 
 @router.get("/holdings")
-async def get_mutual_fund_holdings():
+async def get_mutual_fund_holdings(request: Request, user_id: Optional[str] = None, lean: bool = False):
     """
     Get basic mutual fund holdings data
     """
+    not_modified, headers = await check_data_version(request, user_id, (HOLDINGS,))
+    if not_modified:
+        return not_modified
     try:
         pipeline = MutualFundPipeline()
-        analysis_data = await pipeline.get_portfolio_analysis()
+        analysis_data = await pipeline.get_portfolio_analysis(user_id, lean=lean)
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
+            headers=headers,
             content={
                 "success": True,
                 "data": {
@@ -63,16 +75,20 @@ async def get_mutual_fund_holdings():
         )
 
 @router.get("/performance")
-async def get_performance_metrics():
+async def get_performance_metrics(request: Request, user_id: Optional[str] = None):
     """
     Get performance metrics including top performers and underperformers
     """
+    not_modified, headers = await check_data_version(request, user_id, (HOLDINGS,))
+    if not_modified:
+        return not_modified
     try:
         pipeline = MutualFundPipeline()
-        analysis_data = await pipeline.get_portfolio_analysis()
+        analysis_data = await pipeline.get_portfolio_analysis(user_id, lean=True)
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
+            headers=headers,
             content={
                 "success": True,
                 "data": {
@@ -92,16 +108,20 @@ async def get_performance_metrics():
         )
 
 @router.get("/classification")
-async def get_fund_classification():
+async def get_fund_classification(request: Request, user_id: Optional[str] = None):
     """
     Get fund classification data
     """
+    not_modified, headers = await check_data_version(request, user_id, (HOLDINGS,))
+    if not_modified:
+        return not_modified
     try:
         pipeline = MutualFundPipeline()
-        analysis_data = await pipeline.get_portfolio_analysis()
+        analysis_data = await pipeline.get_portfolio_analysis(user_id, lean=True)
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
+            headers=headers,
             content={
                 "success": True,
                 "data": {
@@ -119,16 +139,20 @@ async def get_fund_classification():
         )
 
 @router.get("/stock-analysis")
-async def get_stock_analysis_from_mutual_fund_route():
+async def get_stock_analysis_from_mutual_fund_route(request: Request, user_id: Optional[str] = None, lean: bool = False):
     """
     Get comprehensive stock portfolio analysis (from /api/mutual-funds route)
     """
+    not_modified, headers = await check_data_version(request, user_id, (HOLDINGS,))
+    if not_modified:
+        return not_modified
     try:
         pipeline = StockPipeline()
-        analysis_data = await pipeline.get_portfolio_analysis()
+        analysis_data = await pipeline.get_portfolio_analysis(user_id, lean=lean)
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
+            headers=headers,
             content={
                 "success": True,
                 "data": analysis_data,
@@ -0,0 +1,43 @@
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import APIRouter, HTTPException
+from utils.responses import ORJSONResponse
+from typing import Optional
+
+from integrations.llm.portfolio_overview import PortfolioOverviewPipeline
+from utils.executors import discard_analysis_pool, get_analysis_pool
+
+router = APIRouter(prefix="/portfolio", tags=["portfolio"])
+
+@router.get("/overview")
+async def get_portfolio_overview(user_id: Optional[str] = None):
+    """
+    Get mutual funds, stocks and bank balance in one payload, with a merged
+    net-worth timeline. The two analyses run concurrently in a process pool.
+    """
+    pool = get_analysis_pool()
+    try:
+        pipeline = PortfolioOverviewPipeline()
+        overview = await pipeline.get_overview(user_id, executor=pool)
+
+        return ORJSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "data": overview,
+                "message": "Portfolio overview retrieved successfully"
+            }
+        )
+    except BrokenProcessPool as e:
+        # A worker died; replace the pool so later requests are served again
+        discard_analysis_pool(pool)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Analysis workers restarted, please retry: {str(e)}",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        print(f"Error in portfolio overview endpoint: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve portfolio overview: {str(e)}"
+        )
@@ -1,4 +1,10 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, Request
+from typing import List, Optional
+from utils.responses import ORJSONResponse
+from utils.http_cache import check_data_version
+from data.relation_dao import RELS, RELATION_FIELDS
+from utils.fields import parse_fields
 from models.relation import RelationIn
 from services.relation_service import (
     create_new_relation, 
@@ -7,7 +13,13 @@ from services.relation_service import (
     get_user_relations,
     list_all_relations,
     remove_relation,
-    add_transaction_to_relation
+    add_transaction_to_relation,
+    lookup_transaction_relations
+)
+from services.settlement_service import (
+    get_settlement_suggestions,
+    create_relations_in_bulk,
+    auto_settle
 )
 
 router = APIRouter(prefix="/relations")
@@ -19,6 +31,44 @@ def create(rel: RelationIn):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/lookup")
+def lookup(transaction_ids: List[str]):
+    """Map each given transaction id to its relation id and primary flag; unrelated ids are omitted."""
+    try:
+        return lookup_transaction_relations(transaction_ids)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/bulk")
+def create_bulk(relations: List[RelationIn]):
+    """Create many relations in batched writes, e.g. accepted settlement suggestions."""
+    try:
+        by_user = {}
+        for rel in relations:
+            by_user.setdefault(rel.user_id, []).append(rel.dict())
+        created = []
+        for user_id, rels in by_user.items():
+            created.extend(create_relations_in_bulk(user_id, rels))
+        return created
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/user/{user_id}/suggestions")
+def suggestions(user_id: str):
+    """Propose split-bill and loan/repayment relations among the user's unrelated transactions."""
+    try:
+        return get_settlement_suggestions(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/user/{user_id}/auto-settle")
+def settle(user_id: str, min_confidence: float = 0.8):
+    """Create every suggestion at or above min_confidence in one call."""
+    try:
+        return auto_settle(user_id, min_confidence)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/{rel_id}")
 def update(rel_id: str, updates: dict):
     try:
@@ -37,9 +87,18 @@ def get_by_id(rel_id: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/user/{user_id}")
-def get_by_user_id(user_id: str):
+async def get_by_user_id(user_id: str, request: Request, fields: Optional[str] = None):
+    """fields=related_transactions,... returns only those fields (plus id) of each relation."""
+    try:
+        projection = parse_fields(fields, RELATION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    not_modified, headers = await check_data_version(request, user_id, (RELS,))
+    if not_modified:
+        return not_modified
     try:
-        return get_user_relations(user_id)
+        relations = await asyncio.to_thread(get_user_relations, user_id, projection)
+        return ORJSONResponse(relations, headers=headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
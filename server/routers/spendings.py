@@ -1,13 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from models.spending import SpendingIn
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import List, Optional
+from data.spending_dao import SPENDINGS, SPENDING_FIELDS
+from utils.fields import parse_fields
+from utils.http_cache import check_data_version
+from utils.responses import ORJSONResponse
+from models.spending import SpendingIn, SpendingBulkIn
 from services.spending_service import (
     create_new_spending,
     get_spending,
-    list_all_spendings,
     update_spending_data,
     remove_spending,
-    create_multiple_spendings
+    create_multiple_spendings,
+    get_user_spendings,
+    get_user_spending_summary
 )
 
 router = APIRouter(prefix="/spendings")
@@ -20,13 +26,60 @@ def create(spending: SpendingIn):
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/bulk")
-def create_multiple(spendings: List[SpendingIn]):
+def create_multiple(spendings: List[SpendingBulkIn]):
+    """
+    Idempotent bulk create: returns created and skipped ids, so a timed-out
+    request can be retried as is, and the count of rows repeating an
+    idempotency_key within the request.
+    """
     try:
         spending_dicts = [spending.dict() for spending in spendings]
         return create_multiple_spendings(spending_dicts)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/user/{user_id}")
+async def get_by_user_id(
+    user_id: str,
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    A page of the user's spendings, newest first; pass next_cursor back as
+    cursor for the next page. fields=date,amount,... trims each item.
+    """
+    try:
+        projection = parse_fields(fields, SPENDING_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    not_modified, headers = await check_data_version(request, user_id, (SPENDINGS,))
+    if not_modified:
+        return not_modified
+    try:
+        page = await asyncio.to_thread(get_user_spendings, user_id, limit, cursor, projection)
+        return ORJSONResponse(page, headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/user/{user_id}/rollups")
+async def get_rollups(
+    user_id: str,
+    request: Request,
+    start_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    end_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$")
+):
+    """Totals by category and month (YYYY-MM) from incrementally maintained counters."""
+    not_modified, headers = await check_data_version(request, user_id, (SPENDINGS,))
+    if not_modified:
+        return not_modified
+    try:
+        summary = await asyncio.to_thread(get_user_spending_summary, user_id, start_month, end_month)
+        return ORJSONResponse(summary, headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/{spending_id}")
 def get_by_id(spending_id: str):
     try:
@@ -37,13 +90,6 @@ def get_by_id(spending_id: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/")
-def get_all():
-    try:
-        return list_all_spendings()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
 @router.put("/{spending_id}")
 def update(spending_id: str, updates: dict):
     try:
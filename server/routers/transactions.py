@@ -1,5 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+import asyncio
+import tempfile
+from fastapi import APIRouter, File, HTTPException, Request, UploadFile
+from typing import List, Optional
+from data.transaction_dao import TXNS, TRANSACTION_FIELDS
+from data.relation_dao import RELS
+from utils.http_cache import check_data_version
+from utils.fields import parse_fields
+from utils.responses import ORJSONResponse
 from models.transaction import TransactionIn
 from services.transaction_service import (
     create_transactions, 
@@ -7,24 +14,39 @@ from services.transaction_service import (
     get_user_transactions,
     bulk_update_transaction_data
 )
+from services.import_service import UPLOAD_SPOOL_BYTES, start_statement_import, get_import_progress
 
 router = APIRouter(prefix="/transactions")
 
 @router.post("/", response_model=List[str])
 def create_multiple(txns: List[TransactionIn]):
-    return create_transactions(txns)
+    try:
+        return create_transactions(txns)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @router.put("/{txn_id}")
 def update(txn_id: str, updates: dict):
     try:
         return update_single_transaction(txn_id, updates)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.get("/user/{user_id}")
-def get_by_user_id(user_id: str):
+async def get_by_user_id(user_id: str, request: Request, include_relations: bool = False, fields: Optional[str] = None):
+    """fields=date,narration,... returns only those fields (plus id) of each transaction."""
+    try:
+        projection = parse_fields(fields, TRANSACTION_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    not_modified, headers = await check_data_version(request, user_id, (TXNS, RELS) if include_relations else (TXNS,))
+    if not_modified:
+        return not_modified
     try:
-        return get_user_transactions(user_id)
+        transactions = await asyncio.to_thread(get_user_transactions, user_id, include_relations, projection)
+        return ORJSONResponse(transactions, headers=headers)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -33,5 +55,34 @@ def bulk_update(updates: List[dict]):
     try:
         bulk_update_transaction_data(updates)
         return {"message": "Transactions updated successfully"}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/user/{user_id}/upload", status_code=202)
+async def upload_statement(user_id: str, file: UploadFile = File(...)):
+    """
+    Import a bank statement (CSV, XLSX/XLS, JSON/JSON Lines, or text
+    extracted from a PDF) in the background. Returns the import job; poll
+    GET /transactions/imports/{job_id} for progress.
+    """
+    # Copied into a file the job owns: the upload is closed when this request ends
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    try:
+        while chunk := await file.read(1 << 20):
+            await asyncio.to_thread(spool.write, chunk)
+        return await asyncio.to_thread(start_statement_import, user_id, spool, file.filename)
+    except ValueError as e:
+        spool.close()
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        spool.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/imports/{job_id}")
+def get_import(job_id: str):
+    job = get_import_progress(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
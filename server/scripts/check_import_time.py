@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Check that importing the app stays fast and keeps the agent SDKs off the startup path
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter with
+the in-memory Firestore backend, prints the slowest top-level imports and
+exits non-zero if the total exceeds the budget or a deferred module was
+imported.
+
+Usage:
+  python scripts/check_import_time.py [--budget-ms 1500] [--top 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded in the background by integrations.llm.loader, never by `import main`
+DEFERRED = ("google.adk", "google.genai", "google.generativeai", "mcp", "integrations.llm.agentic", "integrations.llm.initial_analyser")
+
+
+def measure(module: str) -> list:
+    """(cumulative microseconds, depth, name) for every import `import module` triggers."""
+    env = {**os.environ, "FIRESTORE_BACKEND": os.getenv("FIRESTORE_BACKEND", "memory")}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative), depth, name.strip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total_ms = next(us for us, depth, name in rows if name == args.module) / 1000
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for us, depth, name in sorted((r for r in rows if r[1] <= 2), reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+    failed = False
+    names = {name for _, _, name in rows}
+    leaked = [d for d in DEFERRED if any(name == d or name.startswith(d + ".") for name in names)]
+    if leaked:
+        print(f"❌ Deferred modules imported at startup: {', '.join(leaked)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"❌ Over budget by {total_ms - args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ Within budget")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
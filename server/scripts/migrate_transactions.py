@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Rewrite stored transactions into the canonical schema (signed amount_paise,
+timestamp date, credit/debit type). Resumes from its checkpoint when
+interrupted; documents it cannot migrate are listed for review.
+
+Usage:
+  python scripts/migrate_transactions.py [--page-size 200] [--max-pages N] [--restart]
+"""
+
+import argparse
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.transaction_dao import migrate_transaction_schema
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=200, help="documents rewritten per Firestore transaction")
+    parser.add_argument("--max-pages", type=int, default=None, help="stop after this many pages; run again to continue")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first document")
+    args = parser.parse_args()
+
+    state = migrate_transaction_schema(args.page_size, args.restart, args.max_pages)
+    print(f"✅ Migrated {state['migrated']} transactions ({state['current']} already current) up to {state['last_id']}, status {state['status']}")
+    if state["failed"]:
+        print(f"⚠️  {state['failed']} transactions left unmigrated: {', '.join(state['failed_ids'])}")
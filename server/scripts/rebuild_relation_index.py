@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Backfill the relation_index collection from existing relations
+
+Usage:
+  python scripts/rebuild_relation_index.py
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.relation_dao import rebuild_relation_index
+
+if __name__ == "__main__":
+    count = rebuild_relation_index()
+    print(f"✅ Indexed {count} relations")
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Backfill the spending_rollups counters from existing spendings
+
+Usage:
+  python scripts/rebuild_spending_rollups.py [user_id]
+"""
+
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data.spending_dao import rebuild_spending_rollups
+
+if __name__ == "__main__":
+    count = rebuild_spending_rollups(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"✅ Rebuilt {count} monthly rollups")
@@ -7,14 +7,11 @@ from datetime import date, timedelta
 
 # make sure your FIREBASE creds are found, e.g.
 # export GOOGLE_APPLICATION_CREDENTIALS="path/to/serviceAccountKey.json"
-from passlib.context import CryptContext
-
 from data.user_dao import get_user_by_email, create_user
 from data.transaction_dao import batch_create
 from data.relation_dao import create_relation
 from models.transaction import TransactionIn
-
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from utils.passwords import hash_password
 
 def main():
     # 1) Create or fetch test users
@@ -30,7 +27,7 @@ def main():
             print(f"[SKIP] user exists: {u['email']} ({existing['id']})")
             seeded_users.append(existing)
         else:
-            hashed = pwd_ctx.hash(u["password"])
+            hashed = hash_password(u["password"])
             name = u.get("name", "Alex")  # Default to "Alex" if name not provided
             new_u = create_user(name, u["email"], hashed)
             print(f"[CREATED] user: {name} ({u['email']}) ({new_u['id']})")
@@ -58,7 +55,7 @@ def main():
                     type=ttype,
                     tags=["seed", "test"],
                     remarks="automated seed data",
-                    processed=True,
+                    processed="analyzed",
                 )
             )
 
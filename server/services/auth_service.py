@@ -1,20 +1,24 @@
-from passlib.context import CryptContext
-from data.user_dao import get_user_by_email, create_user
-from utils.security import create_access_token
+import asyncio
+from data.user_dao import get_user_by_email, create_user, update_user
+from utils.security import create_access_token, JWT_EMBED_USER_ID
+from utils.passwords import hash_password_async, verify_and_update_async
 
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def authenticate_or_register(name: str, email: str, password: str):
-    user = get_user_by_email(email)
+async def authenticate_or_register(name: str, email: str, password: str):
+    user = await asyncio.to_thread(get_user_by_email, email)
     if user:
-        if not pwd_ctx.verify(password, user["hashed_password"]):
+        valid, new_hash = await verify_and_update_async(password, user["hashed_password"])
+        if not valid:
             raise Exception("Invalid credentials")
+        if new_hash:
+            # Stored hash uses an outdated scheme or cost; upgrade it transparently
+            await asyncio.to_thread(update_user, user["id"], {"hashed_password": new_hash})
     else:
-        hashed = pwd_ctx.hash(password)
-        user = create_user(name, email, hashed)
+        hashed = await hash_password_async(password)
+        user = await asyncio.to_thread(create_user, name, email, hashed)
 
-    token = create_access_token(
-        data={"sub": user["email"]},
-    )
+    claims = {"sub": user["email"]}
+    if JWT_EMBED_USER_ID:
+        claims["uid"] = user["id"]
+    token = create_access_token(data=claims)
     del user["hashed_password"]
-    return {"access_token": token, "token_type": "bearer", **user}
\ No newline at end of file
+    return {"access_token": token, "token_type": "bearer", **user}
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from data.transaction_dao import watch_transactions_by_user_id
+
+logger = logging.getLogger(__name__)
+
+# Undelivered messages kept per subscriber; a subscriber that falls further
+# behind is told to resync instead of growing without bound.
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "256"))
+
+RESYNC = {"type": "resync"}
+# Queued after a listener died; the socket is closed so the client reconnects
+CLOSED = {"type": "closed"}
+
+# How often each feed checks that its Firestore listener is still streaming
+CHANGE_FEED_WATCHDOG_SECONDS = float(os.getenv("CHANGE_FEED_WATCHDOG_SECONDS", "5"))
+
+# Catch-up re-sends rows updated slightly before the client's watermark,
+# covering writes whose timestamp was taken before a concurrent commit
+CATCH_UP_OVERLAP = timedelta(seconds=30)
+
+
+def _delta(change) -> dict:
+    kind = change.type.name.lower()  # added / modified / removed
+    delta = {"type": kind, "id": change.document.id}
+    if kind != "removed":
+        delta["data"] = change.document.to_dict()
+    return delta
+
+
+def _utc(value: datetime) -> datetime:
+    # Firestore returns aware UTC datetimes; naive ones are already UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _catch_up(docs, since) -> dict:
+    """
+    What a client that read the transactions up to `since` (None: nothing)
+    has missed: rows updated since then, plus every id still present so it
+    can drop rows deleted in between.
+    """
+    cutoff = _utc(since) - CATCH_UP_OVERLAP if since else None
+    changes = []
+    for doc in docs:
+        updated_at = doc.get("updated_at")
+        if cutoff is None or (isinstance(updated_at, datetime) and _utc(updated_at) >= cutoff):
+            changes.append({"type": "modified", "id": doc.id, "data": doc.to_dict()})
+    return {"type": "catch_up", "changes": changes, "ids": [doc.id for doc in docs]}
+
+
+class _UserFeed:
+    """One Firestore listener for a user, fanned out to every subscribed queue."""
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop, on_dead):
+        self.user_id = user_id
+        self.loop = loop
+        self.subscribers = set()
+        self.docs = None  # Latest snapshot, once the listener has delivered one
+        self._waiting = {}  # queue -> since, for subscribers that joined before it
+        self._initial = True
+        self._on_dead = on_dead
+        self.watch = watch_transactions_by_user_id(user_id, self._on_snapshot)
+        self._watchdog = loop.create_task(self._watch_listener())
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # Runs on the listener's thread. The first snapshot replays every
+        # document as "added"; it only seeds the catch-up of waiting subscribers.
+        if self._initial:
+            self._initial = False
+            self.loop.call_soon_threadsafe(self._seed, docs)
+            return
+        if not changes:
+            return
+        message = {
+            "type": "changes",
+            "changes": [_delta(change) for change in changes],
+            "read_time": read_time,
+        }
+        self.loop.call_soon_threadsafe(self._publish, message, docs)
+
+    def _seed(self, docs):
+        self.docs = docs
+        waiting, self._waiting = self._waiting, {}
+        for queue, since in waiting.items():
+            queue.put_nowait(_catch_up(docs, since))
+
+    def add(self, queue: asyncio.Queue, since):
+        """Register a subscriber and queue what it missed since its REST read."""
+        self.subscribers.add(queue)
+        if self.docs is None:
+            self._waiting[queue] = since
+        else:
+            queue.put_nowait(_catch_up(self.docs, since))
+
+    def remove(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        self._waiting.pop(queue, None)
+
+    def _publish(self, message: dict, docs):
+        self.docs = docs
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    async def _watch_listener(self):
+        # A listener that fails (permissions, stream closed) stops calling
+        # back without telling anyone; is_active is the only sign of it
+        while self.watch.is_active:
+            await asyncio.sleep(CHANGE_FEED_WATCHDOG_SECONDS)
+        logger.warning("Change feed listener for user %s stopped; closing %d subscribers", self.user_id, len(self.subscribers))
+        self._on_dead(self)
+        for queue in self.subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(CLOSED)
+
+    def close(self):
+        self._watchdog.cancel()
+        self.watch.unsubscribe()
+
+
+class ChangeFeedHub:
+    """
+    Shares one Firestore listener per active user between all of that user's
+    WebSocket connections. The listener starts with the first subscriber and
+    stops when the last one leaves. Each subscriber first gets a "catch_up"
+    message with the rows updated after its `since` watermark, so writes
+    made between its REST read and the subscription are not lost. When a
+    listener dies its feed is dropped and its subscribers get a "closed"
+    message, so their sockets close and the clients reconnect to a new one.
+    """
+
+    def __init__(self):
+        self._feeds = {}
+        self._lock = threading.RLock()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str, since: datetime = None):
+        queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            feed = self._feeds.get(user_id)
+            if feed is None:
+                feed = self._feeds[user_id] = _UserFeed(user_id, loop, self._drop)
+            feed.add(queue, since)
+        logger.debug("Change feed subscriber added for user %s (%d total)", user_id, len(feed.subscribers))
+        try:
+            yield queue
+        finally:
+            with self._lock:
+                feed.remove(queue)
+                if not feed.subscribers:
+                    self._drop(feed)
+                    feed.close()
+
+    def _drop(self, feed: _UserFeed):
+        """Forget a feed, unless a newer one already replaced it."""
+        with self._lock:
+            if self._feeds.get(feed.user_id) is feed:
+                del self._feeds[feed.user_id]
+
+    def close(self):
+        """Stop every listener; called from the app lifespan."""
+        with self._lock:
+            feeds, self._feeds = list(self._feeds.values()), {}
+        for feed in feeds:
+            feed.close()
+
+
+change_hub = ChangeFeedHub()
@@ -0,0 +1,264 @@
+from data.holding_dao import (
+    MUTUAL_FUND,
+    STOCK,
+    holding_doc_id,
+    rows_to_columns,
+    columns_to_rows,
+    get_holdings_by_ids,
+    get_holdings_by_user_id,
+    save_holdings
+)
+from integrations.llm.fund_categories import default_categorizer
+from collections import Counter, OrderedDict
+from datetime import datetime
+import csv
+import io
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Transaction type codes used by the portfolio pipelines
+TXN_BUY, TXN_SELL, TXN_REINVEST, TXN_DIVIDEND = 1, 2, 3, 4
+
+TXN_TYPE_ALIASES = {
+    "buy": TXN_BUY, "b": TXN_BUY, "purchase": TXN_BUY, "sip": TXN_BUY,
+    "systematic investment": TXN_BUY, "switch in": TXN_BUY,
+    "sell": TXN_SELL, "s": TXN_SELL, "redemption": TXN_SELL, "redeem": TXN_SELL,
+    "switch out": TXN_SELL,
+    "dividend reinvestment": TXN_REINVEST, "reinvest": TXN_REINVEST, "bonus": TXN_REINVEST,
+    "dividend": TXN_DIVIDEND, "dividend payout": TXN_DIVIDEND, "div": TXN_DIVIDEND,
+}
+
+# Header aliases seen in CAS exports and broker tradebooks
+MF_COLUMNS = {
+    "scheme_name": ["scheme_name", "scheme", "schemename", "fund_name"],
+    "isin": ["isin"],
+    "folio_id": ["folio_id", "folio", "folio_no", "folio_number", "folioid"],
+    "date": ["date", "transaction_date", "txn_date"],
+    "type": ["type", "transaction_type", "txn_type", "description"],
+    "price": ["price", "nav"],
+    "units": ["units", "quantity"],
+    "amount": ["amount", "value"],
+}
+
+STOCK_COLUMNS = {
+    "symbol": ["symbol", "tradingsymbol", "scrip", "ticker"],
+    "company_name": ["company_name", "company", "name"],
+    "exchange": ["exchange"],
+    "sector": ["sector", "industry"],
+    "market_cap": ["market_cap", "marketcap", "market_cap_category"],
+    "date": ["date", "trade_date", "transaction_date"],
+    "type": ["type", "trade_type", "transaction_type"],
+    "price": ["price", "trade_price", "rate"],
+    "quantity": ["quantity", "qty", "units"],
+    "amount": ["amount", "value", "net_amount"],
+}
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d-%b-%Y", "%d %b %Y", "%d/%m/%y")
+
+def _normalise_header(name: str) -> str:
+    return (name or "").strip().lower().replace(" ", "_").replace("-", "_")
+
+def _resolve_columns(fieldnames, aliases: dict) -> dict:
+    """Map canonical column names to the header actually used in the file."""
+    present = {_normalise_header(f): f for f in fieldnames or []}
+    resolved = {}
+    for canonical, names in aliases.items():
+        for name in names:
+            if name in present:
+                resolved[canonical] = present[name]
+                break
+    return resolved
+
+def _parse_date(value: str) -> str:
+    value = (value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+def _parse_txn_type(value: str) -> int:
+    value = (value or "").strip().lower()
+    if value.isdigit():
+        return int(value)
+    if value in TXN_TYPE_ALIASES:
+        return TXN_TYPE_ALIASES[value]
+    # CAS descriptions are free text such as "Purchase - SIP" or "Redemption"
+    for alias, code in TXN_TYPE_ALIASES.items():
+        if len(alias) > 2 and alias in value:
+            return code
+    raise ValueError(f"Unrecognised transaction type: {value!r}")
+
+def _parse_number(value) -> float:
+    value = str(value or "0").strip().replace(",", "")
+    if value.startswith("(") and value.endswith(")"):
+        value = "-" + value[1:-1]
+    return float(value) if value else 0.0
+
+def _read_rows(content, aliases: dict, required: list):
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(content))
+    columns = _resolve_columns(reader.fieldnames, aliases)
+    missing = [name for name in required if name not in columns]
+    if missing:
+        raise ValueError(f"Statement is missing columns: {', '.join(missing)}")
+    for line_no, raw in enumerate(reader, start=2):
+        row = {canonical: (raw.get(header) or "").strip() for canonical, header in columns.items()}
+        if any(row.values()):
+            yield line_no, row
+
+def parse_mutual_fund_statement(content) -> dict:
+    """Parse a CAS CSV export into {folio_key: folio} with unsorted transaction rows."""
+    folios = {}
+    for line_no, row in _read_rows(content, MF_COLUMNS, ["scheme_name", "folio_id", "date", "type", "units", "amount"]):
+        try:
+            txn = [
+                _parse_txn_type(row["type"]),
+                _parse_date(row["date"]),
+                _parse_number(row.get("price")),
+                # CAS exports redemptions as negative units; the type carries the side
+                abs(_parse_number(row["units"])),
+                abs(_parse_number(row["amount"])),
+            ]
+        except ValueError as e:
+            raise ValueError(f"Line {line_no}: {e}") from e
+        key = f"{row['folio_id']}_{row.get('isin') or row['scheme_name']}"
+        folio = folios.setdefault(key, {
+            "scheme_name": row["scheme_name"],
+            "isin": row.get("isin", ""),
+            "folio_id": row["folio_id"],
+            "rows": [],
+        })
+        folio["rows"].append(txn)
+    return folios
+
+def parse_stock_statement(content) -> dict:
+    """Parse a broker tradebook CSV into {exchange_symbol: folio} with unsorted transaction rows."""
+    folios = {}
+    for line_no, row in _read_rows(content, STOCK_COLUMNS, ["symbol", "date", "type", "quantity"]):
+        try:
+            price = _parse_number(row.get("price"))
+            quantity = abs(_parse_number(row["quantity"]))
+            amount = abs(_parse_number(row.get("amount"))) or price * quantity
+            txn = [_parse_txn_type(row["type"]), _parse_date(row["date"]), price, quantity, amount]
+        except ValueError as e:
+            raise ValueError(f"Line {line_no}: {e}") from e
+        exchange = row.get("exchange") or "NSE"
+        key = f"{exchange}_{row['symbol']}"
+        folio = folios.setdefault(key, {
+            "symbol": row["symbol"],
+            "company_name": row.get("company_name", ""),
+            "exchange": exchange,
+            "sector": row.get("sector", ""),
+            "market_cap": row.get("market_cap", ""),
+            "rows": [],
+        })
+        folio["rows"].append(txn)
+    return folios
+
+def _import_folios(user_id: str, asset_type: str, folios: dict) -> dict:
+    """
+    Merge parsed folios into the stored ones and write them back. A row
+    that repeats n times is stored n times, counting copies already stored.
+    """
+    if not folios:
+        return {"folios": 0, "transactions": 0}
+
+    doc_ids = {key: holding_doc_id(user_id, asset_type, key) for key in folios}
+    existing = {doc["id"]: doc for doc in get_holdings_by_ids(list(doc_ids.values()))}
+
+    docs = []
+    added = 0
+    for key, folio in folios.items():
+        doc_id = doc_ids[key]
+        stored_rows = columns_to_rows(existing.get(doc_id, {}))
+        # Identical rows are real (two SIP instalments on one day); only the
+        # copies beyond those already stored are new, so re-imports add nothing
+        stored = Counter(tuple(r) for r in stored_rows)
+        new_rows = []
+        for r in folio.pop("rows"):
+            if stored[tuple(r)]:
+                stored[tuple(r)] -= 1
+            else:
+                new_rows.append(r)
+        if not new_rows:
+            continue
+        added += len(new_rows)
+        # Stable sort keeps same-day rows in statement order
+        rows = sorted(stored_rows + new_rows, key=lambda r: r[1])
+        doc = {"id": doc_id, "user_id": user_id, "asset_type": asset_type, **folio, **rows_to_columns(rows)}
+        if doc_id in existing:
+            doc["created_at"] = existing[doc_id].get("created_at")
+        docs.append(doc)
+
+    save_holdings(docs)
+    return {"folios": len(docs), "transactions": added}
+
+def import_mutual_fund_statement(user_id: str, content) -> dict:
+    logger.info("Importing mutual fund statement for user %s", user_id)
+    folios = parse_mutual_fund_statement(content)
+    # Categorise once here so analysis requests never have to
+    categories = default_categorizer.categorize_many((f["scheme_name"], f["isin"]) for f in folios.values())
+    for folio, category in zip(folios.values(), categories):
+        folio["fund_category"] = category
+    return _import_folios(user_id, MUTUAL_FUND, folios)
+
+def import_stock_statement(user_id: str, content) -> dict:
+    logger.info("Importing stock statement for user %s", user_id)
+    return _import_folios(user_id, STOCK, parse_stock_statement(content))
+
+def _to_pipeline_format(doc: dict) -> dict:
+    """Shape a stored folio the way the portfolio pipelines expect it."""
+    if doc.get("asset_type") == STOCK:
+        return {
+            "symbol": doc.get("symbol", ""),
+            "companyName": doc.get("company_name", ""),
+            "exchange": doc.get("exchange", ""),
+            "sector": doc.get("sector", ""),
+            "marketCap": doc.get("market_cap", ""),
+            "txns": columns_to_rows(doc),
+        }
+    return {
+        "schemeName": doc.get("scheme_name", ""),
+        "isin": doc.get("isin", ""),
+        "folioId": doc.get("folio_id", ""),
+        "fundCategory": doc.get("fund_category"),
+        "txns": columns_to_rows(doc),
+    }
+
+# Per-(user, asset type) snapshot of already converted folios, so repeated
+# analyses only read folios whose updated_at moved past the last watermark.
+MAX_CACHED_PORTFOLIOS = 1024
+_snapshots = OrderedDict()
+_snapshots_lock = threading.Lock()
+
+def get_user_holdings(user_id: str, asset_type: str) -> list:
+    """Return a user's folios in pipeline format, reading only folios changed since the last call."""
+    key = (user_id, asset_type)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None:
+            _snapshots.move_to_end(key)
+    watermark = snapshot["watermark"] if snapshot else None
+
+    changed = get_holdings_by_user_id(user_id, asset_type, updated_after=watermark)
+    logger.info("Read %d changed %s folios for user %s", len(changed), asset_type, user_id)
+
+    folios = dict(snapshot["folios"]) if snapshot else {}
+    for doc in changed:
+        folios[doc["id"]] = _to_pipeline_format(doc)
+        updated_at = doc.get("updated_at")
+        if updated_at is not None and (watermark is None or updated_at > watermark):
+            watermark = updated_at
+
+    with _snapshots_lock:
+        _snapshots[key] = {"watermark": watermark, "folios": folios}
+        _snapshots.move_to_end(key)
+        while len(_snapshots) > MAX_CACHED_PORTFOLIOS:
+            _snapshots.popitem(last=False)
+
+    return list(folios.values())
@@ -0,0 +1,210 @@
+"""
+Background import of uploaded bank statements.
+
+The upload route spools the file to a temporary file and returns straight
+away with a job id. A job thread then runs the import in two stages:
+
+- a parser thread reads the statement one row at a time
+  (services.statement_parser) and groups rows into chunks of
+  UPLOAD_CHUNK_ROWS;
+- the job thread writes each chunk with create_missing_transactions.
+
+Chunks pass through a queue holding at most UPLOAD_QUEUE_CHUNKS. When
+Firestore falls behind, the parser blocks on the full queue, so memory
+stays flat however long the statement is. Rows are stored under
+fingerprint ids, so uploading an overlapping statement only adds the new
+rows.
+
+At most UPLOAD_MAX_CONCURRENT imports run at once per process; the rest
+wait as "queued". Progress is kept in the import_jobs collection, so any
+worker can answer GET /transactions/imports/{job_id}.
+"""
+from data.import_job_dao import create_import_job, update_import_job, get_import_job
+from data.transaction_dao import BATCH_LIMIT, create_missing_transactions
+from services.statement_parser import iter_statement_rows, parse_rows, statement_format
+from datetime import datetime
+import logging
+import os
+import queue
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", str(BATCH_LIMIT)))
+UPLOAD_QUEUE_CHUNKS = int(os.getenv("UPLOAD_QUEUE_CHUNKS", "4"))
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "2"))
+# Uploads larger than this are spooled to disk rather than held in memory
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(8 << 20)))
+# Unparsed rows reported with the job; any beyond this are only counted
+MAX_REPORTED_ERRORS = 50
+
+_DONE = object()
+_slots = threading.BoundedSemaphore(UPLOAD_MAX_CONCURRENT)
+_running = {}
+_lock = threading.Lock()
+
+
+class ImportInterrupted(Exception):
+    """The server shut down mid-import."""
+
+
+class _Unparsed:
+    """Collects parse_rows failures, keeping the first few and counting the rest."""
+
+    def __init__(self):
+        self.rows = []
+        self.count = 0
+
+    def append(self, failure: dict):
+        self.count += 1
+        if len(self.rows) < MAX_REPORTED_ERRORS:
+            self.rows.append({"line": failure["line"], "error": failure["error"]})
+
+
+def _put(chunks: queue.Queue, item, stop: threading.Event) -> bool:
+    # Blocks while the writer is behind; gives up once the job is stopped
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _parse_chunks(stream, filename: str, user_id: str, unparsed: _Unparsed, chunks: queue.Queue, stop: threading.Event):
+    try:
+        chunk = []
+        for txn in parse_rows(iter_statement_rows(stream, filename), user_id, unparsed):
+            chunk.append(txn)
+            if len(chunk) >= UPLOAD_CHUNK_ROWS:
+                if not _put(chunks, (chunk, stream.tell()), stop):
+                    return
+                chunk = []
+        if chunk and not _put(chunks, (chunk, stream.tell()), stop):
+            return
+        _put(chunks, _DONE, stop)
+    except Exception as e:
+        _put(chunks, e, stop)
+
+
+def run_statement_import(job_id: str, user_id: str, stream, filename: str, stop: threading.Event = None) -> dict:
+    """
+    Import one spooled statement, recording progress on the job as each
+    chunk is written. Returns the final progress; the stream is closed.
+    """
+    stop = stop or threading.Event()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(0)
+    progress = {"status": "running", "rows": 0, "created": 0, "skipped": 0, "duplicates": 0, "unparsed": 0, "bytes_read": 0, "bytes_total": size}
+    update_import_job(job_id, {**progress, "started_at": datetime.utcnow()})
+    unparsed = _Unparsed()
+    chunks = queue.Queue(maxsize=UPLOAD_QUEUE_CHUNKS)
+    parser = threading.Thread(
+        target=_parse_chunks, args=(stream, filename, user_id, unparsed, chunks, stop),
+        name=f"import-{job_id[:8]}", daemon=True
+    )
+    parser.start()
+    # Shared across chunks so identical rows split between two chunks keep distinct ids
+    occurrences, seen = {}, None
+    try:
+        while True:
+            try:
+                item = chunks.get(timeout=1)
+            except queue.Empty:
+                if stop.is_set():
+                    raise ImportInterrupted("Server shut down; upload the statement again, rows already imported are skipped")
+                continue
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            rows, bytes_read = item
+            first, last = min(t["date"] for t in rows), max(t["date"] for t in rows)
+            if seen and (first > seen[1] or last < seen[0]):
+                # Statements are sorted by date (either way round): once a chunk no longer
+                # overlaps the dates before it, no identical row can follow, so the counts go
+                occurrences.clear()
+                seen = None
+            seen = (first, last) if seen is None else (min(seen[0], first), max(seen[1], last))
+            result = create_missing_transactions(rows, occurrences)
+            progress["rows"] += len(rows)
+            progress["created"] += len(result["created"])
+            progress["skipped"] += len(result["skipped"])
+            progress["duplicates"] += result["duplicates"]
+            progress["unparsed"] = unparsed.count
+            progress["bytes_read"] = min(bytes_read, size)
+            update_import_job(job_id, progress)
+    except Exception as e:
+        logger.error("Import %s for user %s failed after %d rows: %s", job_id, user_id, progress["rows"], e)
+        progress.update({"status": "interrupted" if isinstance(e, ImportInterrupted) else "failed", "error": str(e)})
+    else:
+        progress.update({"status": "done", "bytes_read": size})
+        logger.info(
+            "Imported %s for user %s: %d rows, %d new, %d already stored, %d repeated, %d unparsed",
+            filename, user_id, progress["rows"], progress["created"], progress["skipped"], progress["duplicates"], unparsed.count
+        )
+    finally:
+        stop.set()
+        parser.join()
+        stream.close()
+
+    progress.update({"unparsed": unparsed.count, "errors": unparsed.rows, "finished_at": datetime.utcnow()})
+    update_import_job(job_id, progress)
+    return progress
+
+
+def _run_job(job_id: str, user_id: str, stream, filename: str, stop: threading.Event):
+    try:
+        with _slots:
+            if not stop.is_set():
+                run_statement_import(job_id, user_id, stream, filename, stop)
+            else:
+                stream.close()
+                update_import_job(job_id, {"status": "interrupted", "error": "Server shut down before the import started"})
+    finally:
+        with _lock:
+            _running.pop(job_id, None)
+
+
+def start_statement_import(user_id: str, stream, filename: str) -> dict:
+    """
+    Queue an import of a spooled statement and return its job. Raises
+    ValueError when the file name's format cannot be parsed.
+    """
+    statement_format(filename)
+    job_id = uuid.uuid4().hex
+    job = {"user_id": user_id, "filename": filename, "status": "queued"}
+    create_import_job(job_id, job)
+    stop = threading.Event()
+    thread = threading.Thread(target=_run_job, args=(job_id, user_id, stream, filename, stop), name=f"import-{job_id[:8]}-job", daemon=True)
+    with _lock:
+        _running[job_id] = (thread, stop)
+    thread.start()
+    logger.info("Queued import %s of %s for user %s", job_id, filename, user_id)
+    return {**job, "id": job_id}
+
+
+def get_import_progress(job_id: str):
+    """The job with a progress percentage, or None for an unknown id."""
+    job = get_import_job(job_id)
+    if job is None:
+        return None
+    if job.get("status") == "done":
+        job["progress"] = 100.0
+    elif job.get("bytes_total"):
+        job["progress"] = min(99.0, round(100 * job.get("bytes_read", 0) / job["bytes_total"], 1))
+    else:
+        job["progress"] = 0.0
+    return job
+
+
+def shutdown_imports(timeout: float = 5):
+    """Stop running imports and wait briefly for them to record it; called from the app lifespan."""
+    with _lock:
+        running = list(_running.values())
+    for _, stop in running:
+        stop.set()
+    for thread, _ in running:
+        thread.join(timeout)
@@ -0,0 +1,37 @@
+import asyncio
+from data.transaction_dao import get_transactions_by_user_id
+from data.relation_dao import get_relations_by_user_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+def join_relations(transactions: list, relations: list) -> dict:
+    """Attach relation_id/is_primary to each transaction; relations are returned keyed by id."""
+    membership = {}
+    compact_relations = {}
+    for rel in relations:
+        compact_relations[rel["id"]] = {
+            "primary_transaction": rel.get("primary_transaction"),
+            "related_transactions": rel.get("related_transactions", []),
+            "settlement_notes": rel.get("settlement_notes"),
+        }
+        for txn_id in rel.get("related_transactions", []):
+            membership[txn_id] = rel["id"]
+        if rel.get("primary_transaction"):
+            membership[rel["primary_transaction"]] = rel["id"]
+
+    for txn in transactions:
+        rel_id = membership.get(txn["id"])
+        txn["relation_id"] = rel_id
+        txn["is_primary"] = bool(rel_id) and compact_relations[rel_id]["primary_transaction"] == txn["id"]
+
+    return {"transactions": transactions, "relations": compact_relations}
+
+async def get_user_ledger(user_id: str, fields: list = None) -> dict:
+    """Fetch a user's transactions and relations concurrently and join them server-side."""
+    logger.info("Building ledger for user %s", user_id)
+    transactions, relations = await asyncio.gather(
+        asyncio.to_thread(get_transactions_by_user_id, user_id, fields),
+        asyncio.to_thread(get_relations_by_user_id, user_id),
+    )
+    return join_relations(transactions, relations)
@@ -4,37 +4,41 @@ from data.relation_dao import (
     get_relation,
     get_relations_by_user_id,
     get_all_relations,
-    delete_relation
+    delete_relation,
+    get_relations_for_transactions,
+    append_transaction,
+    transaction_amount
 )
 from data.transaction_dao import get_transactions_by_ids
 import logging
 
 logger = logging.getLogger(__name__)
 
-def calculate_primary_transaction(transaction_ids: list):
-    """Calculate which transaction should be primary based on largest amount"""
+def find_primary_transaction(transaction_ids: list):
+    """Return (id, amount) of the transaction with the largest amount, or (None, None)"""
     if not transaction_ids:
-        return None
+        return None, None
     
     txns = get_transactions_by_ids(transaction_ids)
     if not txns:
-        return None
-    
-    # Find transaction with max absolute amount
-    def get_amount(t): 
-        return max(t.get("deposit", 0), t.get("withdrawn", 0))
+        return None, None
     
-    largest = max(txns, key=get_amount)
-    return largest["id"]
+    largest = max(txns, key=transaction_amount)
+    return largest["id"], transaction_amount(largest)
+
+def calculate_primary_transaction(transaction_ids: list):
+    """Calculate which transaction should be primary based on largest amount"""
+    return find_primary_transaction(transaction_ids)[0]
 
 def create_new_relation(rel_in):
     logger.info("Creating new relation")
     data = rel_in.dict()
     
-    # Calculate primary transaction
-    primary_id = calculate_primary_transaction(data.get("related_transactions", []))
+    # Calculate primary transaction; its amount is cached for cheap appends
+    primary_id, primary_amount = find_primary_transaction(data.get("related_transactions", []))
     if primary_id:
         data["primary_transaction"] = primary_id
+        data["primary_amount"] = primary_amount
     
     return create_relation(data)
 
@@ -49,9 +53,14 @@ def update_existing_relation(rel_id, rel_updates):
     # If related_transactions changed, recalculate primary transaction
     if "related_transactions" in rel_updates:
         new_related = rel_updates["related_transactions"]
-        primary_id = calculate_primary_transaction(new_related)
+        primary_id, primary_amount = find_primary_transaction(new_related)
         if primary_id:
             rel_updates["primary_transaction"] = primary_id
+            rel_updates["primary_amount"] = primary_amount
+    elif "primary_transaction" in rel_updates:
+        # Keep the cached amount in step with a manually chosen primary
+        txns = get_transactions_by_ids([rel_updates["primary_transaction"]])
+        rel_updates["primary_amount"] = transaction_amount(txns[0]) if txns else None
     
     return update_relation(rel_id, rel_updates)
 
@@ -59,39 +68,28 @@ def get_relation_by_id(rel_id: str):
     logger.info("Getting relation %s", rel_id)
     return get_relation(rel_id)
 
-def get_user_relations(user_id: str):
+def get_user_relations(user_id: str, fields: list = None):
     logger.info("Getting relations for user %s", user_id)
-    return get_relations_by_user_id(user_id)
+    return get_relations_by_user_id(user_id, fields)
 
 def list_all_relations():
     logger.info("Getting all relations")
     return get_all_relations()
 
+def lookup_transaction_relations(txn_ids: list):
+    logger.info("Looking up relations for %d transactions", len(txn_ids))
+    return get_relations_for_transactions(txn_ids)
+
 def remove_relation(rel_id: str):
     logger.info("Deleting relation %s", rel_id)
     return delete_relation(rel_id)
 
 def add_transaction_to_relation(rel_id: str, transaction_id: str):
-    """Add a transaction to an existing relation and recalculate primary"""
+    """Add a transaction to an existing relation, promoting it to primary if it is the largest"""
     logger.info("Adding transaction %s to relation %s", transaction_id, rel_id)
     
-    rel = get_relation(rel_id)
-    if not rel:
-        raise Exception("Relation not found")
-    
-    # Add transaction to related transactions if not already present
-    related_transactions = rel.get("related_transactions", [])
-    if transaction_id not in related_transactions:
-        related_transactions.append(transaction_id)
-        
-        # Recalculate primary transaction
-        primary_id = calculate_primary_transaction(related_transactions)
-        
-        updates = {
-            "related_transactions": related_transactions,
-            "primary_transaction": primary_id
-        }
-        
-        return update_relation(rel_id, updates)
+    txns = get_transactions_by_ids([transaction_id])
+    if not txns:
+        raise Exception("Transaction not found")
     
-    return rel
\ No newline at end of file
+    return append_transaction(rel_id, transaction_id, transaction_amount(txns[0]))
\ No newline at end of file
@@ -0,0 +1,198 @@
+from data.transaction_dao import get_transactions_by_user_id
+from data.relation_dao import get_relations_by_user_id, bulk_create_relations, transaction_amount
+from data.transaction_schema import amount_paise
+from services.statement_parser import parse_narration
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A loan is expected back within this many days of being given
+LOAN_WINDOW_DAYS = 90
+# Friends settle their share of a bill within this many days
+SPLIT_WINDOW_DAYS = 14
+# Largest group size considered for an even split, payer included
+MAX_SPLIT_WAYS = 10
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).date()
+        except ValueError:
+            for fmt in ("%d/%m/%y", "%d/%m/%Y"):
+                try:
+                    return datetime.strptime(value, fmt).date()
+                except ValueError:
+                    continue
+    return None
+
+def _counterparty(txn: dict):
+    # Rows ingested by the statement parser already carry the VPA
+    return txn.get("vpa") or parse_narration(txn.get("narration", "")).get("vpa")
+
+class _Entry:
+    __slots__ = ("id", "date", "paise", "counterparty")
+
+    def __init__(self, txn_id, txn_date, paise, counterparty):
+        self.id = txn_id
+        self.date = txn_date
+        self.paise = paise
+        self.counterparty = counterparty
+
+def _index(entries: list) -> dict:
+    """Bucket entries by key, each bucket sorted by date with a parallel list of dates for bisecting."""
+    buckets = defaultdict(list)
+    for key, entry in entries:
+        buckets[key].append(entry)
+    index = {}
+    for key, bucket in buckets.items():
+        bucket.sort(key=lambda e: e.date)
+        index[key] = (bucket, [e.date for e in bucket])
+    return index
+
+def _in_window(index: dict, key, start: date, end: date, used: set):
+    """Yield unused entries of a bucket dated within [start, end]."""
+    if key not in index:
+        return
+    bucket, dates = index[key]
+    for i in range(bisect_left(dates, start), len(bucket)):
+        entry = bucket[i]
+        if entry.date > end:
+            break
+        if entry.id not in used:
+            yield entry
+
+def _proposal(kind: str, members: list, notes: str, confidence: float) -> dict:
+    primary = max(members, key=lambda e: e.paise)
+    return {
+        "kind": kind,
+        "primary_transaction": primary.id,
+        "related_transactions": [e.id for e in members],
+        "settlement_notes": notes,
+        "confidence": confidence,
+    }
+
+def propose_settlements(transactions: list, relations: list) -> list:
+    """
+    Propose relations for transactions that are not yet settled.
+
+    Entries are bucketed by (counterparty, amount) and by amount alone, with
+    date-sorted buckets, so each lookup is a hash probe plus a bisect and the
+    whole pass is near-linear in the number of transactions.
+    """
+    settled = set()
+    for rel in relations:
+        settled.update(rel.get("related_transactions", []))
+        if rel.get("primary_transaction"):
+            settled.add(rel["primary_transaction"])
+
+    withdrawals, deposits = [], []
+    for txn in transactions:
+        if txn["id"] in settled:
+            continue
+        txn_date = _to_date(txn.get("date"))
+        if txn_date is None:
+            continue
+        counterparty = _counterparty(txn)
+        try:
+            # Documents not yet rewritten by scripts/migrate_transactions.py lack amount_paise
+            paise = amount_paise(txn)
+        except ValueError:
+            logger.warning("Skipping transaction %s with an amount of unknown side", txn["id"])
+            continue
+        if paise < 0:
+            withdrawals.append(_Entry(txn["id"], txn_date, -paise, counterparty))
+        elif paise > 0:
+            deposits.append(_Entry(txn["id"], txn_date, paise, counterparty))
+
+    withdrawals.sort(key=lambda e: e.date)
+    deposits.sort(key=lambda e: e.date)
+    deposits_by_party = _index([((e.counterparty, e.paise), e) for e in deposits if e.counterparty])
+    withdrawals_by_party = _index([((e.counterparty, e.paise), e) for e in withdrawals if e.counterparty])
+    deposits_by_amount = _index([(e.paise, e) for e in deposits])
+
+    used = set()
+    proposals = []
+
+    # 1) Loan and repayment: the same amount going out to and coming back from one VPA
+    for entry, opposite, kind in (
+        *((w, deposits_by_party, "lent and repaid") for w in withdrawals),
+        *((d, withdrawals_by_party, "borrowed and repaid") for d in deposits),
+    ):
+        if entry.id in used or not entry.counterparty:
+            continue
+        window_end = entry.date + timedelta(days=LOAN_WINDOW_DAYS)
+        match = next(_in_window(opposite, (entry.counterparty, entry.paise), entry.date, window_end, used), None)
+        if match:
+            used.update((entry.id, match.id))
+            notes = f"Auto-matched: ₹{entry.paise / 100:,.2f} {kind} with {entry.counterparty}"
+            proposals.append(_proposal("loan_repayment", [entry, match], notes, 0.9))
+
+    # 2) Split bill: one payment followed by equal shares from different people
+    for bill in sorted(withdrawals, key=lambda e: e.paise, reverse=True):
+        if bill.id in used:
+            continue
+        window_end = bill.date + timedelta(days=SPLIT_WINDOW_DAYS)
+        for ways in range(MAX_SPLIT_WAYS, 1, -1):
+            if bill.paise % ways:
+                continue
+            share = bill.paise // ways
+            shares, parties = [], set()
+            for dep in _in_window(deposits_by_amount, share, bill.date, window_end, used):
+                party = dep.counterparty or dep.id
+                if party not in parties:
+                    parties.add(party)
+                    shares.append(dep)
+                    if len(shares) == ways - 1:
+                        break
+            if len(shares) == ways - 1:
+                used.add(bill.id)
+                used.update(e.id for e in shares)
+                notes = f"Auto-matched: ₹{bill.paise / 100:,.2f} split {ways} ways, {len(shares)} shares of ₹{share / 100:,.2f} received"
+                proposals.append(_proposal("split_bill", [bill, *shares], notes, 0.6 if ways > 2 else 0.5))
+                break
+
+    logger.info("Proposed %d settlements from %d unsettled transactions", len(proposals), len(withdrawals) + len(deposits))
+    return proposals
+
+def get_settlement_suggestions(user_id: str) -> list:
+    logger.info("Proposing settlements for user %s", user_id)
+    return propose_settlements(get_transactions_by_user_id(user_id), get_relations_by_user_id(user_id))
+
+def create_relations_in_bulk(user_id: str, relations: list, transactions: dict = None) -> list:
+    """
+    Create many relations in batched writes.
+
+    Primaries are recomputed from the member amounts; pass transactions as
+    {id: transaction} to avoid refetching them.
+    """
+    logger.info("Creating %d relations for user %s", len(relations), user_id)
+    if transactions is None:
+        transactions = {t["id"]: t for t in get_transactions_by_user_id(user_id)}
+    docs = []
+    for rel in relations:
+        members = [transactions[t] for t in rel["related_transactions"] if t in transactions]
+        if not members:
+            continue
+        primary = max(members, key=transaction_amount)
+        docs.append({
+            "user_id": user_id,
+            "related_transactions": rel["related_transactions"],
+            "primary_transaction": primary["id"],
+            "primary_amount": transaction_amount(primary),
+            "settlement_notes": rel.get("settlement_notes"),
+        })
+    return bulk_create_relations(docs)
+
+def auto_settle(user_id: str, min_confidence: float = 0.8) -> list:
+    """Propose settlements and create those at or above min_confidence in one call."""
+    transactions = get_transactions_by_user_id(user_id)
+    proposals = propose_settlements(transactions, get_relations_by_user_id(user_id))
+    accepted = [p for p in proposals if p["confidence"] >= min_confidence]
+    return create_relations_in_bulk(user_id, accepted, {t["id"]: t for t in transactions})
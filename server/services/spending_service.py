@@ -1,15 +1,21 @@
 from data.spending_dao import (
     create_spending,
     get_spending_by_id,
-    get_all_spendings,
     update_spending,
     delete_spending,
-    bulk_create_spendings
+    bulk_create_spendings,
+    get_spendings_by_user_id,
+    get_spending_rollups,
+    rollups_rebuilt,
+    rebuild_spending_rollups
 )
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Users whose rollups are known to cover all their spendings, so the check is one read per process
+_rebuilt_users = set()
+
 def create_new_spending(spending_data: dict):
     logger.info("Creating new spending")
     return create_spending(spending_data)
@@ -18,9 +24,30 @@ def get_spending(spending_id: str):
     logger.info("Getting spending %s", spending_id)
     return get_spending_by_id(spending_id)
 
-def list_all_spendings():
-    logger.info("Getting all spendings")
-    return get_all_spendings()
+def get_user_spendings(user_id: str, limit: int, cursor: str = None, fields: list = None):
+    logger.info("Getting spendings for user %s", user_id)
+    return get_spendings_by_user_id(user_id, limit, cursor, fields)
+
+def get_user_spending_summary(user_id: str, start_month: str = None, end_month: str = None):
+    """Per-month category totals from the rollup counters, plus totals across the range."""
+    logger.info("Getting spending summary for user %s", user_id)
+    if user_id not in _rebuilt_users:
+        # Spendings written before the counters existed are not in them yet
+        if not rollups_rebuilt(user_id):
+            rebuild_spending_rollups(user_id)
+        _rebuilt_users.add(user_id)
+    months = get_spending_rollups(user_id, start_month, end_month)
+    totals = {}
+    for month in months:
+        for category, amount in month.get("totals", {}).items():
+            totals[category] = totals.get(category, 0) + amount
+    return {
+        "months": [
+            {"month": m["month"], "totals": m.get("totals", {}), "count": m.get("count", 0)}
+            for m in months
+        ],
+        "totals": totals
+    }
 
 def update_spending_data(spending_id: str, updates: dict):
     logger.info("Updating spending %s", spending_id)
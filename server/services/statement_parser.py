@@ -0,0 +1,520 @@
+"""
+Deterministic parsing of bank statements.
+
+Turns statement rows into transaction dicts without a model call. Rows can
+come from CSV, Excel or JSON exports, or from the Fi MCP `bankTransactions`
+payload. The narration grammar is compiled once at import. It pulls out the
+payment mode, counterparty, UPI VPA, IFSC, bank reference and memo.
+
+A row without a readable date or amount is not guessed at. It is reported
+back as unparsed, and the pipeline hands only those rows to the LLM cleaner.
+
+Everything streams: readers yield one row at a time and parse_rows is a
+generator, so a large statement never has to fit in memory.
+"""
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from operator import itemgetter
+import csv
+import importlib.util
+import io
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Header aliases seen in HDFC, ICICI, SBI, Axis and Kotak exports
+STATEMENT_COLUMNS = {
+    "date": ["date", "txn_date", "transaction_date", "tran_date", "value_date", "value_dt", "posting_date"],
+    "narration": ["narration", "description", "particulars", "transaction_remarks", "remarks", "details"],
+    "reference": ["chq_ref_no", "ref_no", "reference", "reference_no", "cheque_no", "chq_no", "utr", "ref_no_cheque_no"],
+    "withdrawn": ["withdrawn", "withdrawal_amt", "withdrawal_amount", "withdrawal", "withdrawals", "debit", "debit_amount", "dr"],
+    "deposit": ["deposit", "deposit_amt", "deposit_amount", "deposits", "credit", "credit_amount", "cr"],
+    "amount": ["amount", "transaction_amount", "txn_amount", "amount_inr"],
+    "type": ["type", "dr_cr", "cr_dr", "transaction_type", "txn_type"],
+    "mode": ["mode", "transaction_mode"],
+    "closing_balance": ["closing_balance", "balance", "closing_balance_amt", "current_balance", "available_balance"],
+}
+
+# Positional layout of a Fi MCP txns row, and its transactionType codes
+FI_TXN_FIELDS = ("amount", "narration", "date", "type", "mode", "closing_balance")
+FI_BALANCE_TYPES = {"3", "7"}  # OPENING and CLOSING balance lines, not transactions
+
+CREDIT_TYPES = {"credit", "cr", "c", "deposit", "1", "4"}  # 4: INTEREST
+DEBIT_TYPES = {"debit", "dr", "d", "withdrawal", "2", "5", "6"}  # 5: TDS, 6: INSTALLMENT
+
+STATEMENT_EXTENSIONS = (".csv", ".xlsx", ".xls", ".json", ".jsonl", ".ndjson", ".txt")
+# Optional packages the Excel formats are read with (see requirements.txt)
+EXCEL_READERS = {".xlsx": "openpyxl", ".xls": "xlrd"}
+
+# Lines scanned for the header row before giving up (banks put account details above it)
+MAX_PREAMBLE_LINES = 40
+
+_IFSC = r"[A-Z]{4}0[A-Z0-9]{6}"
+
+# Narration grammar, keyed by the first four characters of the narration so
+# each row tries at most one pattern; named groups become transaction fields.
+# The UPI counterparty is hyphen-free (banks truncate it), the VPA may contain hyphens.
+NARRATION_GRAMMAR = {
+    "UPI-": ("UPI", re.compile(
+        rf"^UPI-(?P<counterparty>[^-]*)-(?P<vpa>[^@\s]+@[A-Z0-9.]+)"
+        rf"(?:-(?P<ifsc>{_IFSC}))?(?:-(?P<reference>\d{{6,16}}))?(?:-(?P<memo>.*))?$",
+        re.IGNORECASE,
+    )),
+    "NEFT": ("NEFT", re.compile(
+        rf"^NEFT\s*(?:CR|DR)?-(?P<ifsc>{_IFSC})-(?P<counterparty>[^-]*)-(?:(?P<memo>.*)-)?(?P<reference>[A-Z0-9]{{10,22}})$",
+        re.IGNORECASE,
+    )),
+    "RTGS": ("RTGS", re.compile(
+        rf"^RTGS\s*(?:CR|DR)?-(?P<ifsc>{_IFSC})-(?P<counterparty>[^-]*)-(?:(?P<memo>.*)-)?(?P<reference>[A-Z0-9]{{10,22}})$",
+        re.IGNORECASE,
+    )),
+    "IMPS": ("IMPS", re.compile(
+        rf"^IMPS-(?P<reference>\d{{12}})-(?P<counterparty>[^-]*)-(?:(?P<ifsc>{_IFSC})-)?(?:[X\d]+-?)?(?P<memo>.*)$",
+        re.IGNORECASE,
+    )),
+}
+
+# Slash-separated narrations (UPI/<ref>/<name>/<vpa>/<memo> and friends) are split into tokens instead
+SLASH_MODES = ("UPI", "IMPS", "NEFT", "RTGS")
+_VPA_TOKEN = re.compile(r"^[^@\s]+@[A-Z0-9.]+$", re.IGNORECASE)
+_IFSC_TOKEN = re.compile(rf"^{_IFSC}$", re.IGNORECASE)
+_REF_TOKEN = re.compile(r"^\d{6,16}$")
+
+MODE_PREFIX = re.compile(
+    r"^(?:(?P<CARD>POS\b|ME DC\b|DC INTL\b|CC\s?\d)"
+    r"|(?P<ATM>ATW-|NWD-|EAW-|ATM\b)"
+    r"|(?P<NACH>N?ACH\b)"
+    r"|(?P<CHEQUE>CHQ\b|CLG\b)"
+    r"|(?P<INTEREST>INT\.?\s?PD|INTEREST\b|CREDIT INTEREST))",
+    re.IGNORECASE,
+)
+
+# A row of PDF-extracted text: date, narration, optional reference and value date, then amounts
+TEXT_ROW = re.compile(
+    r"^\s*(?P<date>\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{1,2}[ -][A-Za-z]{3}[ -]\d{2,4})\s+"
+    r"(?P<narration>.*?)(?:\s+(?P<reference>\d{6,20}))?(?:\s+\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4})?"
+    r"(?P<amounts>(?:\s+-?[\d,]+\.\d{2}(?:\s?(?:Cr|Dr)\b)?)+)\s*$",
+    re.IGNORECASE,
+)
+BALANCE_LINE = re.compile(r"opening|closing|brought forward|carried forward|\bb/f\b|\bc/f\b", re.IGNORECASE)
+AMOUNT_TOKEN = re.compile(r"(-?[\d,]+\.\d{2})(?:\s?(Cr|Dr)\b)?", re.IGNORECASE)
+
+_DMY = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4}|\d{2})$")
+_ISO = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
+TEXT_DATE_FORMATS = ("%d-%b-%Y", "%d %b %Y", "%d-%b-%y", "%d %b %y", "%b %d, %Y")
+
+# Statements repeat a handful of dates across thousands of rows
+_date_cache = {}
+_DATE_CACHE_SIZE = 4096
+
+def _normalise_header(name) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(name or "").strip().lower()).strip("_")
+
+def parse_narration(narration: str) -> dict:
+    """
+    Fields found in a bank narration: mode (UPI, NEFT, RTGS, IMPS, CARD,
+    ATM, NACH, CHEQUE, INTEREST or OTHERS) plus whichever of counterparty,
+    vpa, ifsc, reference and memo the format carries.
+    """
+    text = (narration or "").strip()
+    grammar = NARRATION_GRAMMAR.get(text[:4].upper())
+    if grammar:
+        match = grammar[1].match(text)
+        if match:
+            return _clean_fields(grammar[0], match.groupdict())
+    head, _, rest = text.partition("/")
+    if rest and head.upper() in SLASH_MODES:
+        return _clean_fields(head.upper(), _slash_fields(rest))
+    match = MODE_PREFIX.match(text)
+    return {"mode": match.lastgroup if match else "OTHERS"}
+
+def _slash_fields(rest: str) -> dict:
+    fields = {"counterparty": None, "vpa": None, "ifsc": None, "reference": None}
+    memo = []
+    for token in rest.split("/"):
+        token = token.strip()
+        if not token or token.upper() in ("CR", "DR"):
+            continue
+        if fields["vpa"] is None and _VPA_TOKEN.match(token):
+            fields["vpa"] = token
+        elif fields["reference"] is None and _REF_TOKEN.match(token):
+            fields["reference"] = token
+        elif fields["ifsc"] is None and _IFSC_TOKEN.match(token):
+            fields["ifsc"] = token
+        elif fields["counterparty"] is None and fields["vpa"] is None:
+            fields["counterparty"] = token
+        else:
+            memo.append(token)
+    fields["memo"] = "/".join(memo) or None
+    return fields
+
+def _clean_fields(mode: str, groups: dict) -> dict:
+    fields = {name: stripped for name, value in groups.items() if value and (stripped := value.strip())}
+    fields["mode"] = mode
+    if "vpa" in fields:
+        fields["vpa"] = fields["vpa"].lower()
+    for name in ("ifsc", "reference"):
+        if name in fields:
+            fields[name] = fields[name].upper()
+    return fields
+
+def parse_date(value) -> datetime:
+    """Statement dates are day-first; accepts d/m/yy, d/m/yyyy, ISO, 01-Jun-2025 and date objects."""
+    if value.__class__ is str:
+        parsed = _date_cache.get(value)
+        if parsed is not None:
+            return parsed
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min)
+    key = str(value or "").strip()
+    parsed = _date_cache.get(key)
+    if parsed is not None:
+        return parsed
+    match = _ISO.match(key)
+    if match:
+        parsed = datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    else:
+        match = _DMY.match(key)
+        if match:
+            day, month, year = int(match.group(1)), int(match.group(2)), int(match.group(3))
+            parsed = datetime(year + 2000 if year < 100 else year, month, day)
+        else:
+            for fmt in TEXT_DATE_FORMATS:
+                try:
+                    parsed = datetime.strptime(key, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"Unrecognised date: {key!r}")
+    if len(_date_cache) >= _DATE_CACHE_SIZE:
+        _date_cache.clear()
+    _date_cache[key] = parsed
+    if value.__class__ is str:
+        _date_cache[value] = parsed
+    return parsed
+
+def _parse_amount(value) -> float:
+    if not value:
+        return 0.0
+    if value.__class__ is str and "," in value:
+        value = value.replace(",", "")
+    try:
+        # Plain numbers (the bulk of any statement) need no further clean-up
+        return float(value)
+    except ValueError:
+        pass
+    value = value.strip()
+    if not value:
+        return 0.0
+    if value[0] == "(" and value[-1] == ")":
+        value = "-" + value[1:-1]
+    return float(value)
+
+def _is_filler(value) -> bool:
+    # Separator and summary lines ("*******", "STATEMENT SUMMARY") carry no date
+    return not (isinstance(value, (date, int, float)) or any(c.isdigit() for c in str(value or "")))
+
+def normalise_row(row: dict, user_id: str):
+    """
+    One statement row (canonical column names, as the readers yield them)
+    as a transaction dict, or None for rows that are not transactions:
+    opening/closing balance lines and separator or summary lines with
+    neither a date nor an amount. Raises ValueError when a real row cannot
+    be read.
+    """
+    get = row.get
+    raw_type = get("type")
+    if raw_type is not None:
+        raw_type = str(raw_type).strip().lower()
+        if raw_type in FI_BALANCE_TYPES:
+            return None
+    withdrawn = _parse_amount(get("withdrawn"))
+    deposit = _parse_amount(get("deposit"))
+    if not (withdrawn or deposit):
+        amount = get("amount")
+        if amount is None or amount == "":
+            if _is_filler(get("date")):
+                return None
+            raise ValueError("No amount")
+        amount = _parse_amount(amount)
+        if raw_type in DEBIT_TYPES:
+            withdrawn = abs(amount)
+        elif raw_type in CREDIT_TYPES:
+            deposit = abs(amount)
+        elif amount < 0:
+            withdrawn = -amount
+        elif raw_type:
+            raise ValueError(f"Unrecognised transaction type: {raw_type!r}")
+        else:
+            raise ValueError("Cannot tell debit from credit")
+
+    narration = get("narration")
+    narration = narration.strip() if narration.__class__ is str else str(narration or "").strip()
+    txn = {
+        "user_id": user_id,
+        "date": parse_date(get("date")),
+        "narration": narration,
+        "withdrawn": withdrawn,
+        "deposit": deposit,
+        "type": "debit" if withdrawn else "credit",
+        "tags": [],
+        "remarks": None,
+        "processed": "unprocessed",
+        **parse_narration(narration),
+    }
+    balance = get("closing_balance")
+    if balance is not None and balance != "":
+        txn["closing_balance"] = _parse_amount(balance)
+    if txn["mode"] == "OTHERS" and get("mode"):
+        txn["mode"] = str(get("mode")).strip().upper()
+    if "reference" not in txn:
+        reference = str(get("reference") or "").strip().lstrip("0")
+        if reference:
+            txn["reference"] = reference.upper()
+    return txn
+
+def parse_rows(rows, user_id: str, unparsed: list):
+    """
+    Transactions from (line_no, row) pairs as the readers yield them.
+    Rows that cannot be read are appended to unparsed as
+    {"line": n, "row": {...}, "error": "..."} for the LLM fallback.
+    """
+    for line_no, row in rows:
+        try:
+            txn = normalise_row(row, user_id)
+        except (ValueError, TypeError, OverflowError) as e:
+            unparsed.append({"line": line_no, "row": row, "error": str(e)})
+            continue
+        if txn is not None:
+            yield txn
+
+def _resolve_header(cells) -> dict:
+    """{canonical: column index} when cells look like the statement's header row, else None."""
+    present = {}
+    for i, cell in enumerate(cells):
+        present.setdefault(_normalise_header(cell), i)
+    columns = {}
+    for canonical, names in STATEMENT_COLUMNS.items():
+        for name in names:
+            if name in present:
+                columns[canonical] = present[name]
+                break
+    amounts = ("withdrawn", "deposit", "amount")
+    if "date" in columns and "narration" in columns and any(k in columns for k in amounts):
+        return columns
+    return None
+
+def _table_rows(lines):
+    """(line_no, row) pairs from a table whose header may sit below a preamble."""
+    columns = None
+    for line_no, cells in enumerate(lines, start=1):
+        if columns is None:
+            columns = _resolve_header(cells)
+            if columns is None and line_no >= MAX_PREAMBLE_LINES:
+                break
+            if columns is not None:
+                names = tuple(columns)
+                pick = itemgetter(*columns.values())
+                width = max(columns.values()) + 1
+            continue
+        if not any(cells):
+            continue
+        if len(cells) < width:
+            cells = list(cells) + [None] * (width - len(cells))
+        values = pick(cells)  # Always a tuple: the header has at least three columns
+        yield line_no, dict(zip(names, values))
+    if columns is None:
+        raise ValueError("Statement has no header row with date, narration and amount columns")
+
+@contextmanager
+def _as_text(stream):
+    """The stream as text; a binary stream is wrapped without closing it afterwards, the caller owns it."""
+    if isinstance(stream, io.TextIOBase):
+        yield stream
+        return
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield text
+    finally:
+        text.detach()
+
+def _csv_lines(stream):
+    with _as_text(stream) as text:
+        yield from csv.reader(text)
+
+def _xlsx_lines(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Reading .xlsx statements needs openpyxl (pip install openpyxl)")
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _xls_lines(stream):
+    try:
+        import xlrd
+    except ImportError:
+        raise ValueError("Reading .xls statements needs xlrd (pip install xlrd)")
+    book = xlrd.open_workbook(file_contents=stream.read())
+    sheet = book.sheet_by_index(0)
+    for r in range(sheet.nrows):
+        cells = sheet.row_values(r)
+        for i, cell_type in enumerate(sheet.row_types(r)):
+            if cell_type == xlrd.XL_CELL_DATE:
+                cells[i] = xlrd.xldate.xldate_as_datetime(cells[i], book.datemode)
+        yield cells
+
+def rows_from_payload(payload):
+    """
+    (index, row) pairs from decoded JSON: the Fi MCP `bankTransactions`
+    shape (positional txns lists per bank), a list of row objects, or an
+    object holding one under "transactions".
+    """
+    if isinstance(payload, dict):
+        if "bankTransactions" in payload:
+            index = 0
+            for account in payload["bankTransactions"] or []:
+                for txn in account.get("txns") or []:
+                    index += 1
+                    if isinstance(txn, (list, tuple)):
+                        yield index, dict(zip(FI_TXN_FIELDS, txn))
+                    else:
+                        yield index, _canonical(txn)
+            return
+        payload = payload.get("transactions") or payload.get("txns") or []
+    for index, row in enumerate(payload or [], start=1):
+        yield index, _canonical(row) if isinstance(row, dict) else dict(zip(FI_TXN_FIELDS, row))
+
+def _canonical(row: dict) -> dict:
+    present = {_normalise_header(k): v for k, v in row.items()}
+    canonical = {}
+    for name, aliases in STATEMENT_COLUMNS.items():
+        for alias in aliases:
+            if alias in present:
+                canonical[name] = present[alias]
+                break
+    # Also the camelCase Fi field names
+    for key, name in (("transactionamount", "amount"), ("transactionnarration", "narration"),
+                      ("transactiondate", "date"), ("transactiontype", "type"),
+                      ("transactionmode", "mode"), ("currentbalance", "closing_balance")):
+        if key in present and name not in canonical:
+            canonical[name] = present[key]
+    return canonical
+
+def _jsonl_rows(stream):
+    with _as_text(stream) as text:
+        yield from _jsonl_lines(text)
+
+def _jsonl_lines(stream):
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {line_no}: {e}")
+        yield from ((line_no, row) for _, row in rows_from_payload([payload]))
+
+def _text_rows(stream):
+    """
+    (line_no, row) pairs from text extracted from a PDF statement (pdftotext
+    -layout): a date, the narration, then the amount and the balance. The
+    amount's side comes from a Cr/Dr suffix or from the change in balance;
+    rows where neither settles it are left without a type. Opening and
+    brought-forward lines only seed the balance. Wrapped narration lines
+    are joined to the row above until a blank line.
+    """
+    with _as_text(stream) as text:
+        yield from _text_lines(text)
+
+def _text_lines(stream):
+    pending, balance = None, None
+    for line_no, line in enumerate(stream, start=1):
+        match = TEXT_ROW.match(line)
+        if match is None:
+            text = line.strip()
+            if pending is not None and text and "\f" not in line:
+                pending[1]["narration"] += " " + " ".join(text.split())
+            elif pending is not None:
+                yield pending
+                pending = None
+            continue
+        if pending is not None:
+            yield pending
+            pending = None
+        amounts = AMOUNT_TOKEN.findall(match.group("amounts"))
+        narration = " ".join(match.group("narration").split())
+        if len(amounts) == 1 and not amounts[0][1] and BALANCE_LINE.search(narration):
+            balance = _parse_amount(amounts[0][0])
+            continue
+        row = {
+            "date": match.group("date"),
+            "narration": narration,
+            "reference": match.group("reference"),
+            "type": None,
+        }
+        amount, side = amounts[-2] if len(amounts) > 1 else amounts[-1]
+        row["amount"] = amount
+        if len(amounts) > 1:
+            row["closing_balance"] = amounts[-1][0]
+            current = _parse_amount(amounts[-1][0])
+            if side:
+                row["type"] = side.lower()
+            elif balance is not None and abs(abs(current - balance) - _parse_amount(amount)) < 0.005:
+                row["type"] = "debit" if current < balance else "credit"
+            balance = current
+        elif side:
+            row["type"] = side.lower()
+        pending = (line_no, row)
+    if pending is not None:
+        yield pending
+
+def statement_format(filename: str) -> str:
+    """The reader a file name selects; raises ValueError for formats that cannot be parsed."""
+    ext = os.path.splitext(filename or "")[1].lower() or ".csv"
+    if ext == ".pdf":
+        raise ValueError("Upload the text extracted from the PDF statement (e.g. pdftotext -layout) as .txt")
+    if ext not in STATEMENT_EXTENSIONS:
+        raise ValueError(f"Unsupported statement format {ext!r}; expected one of {', '.join(STATEMENT_EXTENSIONS)}")
+    # Checked up front so an upload is refused rather than queued to fail
+    module = EXCEL_READERS.get(ext)
+    if module and importlib.util.find_spec(module) is None:
+        raise ValueError(f"{ext} statements are not supported on this server ({module} is not installed); upload a CSV export")
+    return ext
+
+def iter_statement_rows(stream, filename: str = ""):
+    """
+    (line_no, row) pairs from a statement file, read incrementally. The
+    format follows the extension (see STATEMENT_EXTENSIONS, CSV when there
+    is none). A .json document is decoded whole; use JSON Lines for very
+    large exports.
+    """
+    ext = statement_format(filename)
+    if ext == ".xlsx":
+        return _table_rows(_xlsx_lines(stream))
+    if ext == ".xls":
+        return _table_rows(_xls_lines(stream))
+    if ext in (".jsonl", ".ndjson"):
+        return _jsonl_rows(stream)
+    if ext == ".json":
+        return rows_from_payload(json.load(stream))
+    if ext == ".txt":
+        return _text_rows(stream)
+    return _table_rows(_csv_lines(stream))
+
+def parse_statement(stream, user_id: str, filename: str = "") -> dict:
+    """Parse a whole statement file: {"transactions": [...], "unparsed": [...]}."""
+    unparsed = []
+    transactions = list(parse_rows(iter_statement_rows(stream, filename), user_id, unparsed))
+    logger.info("Parsed %d transactions from %s, %d rows unparsed", len(transactions), filename or "statement", len(unparsed))
+    return {"transactions": transactions, "unparsed": unparsed}
@@ -5,6 +5,7 @@ from data.transaction_dao import (
     get_transactions_by_user_id,
     bulk_update_transactions
 )
+from data.relation_dao import get_relations_for_transactions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,9 +22,15 @@ def get_all_transactions():
     logger.info("Getting all transactions")
     return dao_get_all_transactions()
 
-def get_user_transactions(user_id: str):
+def get_user_transactions(user_id: str, include_relations: bool = False, fields: list = None):
     logger.info("Getting transactions for user %s", user_id)
-    return get_transactions_by_user_id(user_id)
+    txns = get_transactions_by_user_id(user_id, fields)
+    if include_relations:
+        # One batched index read instead of matching every row against every relation
+        index = get_relations_for_transactions([t["id"] for t in txns])
+        for t in txns:
+            t["relation"] = index.get(t["id"])
+    return txns
 
 def bulk_update_transaction_data(updates: list):
     logger.info("Bulk updating transactions")
@@ -0,0 +1,44 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Workers are spawned rather than forked: the parent holds gRPC channels to
+# Firestore, which are not fork-safe.
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_analysis_pool = None
+_lock = threading.Lock()
+
+
+def get_analysis_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool for CPU-bound portfolio analysis, creating it on first use."""
+    global _analysis_pool
+    with _lock:
+        if _analysis_pool is None:
+            _analysis_pool = ProcessPoolExecutor(
+                max_workers=ANALYSIS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _analysis_pool
+
+
+def discard_analysis_pool(pool: ProcessPoolExecutor):
+    """
+    Drop a pool that raised BrokenProcessPool (a worker died) so the next
+    get_analysis_pool() starts fresh workers; a no-op if it was already replaced.
+    """
+    global _analysis_pool
+    with _lock:
+        if _analysis_pool is pool:
+            _analysis_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pools():
+    """Shut down any pools created by this module; called from the app lifespan."""
+    global _analysis_pool
+    with _lock:
+        if _analysis_pool is not None:
+            _analysis_pool.shutdown(wait=False, cancel_futures=True)
+            _analysis_pool = None
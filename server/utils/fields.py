@@ -0,0 +1,26 @@
+import re
+from typing import Iterable, List, Optional
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def parse_fields(raw: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """
+    Parse a comma-separated ?fields= value into a Firestore projection.
+
+    Returns None (whole documents) when no fields were requested. "id" is
+    always returned, since it is the document id rather than a stored field.
+    Raises ValueError for anything outside the allowlist.
+    """
+    if not raw:
+        return None
+    fields = []
+    for name in raw.split(","):
+        name = name.strip()
+        if not name or name == "id":
+            continue
+        if not _IDENTIFIER.match(name) or name not in allowed:
+            raise ValueError(f"Unknown field '{name}'. Allowed: {', '.join(sorted(allowed))}")
+        if name not in fields:
+            fields.append(name)
+    return fields or None
@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+
+from data.version_dao import get_collection_version
+
+
+def _http_date(value: datetime) -> str:
+    # Stored timestamps are UTC, naive when written, aware when read back
+    value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return format_datetime(value, usegmt=True)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True when the request's If-None-Match header already names this ETag (weak comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+async def check_data_version(
+    request: Request, user_id: Optional[str], collections: Sequence[str]
+) -> Tuple[Optional[Response], dict]:
+    """
+    Conditional GET keyed on the user's data version instead of the body.
+
+    The version is derived from the latest updated_at and document count of
+    each collection the response is built from, plus the query string, so a
+    matching If-None-Match is answered with 304 before the full read and
+    serialisation. Returns (304 response or None, headers for the full
+    response). Without a user_id nothing is cached.
+    """
+    if not user_id:
+        return None, {}
+    versions = await asyncio.gather(*(
+        asyncio.to_thread(get_collection_version, collection, user_id) for collection in collections
+    ))
+    source = "|".join(
+        [user_id, request.url.path, request.url.query]
+        + [f"{c}:{latest.isoformat() if latest else ''}:{count}" for c, (latest, count) in zip(collections, versions)]
+    )
+    etag = 'W/"' + hashlib.sha1(source.encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    modified = [latest for latest, _ in versions if latest]
+    if modified:
+        headers["Last-Modified"] = _http_date(max(modified, key=lambda d: d.replace(tzinfo=None)))
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
@@ -0,0 +1,127 @@
+"""
+Process-wide logging setup.
+
+Handlers only enqueue records; formatting and I/O happen on a listener
+thread, so a log call on the request path costs a queue put. Configured
+from the environment:
+
+  LOG_LEVEL          root level (default INFO)
+  LOG_FORMAT         json (default) or text
+  LOG_LEVELS         per-logger levels, e.g. "integrations.llm.tools=DEBUG,data=WARNING"
+  LOG_SAMPLE_RATES   fraction of DEBUG records kept per logger, e.g. "integrations.llm.tools=0.01"
+"""
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener = None
+
+
+def _parse_mapping(raw: str) -> dict:
+    mapping = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            mapping[name.strip()] = value.strip()
+    return mapping
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed via extra= are included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of DEBUG records from the configured loggers (and
+    their children), so per-item debug lines can stay on in production.
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+        self._resolved = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            # Longest configured prefix wins
+            for prefix in sorted(self.rates, key=len, reverse=True):
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # The stock prepare() formats the message on the caller's thread; the
+    # queue never leaves the process, so the record can go across as is.
+    def prepare(self, record):
+        return record
+
+
+def configure_logging():
+    """Install the queue handler on the root logger; safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    records = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(records)
+    rates = {name: float(rate) for name, rate in _parse_mapping(os.getenv("LOG_SAMPLE_RATES")).items()}
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_mapping(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Drain queued records; called from the app lifespan."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,191 @@
+import functools
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+
+from utils.cache import TTLCache
+from utils.tracing import span, set_attributes
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 300)
+DOC_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 20000)
+
+DAO_LATENCY = Histogram(
+    "finvista_dao_seconds", "Firestore DAO call latency",
+    ["collection", "op"], buckets=LATENCY_BUCKETS,
+)
+DAO_DOCUMENTS = Histogram(
+    "finvista_dao_documents", "Documents read or written per DAO call",
+    ["collection", "op"], buckets=DOC_BUCKETS,
+)
+DAO_ERRORS = Counter("finvista_dao_errors_total", "DAO calls that raised", ["collection", "op"])
+
+HTTP_LATENCY = Histogram(
+    "finvista_http_request_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+
+TOOL_LATENCY = Histogram(
+    "finvista_agent_tool_seconds", "Agent tool invocation latency",
+    ["agent", "tool", "status"], buckets=LATENCY_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "finvista_llm_call_seconds", "LLM call latency",
+    ["agent", "model"], buckets=LLM_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("finvista_llm_tokens_total", "LLM tokens used", ["agent", "model", "kind"])
+
+
+def _doc_count(args, result) -> int:
+    """Best-effort document count: the size of a returned listing, else of a list argument, else one."""
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict) and isinstance(result.get("items"), list):
+        return len(result["items"])
+    if isinstance(result, dict) and isinstance(result.get("created"), list):
+        return len(result["created"])
+    if args and isinstance(args[0], list):
+        return len(args[0])
+    return 0 if result is None else 1
+
+
+def observe_dao(collection: str = None):
+    """
+    Record latency, document count and errors of a DAO function, inside a
+    dao.<op> trace span.
+
+    The op label is the function name. With no collection, the first
+    positional argument names it (for collection-generic helpers).
+    """
+    def decorator(func):
+        op = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            name = collection or args[0]
+            with span(f"dao.{op}", **{"db.system": "firestore", "db.collection": name}) as current:
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception:
+                    DAO_ERRORS.labels(name, op).inc()
+                    raise
+                finally:
+                    DAO_LATENCY.labels(name, op).observe(time.perf_counter() - start)
+                count = _doc_count(args, result)
+                set_attributes(current, **{"db.documents": count})
+            DAO_DOCUMENTS.labels(name, op).observe(count)
+            return result
+
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing HTTP requests, labelled by route template
+    (/transactions/user/{user_id}) rather than raw path to keep label
+    cardinality bounded. WebSocket and lifespan traffic passes through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status["code"])
+            ).observe(time.perf_counter() - start)
+
+
+# Start times between before/after callbacks; entries of calls that raised
+# never get an after callback and simply expire.
+_tool_starts = TTLCache(maxsize=10000, ttl=600)
+_model_starts = TTLCache(maxsize=10000, ttl=600)
+
+
+def _before_tool(tool, args, tool_context):
+    _tool_starts.set(tool_context.function_call_id, time.perf_counter())
+    return None
+
+
+def _after_tool(tool, args, tool_context, tool_response):
+    start = _tool_starts.pop(tool_context.function_call_id)
+    if start is not None:
+        failed = isinstance(tool_response, dict) and tool_response.get("status") == "error"
+        TOOL_LATENCY.labels(
+            tool_context.agent_name, tool.name, "error" if failed else "ok"
+        ).observe(time.perf_counter() - start)
+    return None
+
+
+def _model_key(callback_context) -> str:
+    return f"{callback_context.invocation_id}:{callback_context.agent_name}"
+
+
+def _before_model(callback_context, llm_request):
+    _model_starts.set(_model_key(callback_context), (time.perf_counter(), llm_request.model or "unknown"))
+    return None
+
+
+def _after_model(callback_context, llm_response):
+    started = _model_starts.pop(_model_key(callback_context))
+    if started is None:
+        return None
+    start, model = started
+    agent = callback_context.agent_name
+    LLM_LATENCY.labels(agent, model).observe(time.perf_counter() - start)
+    usage = llm_response.usage_metadata
+    if usage is not None:
+        LLM_TOKENS.labels(agent, model, "prompt").inc(usage.prompt_token_count or 0)
+        LLM_TOKENS.labels(agent, model, "completion").inc(usage.candidates_token_count or 0)
+    return None
+
+
+def agent_callbacks() -> dict:
+    """Keyword arguments that instrument an ADK Agent's tool and model calls."""
+    return {
+        "before_tool_callback": _before_tool,
+        "after_tool_callback": _after_tool,
+        "before_model_callback": _before_model,
+        "after_model_callback": _after_model,
+    }
+
+
+class _HasherCollector:
+    """Exposes the password hashing pool's counters at scrape time."""
+
+    def collect(self):
+        from utils.passwords import get_hasher_stats
+
+        stats = get_hasher_stats()
+        yield GaugeMetricFamily("finvista_password_hash_pending", "Hash jobs queued or running", value=stats["pending"])
+        yield GaugeMetricFamily("finvista_password_hash_workers", "Hashing worker processes", value=stats["workers"])
+        jobs = CounterMetricFamily("finvista_password_hash_jobs", "Hash jobs by outcome", labels=["outcome"])
+        for outcome in ("submitted", "completed", "rejected", "failed"):
+            jobs.add_metric([outcome], stats[outcome])
+        yield jobs
+        yield CounterMetricFamily("finvista_password_hash_seconds", "Time spent hashing", value=stats["total_seconds"])
+
+
+REGISTRY.register(_HasherCollector())
+
+
+def render_metrics():
+    return generate_latest(), CONTENT_TYPE_LATEST
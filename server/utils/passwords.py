@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# The first scheme is used for new hashes; hashes in any other listed scheme,
+# or with a lower cost, are upgraded on the next successful login.
+PASSWORD_SCHEMES = [s.strip() for s in os.getenv("PASSWORD_SCHEMES", "bcrypt").split(",") if s.strip()]
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hash/verify calls allowed to wait for a worker before new logins are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+# argon2 needs the argon2-cffi package installed
+_scheme_settings = {"bcrypt__rounds": BCRYPT_ROUNDS} if "bcrypt" in PASSWORD_SCHEMES else {}
+pwd_ctx = CryptContext(schemes=PASSWORD_SCHEMES, deprecated="auto", **_scheme_settings)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full or its workers restarted; callers should answer 503."""
+
+
+def hash_password(password: str) -> str:
+    return pwd_ctx.hash(password)
+
+
+def verify_and_update(password: str, hashed: str):
+    """Return (valid, new_hash); new_hash is set when the stored hash needs upgrading."""
+    return pwd_ctx.verify_and_update(password, hashed)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = 0
+_stats = {"submitted": 0, "completed": 0, "rejected": 0, "failed": 0, "total_seconds": 0.0}
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool so the next call starts fresh workers; a no-op if it was already replaced."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _submit(fn, *args):
+    global _pending
+    with _pool_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise PasswordHasherBusy("Too many concurrent logins, please retry")
+        _pending += 1
+        _stats["submitted"] += 1
+
+    started = time.perf_counter()
+    pool = _get_pool()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool as e:
+        # A worker died (OOM, kill); without a new pool every later login fails
+        logger.error("Password hashing pool broke, restarting it: %s", e)
+        _discard_pool(pool)
+        with _pool_lock:
+            _stats["failed"] += 1
+        raise PasswordHasherBusy("Password hashing workers restarted, please retry") from e
+    except Exception:
+        with _pool_lock:
+            _stats["failed"] += 1
+        raise
+    finally:
+        with _pool_lock:
+            _pending -= 1
+    with _pool_lock:
+        _stats["completed"] += 1
+        _stats["total_seconds"] += time.perf_counter() - started
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash in the dedicated process pool, keeping bcrypt off the event loop and threadpool."""
+    return await _submit(hash_password, password)
+
+
+async def verify_and_update_async(password: str, hashed: str):
+    return await _submit(verify_and_update, password, hashed)
+
+
+def get_hasher_stats() -> dict:
+    with _pool_lock:
+        return {**_stats, "pending": _pending, "workers": PASSWORD_HASH_WORKERS,
+                "max_pending": PASSWORD_HASH_MAX_PENDING}
+
+
+def shutdown_hasher():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
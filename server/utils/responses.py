@@ -0,0 +1,50 @@
+import os
+from datetime import date, datetime
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any):
+    # Firestore returns DatetimeWithNanoseconds, a datetime subclass orjson
+    # does not pick up natively
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson, with datetimes serialised natively.
+
+    Used as the app's default response class. Handlers returning large
+    payloads should return it directly: FastAPI only skips jsonable_encoder
+    for values that are already a Response.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def add_compression(app):
+    """Compress responses above COMPRESSION_MIN_SIZE, with Brotli when brotli-asgi is installed and GZip otherwise."""
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:
+        from fastapi.middleware.gzip import GZipMiddleware
+
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+    else:
+        app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
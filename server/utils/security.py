@@ -6,12 +6,15 @@ import jwt  # PyJWT
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
-from data.user_dao import get_user_by_email
+from data.user_dao import get_cached_user
 from models.user import User
 
 SECRET_KEY = os.getenv("JWT_SECRET", "your-very-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 3600
+# Embed the immutable user id as a "uid" claim so requests can resolve the
+# user by document id instead of an email query
+JWT_EMBED_USER_ID = os.getenv("JWT_EMBED_USER_ID", "true").lower() == "true"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -37,7 +40,8 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     except jwt.PyJWTError:
         raise credentials_exc
 
-    user_dict = get_user_by_email(email)
-    if not user_dict:
+    # Tokens issued before the uid claim existed fall back to the email lookup
+    user_dict = get_cached_user(user_id=payload.get("uid"), email=email)
+    if not user_dict or user_dict.get("email") != email:
         raise credentials_exc
     return User(**user_dict)
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+OpenTelemetry tracing with an offline-friendly exporter.
+
+OTEL_TRACES_EXPORTER selects where spans go:
+  none     tracing off (default); spans are no-ops
+  console  JSON spans on stdout
+  file     one JSON span per line appended to OTEL_TRACES_FILE
+  otlp     OTLP/HTTP, configured through the standard OTEL_EXPORTER_OTLP_* variables
+
+Without the opentelemetry packages installed every helper here is a no-op.
+Sampling follows the SDK's standard OTEL_TRACES_SAMPLER variables.
+"""
+import functools
+import inspect
+import os
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # pragma: no cover - optional dependency
+    trace = None
+
+OTEL_TRACES_EXPORTER = os.getenv("OTEL_TRACES_EXPORTER", "none").lower()
+OTEL_TRACES_FILE = os.getenv("OTEL_TRACES_FILE", "traces.jsonl")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "finvista-server")
+
+_provider = None
+_tracer = trace.get_tracer("finvista") if trace else None
+
+
+def _exporter():
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    if OTEL_TRACES_EXPORTER == "console":
+        return ConsoleSpanExporter(formatter=lambda span: span.to_json(indent=None) + os.linesep)
+    if OTEL_TRACES_EXPORTER == "file":
+        return ConsoleSpanExporter(
+            out=open(OTEL_TRACES_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    if OTEL_TRACES_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown OTEL_TRACES_EXPORTER '{OTEL_TRACES_EXPORTER}'")
+
+
+def configure_tracing():
+    """Install the SDK tracer provider for the configured exporter; ADK's own spans are picked up too."""
+    global _provider
+    if trace is None or OTEL_TRACES_EXPORTER == "none" or _provider is not None:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(_exporter()))
+    trace.set_tracer_provider(_provider)
+
+
+def shutdown_tracing():
+    """Flush buffered spans; called from the app lifespan."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+@contextmanager
+def span(name: str, kind=None, **attributes):
+    """Run the block in a child span of the current one. Exceptions are recorded and re-raised."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(
+        name, kind=kind or SpanKind.INTERNAL, attributes=_clean(attributes)
+    ) as current:
+        yield current
+
+
+def _clean(attributes: dict) -> dict:
+    # OTel attributes must be primitives; drop Nones rather than failing
+    return {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in attributes.items() if v is not None}
+
+
+def set_attributes(current, **attributes):
+    if current is not None and current.is_recording():
+        current.set_attributes(_clean(attributes))
+
+
+def traced(name: str = None):
+    """Decorator wrapping a sync or async function in a span named after it."""
+    def decorator(func):
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _event_attributes(event) -> dict:
+    calls = event.get_function_calls() if hasattr(event, "get_function_calls") else []
+    responses = event.get_function_responses() if hasattr(event, "get_function_responses") else []
+    usage = getattr(event, "usage_metadata", None)
+    return {
+        "adk.event.author": getattr(event, "author", None),
+        "adk.event.final": event.is_final_response() if hasattr(event, "is_final_response") else None,
+        "adk.event.function_calls": ",".join(c.name for c in calls) or None,
+        "adk.event.function_responses": ",".join(r.name for r in responses) or None,
+        "llm.prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "llm.completion_tokens": getattr(usage, "candidates_token_count", None),
+    }
+
+
+async def trace_events(events, name: str = "adk.event"):
+    """
+    Re-yield an ADK event stream with one span per event.
+
+    Each span covers the wait for that event, so model latency and tool
+    execution show up as the gaps they actually cause.
+    """
+    iterator = events.__aiter__()
+    index = 0
+    while True:
+        with span(name, **{"adk.event.index": index}) as current:
+            try:
+                event = await iterator.__anext__()
+            except StopAsyncIteration:
+                set_attributes(current, **{"adk.event.end": True})
+                return
+            set_attributes(current, **_event_attributes(event))
+        yield event
+        index += 1
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request, renamed to the route template once routed."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        with span(f"HTTP {scope['method']}", kind=SpanKind.SERVER, **{"http.method": scope["method"]}) as current:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    set_attributes(current, **{"http.status_code": message["status"]})
+                    if message["status"] >= 500:
+                        current.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route and current.is_recording():
+                    current.update_name(f"{scope['method']} {route}")
+                    current.set_attribute("http.route", route)